@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+# teamod: Modules to enable techno-economic analysis (TEA) in Python.
+# Copyright (C) 2023-2024, Sarang S. Bhagwat <sarangb2@illinois.edu>
+#
+# This module is under the MIT open-source license. See
+# github.com/sarangbhagwat/teamod/LICENSE.txt
+# for license details.
+"""
+@author: sarangbhagwat
+Benchmark of the time and memory allocated per get_NPV_given_IRR call.
+
+Run as `python benchmarks/bench_cashflow.py`. The fused cash flow kernel
+(TEA.get_NPV_given_IRR) is compared with the baseline kernel it replaced
+(`get_NPV_given_IRR_baseline`, which allocates a new array for every
+operation) on the same component flows. The 'cold' case clears the cached
+component flows before every call (i.e., every flow is rebuilt, as before
+flows were cached); the 'warm' case only runs the kernel. Temporary memory that does not grow with the
+project duration is from Python objects rather than arrays.
+"""
+import os
+import sys
+import timeit
+import tracemalloc
+import numpy as np
+
+directory = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(directory))
+import teamod
+
+def create_TEA(project_duration=20):
+    return teamod.TEA(
+        IRR=0.10,
+        project_duration=project_duration,
+        purchase_cost=10_000_000,
+        hourly_variable_operating_cost=675,
+        hourly_product_flows=[300, 200],
+        product_prices=[4.2, 1.1],
+        construction_schedule=[0.4, 0.6],
+        )
+
+def get_NPV_given_IRR_baseline(tea, IRR):
+    """Get NPV at a given IRR as before the fused kernel (new arrays for every operation)."""
+    tea.IRR = IRR
+    project_duration = tea.project_duration
+    depreciation = tea.get_depreciation_flow()
+    taxable_cashflow = np.zeros(project_duration, dtype=int)
+    taxable_cashflow = taxable_cashflow - tea.get_VOC_flow()
+    taxable_cashflow = taxable_cashflow - tea.get_FOC_flow()
+    taxable_cashflow = taxable_cashflow - tea.get_other_costs_across_project_duration_flow()
+    taxable_cashflow = taxable_cashflow - tea.get_loan_payments_flow()
+    taxable_cashflow = taxable_cashflow - depreciation
+    taxable_cashflow = taxable_cashflow + tea.get_sales_flow()
+    tax_flow = np.zeros(project_duration)
+    tax_indices = taxable_cashflow > 0
+    tax_flow[tax_indices] = tea.income_tax * taxable_cashflow[tax_indices]
+    net_earnings = taxable_cashflow + tea.get_incentives_flow() - tax_flow
+    nontaxable_cashflow = np.zeros(project_duration, dtype=int)
+    nontaxable_cashflow = nontaxable_cashflow + depreciation
+    nontaxable_cashflow = nontaxable_cashflow + tea.get_loan_principal_flow()
+    nontaxable_cashflow = nontaxable_cashflow - tea.get_FCI_flow()
+    nontaxable_cashflow = nontaxable_cashflow - tea.get_working_capital_flow()
+    overall_cashflow = net_earnings + nontaxable_cashflow
+    P_over_F_factor_array = 1/(1.+tea.discount_rate)**np.array([i for i in range(project_duration)])
+    return (overall_cashflow * P_over_F_factor_array).sum()
+
+def get_peak_temporary_memory(f):
+    """Return the peak memory (bytes) allocated during a call of f on top of what was allocated before it, as traced by tracemalloc."""
+    f()
+    tracemalloc.start()
+    try:
+        f()
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        f()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - current
+
+def run(project_duration=20, number=2000):
+    tea = create_TEA(project_duration)
+    reset_flow_cache = tea.reset_flow_cache
+    kernels = {
+        'baseline': lambda IRR: get_NPV_given_IRR_baseline(tea, IRR),
+        'fused': tea.get_NPV_given_IRR,
+        }
+    assert abs(kernels['baseline'](0.10) - kernels['fused'](0.10)) <= 1e-6 * abs(kernels['fused'](0.10))
+    print(f'get_NPV_given_IRR (project_duration={project_duration})')
+    print(f"{'kernel':>8} {'case':>6} {'time/call [us]':>15} {'peak temporary memory [bytes]':>30}")
+    for case in ('warm', 'cold'):
+        for kernel, get_NPV_given_IRR in kernels.items():
+            if case == 'warm':
+                f = lambda: get_NPV_given_IRR(0.10)
+            else:
+                f = lambda: (reset_flow_cache(), get_NPV_given_IRR(0.10))
+            f()
+            time = min(timeit.repeat(f, number=number, repeat=5)) / number * 1e6
+            memory = get_peak_temporary_memory(f)
+            print(f'{kernel:>8} {case:>6} {time:>15.1f} {memory:>30}')
+
+if __name__ == '__main__':
+    for project_duration in (20, 100):
+        run(project_duration)
+        print()
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+# teamod: Modules to enable techno-economic analysis (TEA) in Python.
+# Copyright (C) 2023-2024, Sarang S. Bhagwat <sarangb2@illinois.edu>
+#
+# This module is under the MIT open-source license. See
+# github.com/sarangbhagwat/teamod/LICENSE.txt
+# for license details.
+"""
+@author: sarangbhagwat
+Benchmark of the time to import teamod in a fresh interpreter.
+
+Run as `python benchmarks/bench_import.py [budget_ms]`. The import time of
+numpy (which teamod always needs) is measured separately and subtracted,
+so the overhead of teamod itself is compared with the budget (default
+100 ms). Modules that teamod only loads when used (pandas, SciPy, asyncio,
+SQLite, and process pools) must not be imported by `import teamod`. Exits
+with status 1 on a regression.
+"""
+import os
+import sys
+import json
+import subprocess
+import statistics
+
+#: Modules that must not be loaded by `import teamod`.
+deferred_modules = ('pandas', 'scipy', 'asyncio', 'sqlite3', 'concurrent.futures.process',
+                    'multiprocessing.shared_memory')
+
+script = '''
+import sys, json, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps([elapsed, sorted(sys.modules)]))
+'''
+
+def measure(module, repeat=7):
+    """Return the median time (s) to import a module in a fresh interpreter and the modules it loads."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    environment = dict(os.environ, PYTHONPATH=os.pathsep.join([root, os.environ.get('PYTHONPATH', '')]))
+    times = []
+    for i in range(repeat):
+        output = subprocess.run([sys.executable, '-c', script.format(module=module)], env=environment,
+                                capture_output=True, text=True, check=True).stdout
+        elapsed, modules = json.loads(output)
+        times.append(elapsed)
+    return statistics.median(times), modules
+
+def run(budget=0.1):
+    numpy_time, _ = measure('numpy')
+    teamod_time, modules = measure('teamod')
+    overhead = teamod_time - numpy_time
+    loaded = [i for i in deferred_modules if i in modules]
+    print(f"{'import':>8} {'median time [ms]':>17}")
+    print(f"{'numpy':>8} {numpy_time * 1e3:>17.1f}")
+    print(f"{'teamod':>8} {teamod_time * 1e3:>17.1f}")
+    print(f'teamod overhead: {overhead * 1e3:.1f} ms (budget: {budget * 1e3:.0f} ms)')
+    regressions = []
+    if loaded: regressions.append(f"modules loaded on import: {', '.join(loaded)}")
+    if overhead > budget: regressions.append('import overhead exceeds budget')
+    for i in regressions: print('REGRESSION:', i)
+    return not regressions
+
+if __name__ == '__main__':
+    budget = float(sys.argv[1]) / 1e3 if len(sys.argv) > 1 else 0.1
+    sys.exit(0 if run(budget) else 1)
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+# teamod: Modules to enable techno-economic analysis (TEA) in Python.
+# Copyright (C) 2023-2024, Sarang S. Bhagwat <sarangb2@illinois.edu>
+#
+# This module is under the MIT open-source license. See
+# github.com/sarangbhagwat/teamod/LICENSE.txt
+# for license details.
+"""
+@author: sarangbhagwat
+Benchmarks of every solve path, written in the style of asv: each class is
+run for every combination of its `params`, `setup` is called before each
+combination, and methods prefixed with `time_` are timed, `peakmem_` are
+profiled for peak memory allocated during a call, and `track_` return a
+tracked value (e.g., a number of objective evaluations). Run them with
+`python benchmarks/run_benchmarks.py`, which compares results with the
+stored baselines.
+"""
+import os
+import tempfile
+import tracemalloc
+import numpy as np
+import teamod
+from teamod._TEABatch import get_batch_inputs
+
+#: MACRS 7-year depreciation fractions.
+MACRS7 = [0.1429, 0.2449, 0.1749, 0.1249, 0.0893, 0.0892, 0.0893, 0.0446]
+
+def create_inputs(project_duration=20, construction_years=2, depreciation_schedule='Linear'):
+    """Get TEA input arguments of a two-product example plant."""
+    construction_schedule = {1: [1.], 2: [0.4, 0.6], 3: [0.2, 0.5, 0.3]}[construction_years]
+    if depreciation_schedule == 'list':
+        depreciation_schedule = (MACRS7 + [0.] * project_duration)[:project_duration]
+    return dict(
+        IRR=0.10,
+        project_duration=project_duration,
+        purchase_cost=10_000_000,
+        hourly_variable_operating_cost=675,
+        hourly_product_flows=[300, 200],
+        product_prices=[4.2, 1.1],
+        construction_schedule=construction_schedule,
+        depreciation_schedule=depreciation_schedule,
+        )
+
+def count_calls(tea, name):
+    """Replace a method of a TEA object with one that counts its calls; returns the list holding the count."""
+    method = getattr(tea, name)
+    calls = [0]
+    def counted(*args, **kwargs):
+        calls[0] += 1
+        return method(*args, **kwargs)
+    setattr(tea, name, counted)
+    return calls
+
+class ScalarSolves:
+    """Latency and objective evaluations of single-scenario solves."""
+    params = ([20, 100], [1, 2, 3], ['Linear', 'list'])
+    param_names = ['project_duration', 'construction_years', 'depreciation_schedule']
+
+    def setup(self, project_duration, construction_years, depreciation_schedule):
+        self.tea = teamod.TEA(**create_inputs(project_duration, construction_years, depreciation_schedule))
+        self.tea.get_NPV_given_IRR(0.10)
+
+    def time_get_NPV_given_IRR(self, *params):
+        self.tea.get_NPV_given_IRR(0.10)
+
+    def time_get_IRR_given_NPV(self, *params):
+        self.tea.get_IRR_given_NPV(0.)
+
+    def time_get_MPSP_given_IRR(self, *params):
+        self.tea.get_MPSP_given_IRR(0.10)
+
+    def time_get_MPSP_given_IRR_exact(self, *params):
+        self.tea.get_MPSP_given_IRR(0.10, method='exact')
+
+    def time_evaluate_MPSP(self, *params):
+        self.tea.evaluate('MPSP', {'lang_factor': 3.})
+
+    def track_IRR_function_calls(self, *params):
+        self.tea.get_IRR_given_NPV(0.)
+        return self.tea.IRR_solver_info['function_calls']
+    track_IRR_function_calls.unit = 'calls'
+
+    def track_MPSP_function_calls(self, *params):
+        tea = teamod.TEA(**self.tea.get_inputs())
+        calls = count_calls(tea, '_get_NPV_given_IRR')
+        tea.get_MPSP_given_IRR(0.10)
+        return calls[0]
+    track_MPSP_function_calls.unit = 'calls'
+
+    def peakmem_get_MPSP_given_IRR(self, *params):
+        self.tea.get_MPSP_given_IRR(0.10)
+
+class CashflowReports:
+    """Latency of cash flow reports."""
+    params = ([20, 100],)
+    param_names = ['project_duration']
+
+    def setup(self, project_duration):
+        self.tea = teamod.TEA(**create_inputs(project_duration))
+        self.tea.get_MPSP_given_IRR(0.10)
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, 'cashflow_report.xlsx')
+
+    def teardown(self, project_duration):
+        self.directory.cleanup()
+
+    def time_get_cashflow_report(self, project_duration):
+        self.tea.get_cashflow_report(self.filename)
+
+    def time_to_frame(self, project_duration):
+        self.tea.result.to_frame()
+
+class BatchSolves:
+    """Time, throughput, and memory of batched solves of 1k to 1M scenarios (evaluated in chunks of 100k)."""
+    params = ([1_000, 10_000, 100_000, 1_000_000], ['NPV', 'IRR', 'MPSP'])
+    param_names = ['scenarios', 'kind']
+    chunk_size = 100_000
+
+    def setup(self, scenarios, kind):
+        tea = teamod.TEA(**create_inputs())
+        rng = np.random.default_rng(0)
+        self.values = np.column_stack([rng.uniform(2., 5., scenarios), rng.uniform(3.5, 6., scenarios)])
+        self.runner = teamod.ScenarioRunner(tea, ('lang_factor', 'product_prices[0]'), kind,
+                                            chunk_size=self.chunk_size, max_workers=1)
+        chunk = self.values[:self.chunk_size]
+        self.batch = teamod.TEABatch(**get_batch_inputs(
+            tea.get_inputs(), {'lang_factor': chunk[:, 0], 'product_prices[0]': chunk[:, 1]}
+        ))
+
+    def time_run(self, scenarios, kind):
+        self.runner.run(self.values)
+    time_run.throughput = 'scenarios'
+
+    def track_memory_per_scenario(self, scenarios, kind):
+        tracemalloc.start()
+        try:
+            self.batch.solve(kind)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return peak / self.batch.size
+    track_memory_per_scenario.unit = 'bytes'
+
+    def track_function_calls_per_scenario(self, scenarios, kind):
+        if kind == 'NPV': return 1.
+        results = self.batch.solve(kind, full_output=True)[1]
+        return results.function_calls / self.batch.size
+    track_function_calls_per_scenario.unit = 'calls'
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+# teamod: Modules to enable techno-economic analysis (TEA) in Python.
+# Copyright (C) 2023-2024, Sarang S. Bhagwat <sarangb2@illinois.edu>
+#
+# This module is under the MIT open-source license. See
+# github.com/sarangbhagwat/teamod/LICENSE.txt
+# for license details.
+"""
+@author: sarangbhagwat
+Run the asv-style benchmarks of bench_solves.py and compare them with the
+stored baselines (baseline.json).
+
+Run as `python benchmarks/run_benchmarks.py [--filter REGEX] [--exclude REGEX]
+[--save] [--baseline PATH] [--time-threshold FRACTION]`. A benchmark
+regresses if its result exceeds the baseline by more than the threshold of
+its kind (see `thresholds`) and by more than its absolute margin (see
+`margins`); timings that regress are measured again before they are
+reported. The script exits with status 1 if any benchmark regresses.
+Baselines depend on the machine, so save new ones (--save) when changing
+machines. For a quick
+check, exclude the largest batches, e.g., --exclude 1000000.
+"""
+import os
+import re
+import sys
+import json
+import time
+import timeit
+import argparse
+import platform
+import itertools
+import tracemalloc
+import numpy as np
+
+directory = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, directory)
+sys.path.insert(1, os.path.dirname(directory))
+import bench_solves
+
+#: Relative increase over the baseline that counts as a regression, by kind of benchmark.
+thresholds = {'time': 0.25, 'peakmem': 0.10, 'track': 0.05}
+
+#: Absolute increase over the baseline (in the unit of the benchmark) below
+#: which a benchmark does not regress, by kind of benchmark. The peak memory of
+#: small solves varies by a few kB with the state of interpreter and NumPy caches.
+margins = {'time': 0., 'peakmem': 4096, 'track': 0.}
+
+#: Default path of the stored baselines.
+baseline_path = os.path.join(directory, 'baseline.json')
+
+def measure_time(f):
+    """Return the time (s) per call of f: the minimum of repeated timings, with fewer repeats for slow calls."""
+    start = time.perf_counter()
+    f()
+    first = time.perf_counter() - start
+    if first > 1.:
+        return min([first] + [timeit.timeit(f, number=1) for i in range(2)])
+    number = max(1, int(0.05 / first)) if first else 1000
+    return min(timeit.repeat(f, number=number, repeat=5)) / number
+
+def measure_peak_memory(f, repeat=5):
+    """
+    Return the peak memory (bytes) allocated during a call of f, as traced by
+    tracemalloc: the minimum over repeated warm calls, as the first traced
+    calls may also allocate caches (e.g., of the interpreter or NumPy).
+    """
+    f()
+    peaks = []
+    tracemalloc.start()
+    try:
+        for i in range(repeat):
+            current = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            f()
+            peaks.append(tracemalloc.get_traced_memory()[1] - current)
+    finally:
+        tracemalloc.stop()
+    return min(peaks)
+
+def get_benchmarks():
+    """Yield the (class, method name) of each benchmark."""
+    for cls in vars(bench_solves).values():
+        if not isinstance(cls, type) or cls.__module__ != bench_solves.__name__: continue
+        for name in sorted(vars(cls)):
+            if name.startswith(('time_', 'peakmem_', 'track_')): yield cls, name
+
+def run(pattern=None, exclude=None, quiet=False):
+    """Run all benchmarks whose names (with parameters) match the pattern and not the exclusion; returns results by name."""
+    results = {}
+    benchmarks = {}
+    for cls, name in get_benchmarks():
+        benchmarks.setdefault(cls, []).append(name)
+    for cls, names in benchmarks.items():
+        params = cls.params if hasattr(cls, 'params') else ((),)
+        for combination in itertools.product(*params):
+            selected = []
+            for name in names:
+                key = f"{cls.__name__}.{name}({', '.join([repr(i) for i in combination])})"
+                if pattern and not re.fullmatch(pattern, key) and not re.search(pattern, key): continue
+                if exclude and re.search(exclude, key): continue
+                selected.append((key, name))
+            if not selected: continue
+            benchmark = cls()
+            benchmark.setup(*combination)
+            try:
+                for key, name in selected:
+                    method = getattr(benchmark, name)
+                    f = lambda: method(*combination)
+                    kind = name.split('_', 1)[0]
+                    if kind == 'time':
+                        value, unit = measure_time(f), 's'
+                    elif kind == 'peakmem':
+                        value, unit = measure_peak_memory(f), 'bytes'
+                    else:
+                        value, unit = float(f()), getattr(method, 'unit', '')
+                    results[key] = {'value': value, 'unit': unit}
+                    if quiet: continue
+                    message = f'{key:<85} {value:>12.4g} {unit}'
+                    throughput = getattr(method, 'throughput', None)
+                    if throughput:
+                        size = combination[cls.param_names.index(throughput)]
+                        message += f' ({size / value:,.0f} {throughput}/s)'
+                    print(message, flush=True)
+            finally:
+                if hasattr(benchmark, 'teardown'): benchmark.teardown(*combination)
+    return results
+
+def compare(results, baseline, thresholds=thresholds, confirmations=2, margins=margins):
+    """
+    Return (name, result, baseline value, relative change) of each benchmark
+    that regressed (by more than both the relative threshold and the absolute
+    margin of its kind). Timings are noisy, so a timing that regresses is measured
+    again (up to `confirmations` times) and only the fastest is compared.
+    """
+    regressions = []
+    for key, result in results.items():
+        stored = baseline.get(key)
+        if stored is None or not stored['value']: continue
+        kind = key.split('.', 1)[1].split('_', 1)[0]
+        value = result['value']
+        for i in range(confirmations if kind == 'time' else 0):
+            if value / stored['value'] - 1. <= thresholds[kind]: break
+            value = min(value, run(re.escape(key), quiet=True)[key]['value'])
+        change = value / stored['value'] - 1.
+        if change > thresholds[kind] and value - stored['value'] > margins[kind]:
+            regressions.append((key, value, stored['value'], change))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run teamod benchmarks and compare them with stored baselines.')
+    parser.add_argument('--filter', help='only run benchmarks whose names match this regular expression')
+    parser.add_argument('--exclude', help='skip benchmarks whose names match this regular expression')
+    parser.add_argument('--save', action='store_true', help='store the results as the new baselines')
+    parser.add_argument('--baseline', default=baseline_path, help='path of the stored baselines')
+    parser.add_argument('--time-threshold', type=float, default=thresholds['time'],
+                        help='relative increase of timings that counts as a regression (e.g., 0.5 on noisy machines)')
+    args = parser.parse_args(argv)
+    results = run(args.filter, args.exclude)
+    if args.save:
+        stored = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as file: stored = json.load(file)['results']
+        stored.update(results)
+        with open(args.baseline, 'w') as file:
+            json.dump({'machine': platform.platform(), 'python': platform.python_version(),
+                       'numpy': np.__version__, 'results': stored}, file, indent=1, sort_keys=True)
+        print(f'saved {len(results)} baselines to {args.baseline}')
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f'no baselines at {args.baseline}; run with --save to store them')
+        return 0
+    with open(args.baseline) as file: baseline = json.load(file)['results']
+    regressions = compare(results, baseline, {**thresholds, 'time': args.time_threshold})
+    for key, value, stored, change in regressions:
+        print(f'REGRESSION: {key}: {value:.4g} vs. baseline {stored:.4g} (+{change:.0%})')
+    print(f'{len(results)} benchmarks, {len(regressions)} regressions')
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
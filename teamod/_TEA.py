@@ -10,13 +10,156 @@
 The input arguments for the TEA class are based largely on BioSTEAM's _tea.py module.
 (https://github.com/BioSTEAMDevelopmentGroup/biosteam)
 """
+import inspect
 import numpy as np
-import scipy
-import pandas as pd
-brentq = scipy.optimize.brentq
+from ._cache import get_key
+from ._result import TEAResult, cashflow_components
+from ._TEABatch import (TEABatch, get_batch_inputs, solve_kinds, metric_names, get_metrics_dtype,
+                        get_payback_period, get_ROI)
+from ._solvers import brentq
+
+#%% Cash flow kernel
+
+#: Names of workspace buffers written by compute_overall_cashflow.
+cashflow_buffers = ('taxable_cashflow', 'tax_flow', 'net_earnings',
+                    'nontaxable_cashflow', 'overall_cashflow')
+
+#: Names of the (cached) component flows of solve results.
+result_flow_names = frozenset((
+    'get_FCI_flow',
+    'get_working_capital_flow',
+    'get_FOC_flow',
+    'get_VOC_flow',
+    'get_other_costs_across_project_duration_flow',
+    'get_loan_principal_flow',
+    'get_loan_interest_only_payments_flow',
+    'get_loan_payments_flow',
+    'get_incentives_flow',
+    'get_sales_flow',
+    'get_depreciation_flow',
+    ))
+
+def compute_overall_cashflow(get_flow, income_tax, buffers):
+    """
+    Compute the cash flow in current dollars in a single pass over the
+    component flows (given by method name by `get_flow`), writing into the
+    `cashflow_buffers` of `buffers`. Returns the overall cash flow buffer.
+    """
+    # estimate depreciation
+    depreciation = get_flow('get_depreciation_flow')
+    
+    # estimate taxable cashflow
+    taxable_cashflow = buffers['taxable_cashflow']
+    np.subtract(0, get_flow('get_VOC_flow'), out=taxable_cashflow)
+    np.subtract(taxable_cashflow, get_flow('get_FOC_flow'), out=taxable_cashflow)
+    np.subtract(taxable_cashflow, get_flow('get_other_costs_across_project_duration_flow'), out=taxable_cashflow)
+    np.subtract(taxable_cashflow, get_flow('get_loan_payments_flow'), out=taxable_cashflow)
+    np.subtract(taxable_cashflow, depreciation, out=taxable_cashflow)
+    np.add(taxable_cashflow, get_flow('get_sales_flow'), out=taxable_cashflow)
+    
+    # estimate tax
+    tax_flow = buffers['tax_flow']
+    np.maximum(taxable_cashflow, 0., out=tax_flow)
+    np.multiply(income_tax, tax_flow, out=tax_flow)
+    
+    # estimate net earnings
+    net_earnings = buffers['net_earnings']
+    np.add(taxable_cashflow, get_flow('get_incentives_flow'), out=net_earnings)
+    np.subtract(net_earnings, tax_flow, out=net_earnings)
+    
+    # estimate nontaxable cashflow
+    nontaxable_cashflow = buffers['nontaxable_cashflow']
+    np.add(depreciation, get_flow('get_loan_principal_flow'), out=nontaxable_cashflow)
+    np.subtract(nontaxable_cashflow, get_flow('get_FCI_flow'), out=nontaxable_cashflow)
+    np.subtract(nontaxable_cashflow, get_flow('get_working_capital_flow'), out=nontaxable_cashflow)
+    
+    # total cashflow
+    return np.add(net_earnings, nontaxable_cashflow, out=buffers['overall_cashflow'])
+
+def get_P_over_F_factors(discount_rate, years, out):
+    """Write P/F factors at a discount rate (for each of the given years) into `out` and return it."""
+    np.power(1.+discount_rate, years, out=out)
+    return np.divide(1, out, out=out)
+
+def get_result_flows(flows, income_tax, discount_rate):
+    """
+    Get the flows of a solve result (as a tuple in order of
+    `cashflow_components`) from its component flows by method name.
+    """
+    project_duration = flows['get_FCI_flow'].size
+    buffers = {i: np.empty(project_duration) for i in cashflow_buffers}
+    cashflow = compute_overall_cashflow(flows.__getitem__, income_tax, buffers)
+    P_over_F_factors = get_P_over_F_factors(discount_rate, np.arange(project_duration),
+                                            np.empty(project_duration))
+    return (
+        flows['get_FCI_flow'],
+        flows['get_working_capital_flow'],
+        flows['get_FOC_flow'],
+        flows['get_VOC_flow'],
+        flows['get_other_costs_across_project_duration_flow'],
+        flows['get_loan_principal_flow'],
+        flows['get_loan_interest_only_payments_flow'],
+        flows['get_loan_payments_flow'],
+        buffers['tax_flow'],
+        flows['get_incentives_flow'],
+        flows['get_sales_flow'],
+        buffers['net_earnings'],
+        cashflow,
+        P_over_F_factors,
+        cashflow * P_over_F_factors,
+        )
+
+#%% Dependency tracking of cash flow components
+
+#: Inputs that determine the fixed capital investment.
+FCI_inputs = ('purchase_cost', 'lang_factor')
+
+#: Inputs that may be mutated in place (e.g., lists); cached flows that depend
+#: on these are also invalidated when a copy of the input no longer matches.
+sequence_inputs = (
+    'product_prices',
+    'hourly_product_flows',
+    'construction_schedule',
+    'depreciation_schedule',
+    '_other_costs_across_project_duration',
+    )
+
+#: Names of cached flows by input (filled in by cached_flow).
+dependent_flows = {}
+
+def freeze(value):
+    """Return a comparable copy of a sequence input."""
+    if value is None or isinstance(value, str): return value
+    return tuple(value)
+
+def cached_flow(*dependencies):
+    """
+    Decorate a get_*_flow method of TEA to cache its result until one of
+    the inputs it depends on is set (or, for sequence inputs, changed in place).
+    Cached flows are read-only.
+    """
+    def decorator(get_flow):
+        name = get_flow.__name__
+        for i in dependencies: dependent_flows.setdefault(i, []).append(name)
+        def get_cached_flow(self):
+            self._sync_sequence_inputs()
+            return self._get_cached_flow(name)
+        get_cached_flow.__name__ = name
+        get_cached_flow.__qualname__ = get_flow.__qualname__
+        get_cached_flow.__doc__ = get_flow.__doc__
+        get_cached_flow.dependencies = dependencies
+        get_cached_flow.compute_flow = get_flow
+        return get_cached_flow
+    return decorator
 
 class TEA():
     
+    #: Opt-in ResultCache of NPV, IRR, MPSP, and cash flow report results (shared by all TEA objects unless set on an object).
+    result_cache = None
+    
+    #: Callback of each iteration of Brent's method in IRR and MPSP solves (set by Instrumentation).
+    _solver_callback = None
+    
     def __init__(
                 self, 
                 
@@ -65,6 +208,15 @@ class TEA():
                 supplies = 0.20,
                 
                 ):
+        #: Cached component flows by method name (see cached_flow).
+        self._flow_cache = {}
+        
+        #: Copies of sequence inputs the cached flows were computed with.
+        self._sequence_snapshots = {}
+        
+        #: Result of the last solve (see TEAResult).
+        self.result = None
+        
         #: Project duration (years).
         self.project_duration = project_duration
         
@@ -155,89 +307,279 @@ class TEA():
         #: Cost of supplies (fraction of labor cost).
         self.supplies = supplies
 
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if name in dependent_flows:
+            cache = self.__dict__.get('_flow_cache')
+            if cache:
+                for i in dependent_flows[name]: cache.pop(i, None)
+    
+    def __copy__(self):
+        new = object.__new__(type(self))
+        new.__dict__.update(self.__dict__)
+        new.__dict__['_flow_cache'] = {}
+        new.__dict__['_sequence_snapshots'] = {}
+        new.__dict__['_workspace'] = None
+        for i in new.__dict__.pop('_instrumented_methods', ()): # see Instrumentation
+            del new.__dict__[i]
+        return new
+    
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for i in state.pop('_instrumented_methods', ()): # see Instrumentation
+            del state[i]
+        return state
+    
+    def reset_flow_cache(self):
+        """Clear all cached component flows (only needed after changing an input in a way TEA cannot see, e.g., mutating an array attribute in place)."""
+        self._flow_cache.clear()
+        self._sequence_snapshots.clear()
+    
+    def _sync_sequence_inputs(self):
+        """Invalidate cached flows that depend on sequence inputs changed in place."""
+        snapshots = self._sequence_snapshots
+        cache = self._flow_cache
+        for name in sequence_inputs:
+            snapshot = freeze(getattr(self, name))
+            if name not in snapshots or snapshots[name] != snapshot:
+                snapshots[name] = snapshot
+                for i in dependent_flows[name]: cache.pop(i, None)
+    
+    def _get_cached_flow(self, name):
+        """Get a cached flow by method name, computing it if needed (sequence inputs must be synced first)."""
+        cache = self._flow_cache
+        if name in cache: return cache[name]
+        get_flow = getattr(type(self), name)
+        compute_flow = getattr(get_flow, 'compute_flow', None)
+        if compute_flow is None: return get_flow(self) # overridden without caching
+        cache[name] = flow = compute_flow(self)
+        flow.setflags(write=False)
+        return flow
+    
+    def _get_workspace(self):
+        """Get reusable buffers (across the project duration) for the cash flow kernel."""
+        workspace = self.__dict__.get('_workspace')
+        project_duration = self.project_duration
+        if workspace is None or workspace['years'].size != project_duration:
+            self._workspace = workspace = {
+                i: np.empty(project_duration) for i in
+                cashflow_buffers + ('P_over_F_factor_array', 'present_value_cashflow')
+                }
+            workspace['years'] = np.arange(project_duration)
+            workspace['discount_rate'] = None
+        return workspace
+    
     def get_initial_cashflow_array(self):
-        return np.array([0 for i in range(self.project_duration)])
+        return np.zeros(self.project_duration, dtype=int)
+    
+    def _compute_overall_cashflow(self):
+        """
+        Compute the cash flow in current dollars in a single pass over the
+        (cached) component flows, writing into the workspace buffers.
+        Returns the overall cash flow buffer, which is overwritten by the next
+        evaluation; self.taxable_cashflow, self.tax_flow, self.net_earnings,
+        and self.nontaxable_cashflow are new arrays of each evaluation.
+        """
+        workspace = self._get_workspace()
+        self._sync_sequence_inputs()
+        cashflow = compute_overall_cashflow(self._get_cached_flow, self.income_tax, workspace)
+        self.taxable_cashflow = workspace['taxable_cashflow'].copy()
+        self.tax_flow = workspace['tax_flow'].copy()
+        self.net_earnings = workspace['net_earnings'].copy()
+        self.nontaxable_cashflow = workspace['nontaxable_cashflow'].copy()
+        return cashflow
     
     def get_overall_cashflow_array(self): # !!!
         """Get the cash flow in current dollars."""
-        project_duration = self.project_duration
-        
-        # estimate depreciation
-        depreciation = self.get_depreciation_flow()
-        
-        # estimate taxable cashflow
-        taxable_cashflow = self.get_initial_cashflow_array()
-        taxable_cashflow = taxable_cashflow - self.get_VOC_flow()
-        taxable_cashflow = taxable_cashflow - self.get_FOC_flow()
-        taxable_cashflow = taxable_cashflow - self.get_other_costs_across_project_duration_flow()
-        taxable_cashflow = taxable_cashflow - self.get_loan_payments_flow()
-        taxable_cashflow = taxable_cashflow - depreciation
-        taxable_cashflow = taxable_cashflow + self.get_sales_flow()
-        self.taxable_cashflow = taxable_cashflow
-        
-        # estimate tax
-        tax_flow=np.zeros(project_duration)
-        tax_indices = taxable_cashflow > 0
-        tax_flow[tax_indices] = self.income_tax * taxable_cashflow[tax_indices]
-        self.tax_flow = tax_flow
-        
-        # estimate net earnings
-        self.net_earnings = net_earnings = taxable_cashflow + self.get_incentives_flow() - tax_flow
-        
-        # estimate nontaxable cashflow
-        nontaxable_cashflow = self.get_initial_cashflow_array()
-        nontaxable_cashflow = nontaxable_cashflow + depreciation
-        nontaxable_cashflow = nontaxable_cashflow + self.get_loan_principal_flow()
-        nontaxable_cashflow = nontaxable_cashflow - self.get_FCI_flow()
-        nontaxable_cashflow = nontaxable_cashflow - self.get_working_capital_flow()
-        self.nontaxable_cashflow = nontaxable_cashflow
-        
-        # total cashflow
-        overall_cashflow = net_earnings + nontaxable_cashflow
-    
-        return overall_cashflow
+        return self._compute_overall_cashflow().copy()
     
     @property
     def discount_rate(self): #!!!
         """Get the inflation-adjusted discount rate."""
         return (1.+self.IRR)/(1.+self.inflation_rate) - 1.
     
+    def _get_P_over_F_factor_array(self):
+        """Get the workspace buffer of P/F factors, recomputed only when the discount rate changes."""
+        workspace = self._get_workspace()
+        discount_rate = self.discount_rate
+        P_over_F_factor_array = workspace['P_over_F_factor_array']
+        if workspace['discount_rate'] != discount_rate:
+            get_P_over_F_factors(discount_rate, workspace['years'], P_over_F_factor_array)
+            workspace['discount_rate'] = discount_rate
+        return P_over_F_factor_array
+    
     @property
     def P_over_F_factor_array(self): #!!!
         """Get an array (across the project duration) of P/F factors."""
-        return 1/(1.+self.discount_rate)**np.array([i for i in range(self.project_duration)])
+        return self._get_P_over_F_factor_array().copy()
+    
+    def _get_result_key(self, kind, ignored_inputs=(), changed_inputs=None, **arguments):
+        """Get the key of a cached result of the given kind from all inputs (except those the result does not depend on, or with the given changes) and solve arguments."""
+        inputs = self.get_inputs()
+        for i in ignored_inputs: inputs[i] = None
+        if changed_inputs: inputs.update(changed_inputs)
+        return get_key(kind, inputs, **arguments)
+    
+    def get_NPV_given_IRR(self, IRR, full_output=False): # !!!
+        """
+        Get NPV at a given IRR. The result of the solve (a TEAResult with all
+        cash flow components) is stored as self.result and, if full_output
+        is True, also returned.
+        """
+        result_cache = self.result_cache
+        if result_cache is None:
+            result = self._solve_NPV_given_IRR(IRR)
+        else:
+            self.IRR = IRR
+            key = self._get_result_key('NPV')
+            result = result_cache.get(key)
+            if result is None:
+                result = self._solve_NPV_given_IRR(IRR)
+                result_cache.set(key, result)
+        self.result = result
+        return (result.NPV, result) if full_output else result.NPV
+    
+    def _solve_NPV_given_IRR(self, IRR):
+        NPV = self._get_NPV_given_IRR(IRR)
+        return self._get_result('NPV', NPV)
     
-    def get_NPV_given_IRR(self, IRR): # !!!
-        """Get NPV at a given IRR."""
+    def _get_NPV_given_IRR(self, IRR):
+        """Get NPV at a given IRR (without the result cache or a result)."""
         self.IRR = IRR
         # get total casfhlow as present value
         self.present_value_cashflow = present_value_cashflow =\
-            self.get_overall_cashflow_array() * self.P_over_F_factor_array
+            np.multiply(self._compute_overall_cashflow(), self._get_P_over_F_factor_array(),
+                        out=self._get_workspace()['present_value_cashflow'])
         # get net present value
         NPV = present_value_cashflow.sum()
         return NPV
     
-    def get_IRR_given_NPV(self, 
-                          NPV, 
-                          IRR_lb=0., 
-                          IRR_ub=10.): #!!!
-        """Get IRR for a given NPV."""
-        objective_func = lambda x: self.get_NPV_given_IRR(IRR=x) - NPV
-        try: 
-            self.IRR = IRR = brentq(objective_func, IRR_lb, IRR_ub, xtol=1e-5)
-            return IRR
-        except ValueError:
-            raise ValueError(f'Cannot solve IRR; objective function for NPV = {NPV} at IRR bounds {IRR_lb} and {IRR_ub} does not have opposite signs ({objective_func(IRR_lb)} and {objective_func(IRR_ub)}).')
-        
+    def _get_result(self, kind, NPV, MPSP=None, product_index=None):
+        """
+        Get a TEAResult of the last cash flow evaluation (at the solution).
+        Its flows are only built when first accessed, from a snapshot of the
+        cached component flows (which are replaced, never changed in place)
+        and the income tax and discount rate of the evaluation.
+        """
+        flows = self._flow_cache.copy()
+        if not flows.keys() >= result_flow_names: # some flows are overridden without caching
+            get_flow = self._get_cached_flow
+            flows = {i: get_flow(i) for i in result_flow_names}
+        income_tax = self.income_tax
+        discount_rate = self.discount_rate
+        return TEAResult(kind, NPV, self.IRR,
+                         lambda: get_result_flows(flows, income_tax, discount_rate),
+                         MPSP, product_index)
+    
+    def get_IRR_given_NPV(self,
+                          NPV,
+                          IRR_lb=0.,
+                          IRR_ub=10.,
+                          method='brentq',
+                          full_output=False): #!!!
+        """
+        Get IRR for a given NPV. The cash flow does not depend on IRR, so it
+        is built only once and the solver only re-discounts it. The method
+        may be 'brentq' (same result as solving with get_NPV_given_IRR),
+        'newton' (bracketed Newton steps with the analytic derivative of NPV),
+        or 'roots' (companion-matrix roots of the NPV polynomial). Solver
+        statistics, including the number of cash flow builds skipped, are
+        stored in self.IRR_solver_info. The result of the solve is stored as
+        self.result and, if full_output is True, also returned.
+        """
+        if method not in ('brentq', 'newton', 'roots'):
+            raise ValueError(f"method must be 'brentq', 'newton', or 'roots', not {repr(method)}")
+        result_cache = self.result_cache
+        if result_cache is None:
+            result = self._solve_IRR_given_NPV(NPV, IRR_lb, IRR_ub, method)
+        else:
+            key = self._get_result_key('IRR', ('IRR',), NPV=NPV, IRR_lb=IRR_lb, IRR_ub=IRR_ub, method=method)
+            result = result_cache.get(key)
+            if result is None:
+                result = self._solve_IRR_given_NPV(NPV, IRR_lb, IRR_ub, method)
+                result_cache.set(key, result)
+            else:
+                self.IRR = result.IRR
+                self.IRR_solver_info = {
+                    'method': method,
+                    'function_calls': 0,
+                    'cashflow_builds': 0,
+                    'skipped_cashflow_builds': 0,
+                    }
+        self.result = result
+        return (result.IRR, result) if full_output else result.IRR
+    
+    def _solve_IRR_given_NPV(self, NPV, IRR_lb, IRR_ub, method):
+        self._get_IRR_given_NPV(NPV, IRR_lb, IRR_ub, method)
+        return self._get_result('IRR', self.present_value_cashflow.sum())
+    
+    def _get_IRR_given_NPV(self, NPV, IRR_lb, IRR_ub, method):
+        """Get IRR for a given NPV (without the result cache or a result)."""
+        cashflow = self.get_overall_cashflow_array()
+        calls = [0]
+        IRR = solve_IRR_from_cashflow(cashflow, NPV, IRR_lb, IRR_ub, method, self.inflation_rate, calls,
+                                      self._solver_callback)
+        self.IRR = IRR
+        self.present_value_cashflow = cashflow * self.P_over_F_factor_array
+        #: Statistics of the last IRR solve.
+        self.IRR_solver_info = {
+            'method': method,
+            'function_calls': calls[0],
+            'cashflow_builds': 1,
+            'skipped_cashflow_builds': max(calls[0] - 1, 0),
+            }
+        return IRR
     
     def get_MPSP_given_IRR(self,
                             IRR,
                             product_index=0,
                             desired_NPV=0,
                             MPSP_lb=0.,
-                            MPSP_ub=100.): #!!!
-        """Get MPSP for a given IRR."""
-        get_NPV_given_IRR = self.get_NPV_given_IRR
+                            MPSP_ub=100.,
+                            method='brentq',
+                            full_output=False): #!!!
+        """
+        Get MPSP for a given IRR. The method may be 'brentq' or 'exact'; the
+        'exact' method solves MPSP in closed form from the piecewise-linear
+        dependence of NPV on the product price (see get_price_decomposition)
+        and uses the MPSP bounds only to choose among multiple roots. The
+        product price is set to the MPSP, and the result of the solve (at
+        the MPSP) is stored as self.result and, if full_output is True, also returned.
+        """
+        if method not in ('brentq', 'exact'):
+            raise ValueError(f"method must be 'brentq' or 'exact', not {repr(method)}")
+        result_cache = self.result_cache
+        if result_cache is None:
+            result = self._solve_MPSP_given_IRR(IRR, product_index, desired_NPV, MPSP_lb, MPSP_ub, method)
+        else:
+            self.IRR = IRR
+            # the MPSP does not depend on the current price of the product
+            product_prices = list(self.product_prices)
+            product_prices[product_index] = None
+            key = self._get_result_key('MPSP', changed_inputs={'product_prices': product_prices},
+                                       product_index=product_index, desired_NPV=desired_NPV,
+                                       MPSP_lb=MPSP_lb, MPSP_ub=MPSP_ub, method=method)
+            result = result_cache.get(key)
+            if result is None:
+                result = self._solve_MPSP_given_IRR(IRR, product_index, desired_NPV, MPSP_lb, MPSP_ub, method)
+                result_cache.set(key, result)
+            else:
+                self.product_prices[product_index] = result.MPSP
+        self.result = result
+        return (result.MPSP, result) if full_output else result.MPSP
+    
+    def _solve_MPSP_given_IRR(self, IRR, product_index, desired_NPV, MPSP_lb, MPSP_ub, method):
+        MPSP = self._get_MPSP_given_IRR(IRR, product_index, desired_NPV, MPSP_lb, MPSP_ub, method)
+        if method != 'exact': # evaluate at the MPSP (the exact method already does)
+            self.product_prices[product_index] = MPSP
+            self._get_NPV_given_IRR(IRR)
+        return self._get_result('MPSP', self.present_value_cashflow.sum(), MPSP, product_index)
+    
+    def _get_MPSP_given_IRR(self, IRR, product_index, desired_NPV, MPSP_lb, MPSP_ub, method):
+        """Get MPSP for a given IRR (without the result cache or a result)."""
+        if method == 'exact':
+            return self._get_MPSP_given_IRR_exactly(IRR, product_index, desired_NPV, MPSP_lb, MPSP_ub)
+        get_NPV_given_IRR = self._get_NPV_given_IRR
         def objective_func(product_selling_price, 
                            product_index=product_index, 
                            IRR=IRR, 
@@ -245,24 +587,356 @@ class TEA():
             self.product_prices[product_index] = product_selling_price
             return get_NPV_given_IRR(IRR) - desired_NPV
         try: 
-            MPSP = brentq(objective_func, MPSP_lb, MPSP_ub, xtol=1e-5)
+            MPSP = brentq(objective_func, MPSP_lb, MPSP_ub, xtol=1e-5, callback=self._solver_callback)
             return MPSP
         except ValueError:
             raise ValueError(f'Cannot solve MPSP; objective function for NPV = {desired_NPV} at MPSP bounds {MPSP_lb} and {MPSP_ub} does not have opposite signs ({objective_func(MPSP_lb)} and {objective_func(MPSP_ub)}).')
     
+    def get_price_decomposition(self, product_index=0):
+        """
+        Get the taxable cash flow at a zero price of the given product,
+        the taxable cash flow per unit price of the product, and the remaining
+        (price- and tax-independent) cash flow. The overall cash flow at price p is
+        taxable + other - income_tax * max(taxable, 0) with taxable = price_independent + p * per_unit_price.
+        """
+        product_prices = self.product_prices
+        try:
+            self.product_prices = prices = list(product_prices)
+            prices[product_index] = 0.
+            self.get_overall_cashflow_array()
+            price_independent = self.taxable_cashflow.copy()
+            other = self.get_incentives_flow() + self.nontaxable_cashflow
+            self.product_prices = unit_prices = [0. for i in product_prices]
+            unit_prices[product_index] = 1.
+            per_unit_price = self.get_sales_flow()
+        finally:
+            self.product_prices = product_prices
+        return price_independent, per_unit_price, other
+    
+    def _get_MPSP_given_IRR_exactly(self, IRR, product_index, desired_NPV, MPSP_lb, MPSP_ub):
+        self.IRR = IRR
+        price_independent, per_unit_price, other = self.get_price_decomposition(product_index)
+        MPSPs = solve_piecewise_linear_NPV(price_independent, per_unit_price, other,
+                                           self.income_tax, self.P_over_F_factor_array,
+                                           desired_NPV)
+        MPSP = choose_MPSP(MPSPs, desired_NPV, product_index, MPSP_lb, MPSP_ub)
+        self.product_prices[product_index] = MPSP
+        self._get_NPV_given_IRR(IRR)
+        return MPSP
+
+    def get_metrics(self,
+                    metrics=metric_names,
+                    IRR=None,
+                    NPV=0.,
+                    product_index=0,
+                    IRR_lb=0.,
+                    IRR_ub=10.,
+                    MPSP_lb=0.,
+                    MPSP_ub=100.): #!!!
+        """
+        Get a record of the given metrics (see teamod._TEABatch.metric_names)
+        from a single build of the cash flow: the NPV at the IRR, the IRR given
+        the NPV (as get_IRR_given_NPV), the MPSP at the IRR given the NPV
+        (as get_MPSP_given_IRR with method='exact', from a price decomposition
+        of the same cash flow), the simple and discounted payback periods (see
+        get_payback_period; discounted at the IRR), and the ROI (see get_ROI).
+        The IRR defaults to the current IRR. Metrics that cannot be solved are
+        NaN. Inputs and the last result (self.result) are not modified.
+        """
+        dtype = get_metrics_dtype(metrics)
+        metrics = dtype.names
+        values = dict.fromkeys(metrics, np.nan)
+        cashflow = self._compute_overall_cashflow()
+        if IRR is None:
+            P_over_F_factor_array = self._get_P_over_F_factor_array()
+        else:
+            discount_rate = (1.+IRR)/(1.+self.inflation_rate) - 1.
+            P_over_F_factor_array = np.divide(1, np.power(1.+discount_rate, self._get_workspace()['years']))
+        if 'IRR' in metrics:
+            try:
+                values['IRR'] = solve_IRR_from_cashflow(cashflow, NPV, IRR_lb, IRR_ub, 'brentq', self.inflation_rate)
+            except (ValueError, RuntimeError):
+                pass
+        if 'MPSP' in metrics:
+            # the price decomposition (see get_price_decomposition) without rebuilding the cash flow
+            per_unit_price = (self.hourly_product_flows[product_index] * self.annual_operating_hours
+                              * self.get_startup_factor_array(self.startup_sales_frac))
+            price_independent = self.taxable_cashflow - self.product_prices[product_index] * per_unit_price
+            other = self.get_incentives_flow() + self.nontaxable_cashflow
+            MPSPs = solve_piecewise_linear_NPV(price_independent, per_unit_price, other,
+                                               self.income_tax, P_over_F_factor_array, NPV)
+            try:
+                values['MPSP'] = choose_MPSP(MPSPs, NPV, product_index, MPSP_lb, MPSP_ub)
+            except ValueError:
+                pass
+        present_value_cashflow = cashflow * P_over_F_factor_array
+        if 'NPV' in metrics:
+            values['NPV'] = present_value_cashflow.sum()
+        if 'payback_period' in metrics:
+            values['payback_period'] = get_payback_period(cashflow)
+        if 'discounted_payback_period' in metrics:
+            values['discounted_payback_period'] = get_payback_period(present_value_cashflow)
+        if 'ROI' in metrics:
+            values['ROI'] = get_ROI(self.net_earnings, self.FCI * (1. + self.WC_over_FCI),
+                                    len(self.construction_schedule))
+        return np.rec.array([tuple(values.values())], dtype=dtype)[0]
+    
+    def evaluate(self, kind='NPV', overrides=None, IRR=None, NPV=0., product_index=0,
+                 full_output=False, **kwargs):
+        """
+        Solve the NPV at the IRR, the IRR given the NPV, or the MPSP at the IRR
+        given the NPV (kind 'NPV', 'IRR', or 'MPSP') with input arguments
+        overridden by a dictionary of values by name (e.g., 'lang_factor',
+        'construction_schedule', or 'product_prices[0]'), without modifying
+        this TEA object. The evaluation works on its own (single-scenario)
+        TEABatch, so one TEA object may be evaluated concurrently by many
+        threads without copying or locking (as long as no thread modifies it).
+        The IRR defaults to the (overridden) IRR; further keyword arguments
+        (IRR_lb, IRR_ub, MPSP_lb, MPSP_ub, and method) are as in
+        get_IRR_given_NPV and get_MPSP_given_IRR, and results equal those of
+        the corresponding solve. The result cache is not used. If full_output
+        is True, a TEAResult of the solve is also returned.
+        """
+        if kind not in solve_kinds:
+            raise ValueError(f"kind must be one of {', '.join([repr(i) for i in solve_kinds])}, not {repr(kind)}")
+        inputs = self.get_inputs()
+        if overrides:
+            indexed = {}
+            for name, value in overrides.items():
+                if name in inputs: inputs[name] = value
+                elif '[' in name: indexed[name] = value
+                else: raise ValueError(f'{repr(name)} is not an input argument of TEA')
+            inputs = get_batch_inputs(inputs, indexed)
+        batch = TEABatch(**inputs)
+        if IRR is None: IRR = inputs['IRR']
+        MPSP = None
+        if kind == 'NPV':
+            if kwargs: raise TypeError(f"unexpected keyword arguments for NPV: {', '.join(kwargs)}")
+        elif kind == 'IRR':
+            IRR_lb = kwargs.pop('IRR_lb', 0.)
+            IRR_ub = kwargs.pop('IRR_ub', 10.)
+            method = kwargs.pop('method', 'brentq')
+            if kwargs: raise TypeError(f"unexpected keyword arguments for IRR: {', '.join(kwargs)}")
+            if method not in ('brentq', 'newton', 'roots'):
+                raise ValueError(f"method must be 'brentq', 'newton', or 'roots', not {repr(method)}")
+            cashflow = batch.get_overall_cashflow_array()[0]
+            IRR = solve_IRR_from_cashflow(cashflow, NPV, IRR_lb, IRR_ub, method,
+                                          float(inputs['inflation_rate']))
+        else:
+            MPSP_lb = kwargs.pop('MPSP_lb', 0.)
+            MPSP_ub = kwargs.pop('MPSP_ub', 100.)
+            method = kwargs.pop('method', 'brentq')
+            if kwargs: raise TypeError(f"unexpected keyword arguments for MPSP: {', '.join(kwargs)}")
+            if method not in ('brentq', 'exact'):
+                raise ValueError(f"method must be 'brentq' or 'exact', not {repr(method)}")
+            # the batch owns a copy of the prices, so they may be changed in place
+            batch.product_prices = product_prices = np.array(batch.product_prices)
+            batch.IRR = IRR
+            if method == 'exact':
+                price_independent, per_unit_price, other = batch.get_price_decomposition(product_index)
+                MPSPs = solve_piecewise_linear_NPV(price_independent[0], per_unit_price[0], other[0],
+                                                   float(inputs['income_tax']),
+                                                   batch.P_over_F_factor_array[0], NPV)
+                MPSP = choose_MPSP(MPSPs, NPV, product_index, MPSP_lb, MPSP_ub)
+            else:
+                def objective_func(product_selling_price):
+                    product_prices[..., product_index] = product_selling_price
+                    return batch.get_NPV_given_IRR()[0] - NPV
+                try:
+                    MPSP = brentq(objective_func, MPSP_lb, MPSP_ub, xtol=1e-5)
+                except ValueError:
+                    raise ValueError(f'Cannot solve MPSP; objective function for NPV = {NPV} at MPSP bounds {MPSP_lb} and {MPSP_ub} does not have opposite signs ({objective_func(MPSP_lb)} and {objective_func(MPSP_ub)}).')
+            product_prices[..., product_index] = MPSP
+        if full_output:
+            components = batch.get_cashflow_components(IRR)
+            flows = tuple([np.array(components[i][0]) for i in cashflow_components])
+            result = TEAResult(kind, flows[-2].sum(), IRR, flows, MPSP,
+                               None if MPSP is None else product_index)
+        if kind == 'NPV':
+            value = result.NPV if full_output else batch.get_NPV_given_IRR(IRR)[0]
+        elif kind == 'IRR':
+            value = IRR
+        else:
+            value = MPSP
+        return (value, result) if full_output else value
+    
+    def get_NPV_gradient(self, IRR=None):
+        """
+        Get a dictionary of the derivatives of NPV at a given IRR (defaults to
+        the current IRR) with respect to each input argument, computed in a
+        single reverse (adjoint) pass through the cash flow. Derivatives with
+        respect to list inputs (e.g., product_prices) are arrays with one entry
+        per item. Tax is differentiated on the side of the current taxable cash
+        flow (as untaxed where it is exactly zero). Derivatives with respect to
+        integer inputs (project_duration and finance_years), a 'Linear'
+        depreciation schedule, and an unspecified hourly_fixed_operating_cost
+        are NaN.
+        """
+        if IRR is not None: self.IRR = IRR
+        IRR = self.IRR
+        inflation_rate = self.inflation_rate
+        cashflow = self._compute_overall_cashflow()
+        taxable_cashflow = self.taxable_cashflow
+        P_over_F_factor_array = self._get_P_over_F_factor_array()
+        project_duration = self.project_duration
+        years = np.arange(project_duration)
+        income_tax = self.income_tax
+        gradient = dict.fromkeys(input_names, 0.)
+        for i in ('project_duration', 'finance_years'): gradient[i] = np.nan
+
+        # adjoints of NPV with respect to the overall and taxable cash flows
+        overall = P_over_F_factor_array
+        taxable = overall * (1. - income_tax * (taxable_cashflow > 0.))
+        discounted_years = (cashflow * years * P_over_F_factor_array).sum()
+        gradient['IRR'] = - discounted_years / (1.+IRR)
+        gradient['inflation_rate'] = discounted_years / (1.+inflation_rate)
+        gradient['income_tax'] = - (overall * np.maximum(taxable_cashflow, 0.)).sum()
+        gradient['incentives'] = overall.sum()
+        gradient['other_costs_across_project_duration'] = - taxable
+
+        # startup-scaled annual amounts
+        startup_year = len(self.construction_schedule) - 1
+        startup_months = self.startup_months
+        annual_operating_hours = self.annual_operating_hours
+        VOC, FOC, sales = self.VOC, self.FOC, self.sales
+        total_sales = sum(sales)
+        for adjoint, annual_amount, startup_frac_name in ((-taxable, VOC, 'startup_VOC_frac'),
+                                                          (-taxable, FOC, 'startup_FOC_frac'),
+                                                          (taxable, total_sales, 'startup_sales_frac')):
+            startup_frac = getattr(self, startup_frac_name)
+            if startup_year + 1 < project_duration:
+                startup_adjoint = adjoint[startup_year + 1] * annual_amount
+                gradient[startup_frac_name] = startup_adjoint * startup_months/12
+                gradient['startup_months'] += startup_adjoint * (startup_frac - 1)/12
+        dVOC = - (taxable * self.get_startup_factor_array(self.startup_VOC_frac)).sum()
+        dFOC = - (taxable * self.get_startup_factor_array(self.startup_FOC_frac)).sum()
+        dsales = (taxable * self.get_startup_factor_array(self.startup_sales_frac)).sum()
+        gradient['hourly_variable_operating_cost'] = dVOC * annual_operating_hours
+        gradient['annual_operating_hours'] = dVOC * self.hourly_variable_operating_cost
+        product_prices = np.array(self.product_prices, dtype=float)
+        hourly_product_flows = np.array(self.hourly_product_flows, dtype=float)
+        gradient['product_prices'] = dsales * hourly_product_flows * annual_operating_hours
+        gradient['hourly_product_flows'] = dsales * product_prices * annual_operating_hours
+        gradient['annual_operating_hours'] += dsales * (product_prices * hourly_product_flows).sum()
+        FCI = self.FCI
+        if self.hourly_fixed_operating_cost:
+            dFCI = 0.
+            gradient['hourly_fixed_operating_cost'] = dFOC * annual_operating_hours
+            gradient['annual_operating_hours'] += dFOC * self.hourly_fixed_operating_cost
+        else:
+            gradient['hourly_fixed_operating_cost'] = np.nan
+            property_fractions = (self.property_tax + self.property_insurance
+                                  + self.maintenance + self.administration)
+            dFCI = dFOC * property_fractions
+            for i in ('property_tax', 'property_insurance', 'maintenance', 'administration'):
+                gradient[i] = dFOC * FCI
+            labor_cost = self.labor_cost
+            gradient['labor_cost'] = dFOC * (1 + self.fringe_benefits + self.supplies)
+            gradient['fringe_benefits'] = gradient['supplies'] = dFOC * labor_cost
+
+        # capital flows
+        padded_construction_schedule = self.get_padded_construction_schedule()
+        construction_schedule = np.zeros(project_duration)
+        dFCI -= (overall * padded_construction_schedule).sum()
+        construction_schedule -= overall * FCI
+        depreciation = overall - taxable
+        depreciation_schedule = self.depreciation_schedule
+        if depreciation_schedule == 'Linear':
+            dFCI += depreciation.sum() / project_duration
+            gradient['depreciation_schedule'] = np.nan
+        else:
+            depreciation_schedule = np.array(depreciation_schedule, dtype=float)
+            dFCI += (depreciation[:depreciation_schedule.size] * depreciation_schedule).sum()
+            gradient['depreciation_schedule'] = depreciation[:depreciation_schedule.size] * FCI
+        WC_over_FCI = self.WC_over_FCI
+        dFCI -= overall[0] * WC_over_FCI
+        gradient['WC_over_FCI'] = - overall[0] * FCI
+
+        # loan flows
+        finance_interest, finance_years, finance_fraction =\
+            self.finance_interest, self.finance_years, self.finance_fraction
+        loan_payments = - taxable
+        loan_payment_start_year = min(len(self.construction_schedule), finance_years)
+        loan_principal = self.loan_principal
+        loan_principal_flow = self.get_loan_principal_flow()
+        interest_only_adjoint = loan_payments[:loan_payment_start_year]
+        principal = overall.copy()
+        principal[:loan_payment_start_year] += finance_interest * interest_only_adjoint[::-1].cumsum()[::-1]
+        gradient['finance_interest'] = (interest_only_adjoint * loan_principal_flow[:loan_payment_start_year].cumsum()).sum()
+        dloan = (principal * padded_construction_schedule).sum()
+        construction_schedule += principal * loan_principal
+        if loan_payment_start_year < min(finance_years, project_duration):
+            payment_adjoint = loan_payments[loan_payment_start_year:finance_years].sum()
+            dpayment_dloan, dpayment_dinterest = get_annualized_value_derivatives(
+                finance_fraction * FCI, finance_years-loan_payment_start_year, finance_interest)
+            dloan += payment_adjoint * dpayment_dloan
+            gradient['finance_interest'] += payment_adjoint * dpayment_dinterest
+        gradient['finance_fraction'] = dloan * FCI
+        dFCI += dloan * finance_fraction
+        gradient['construction_schedule'] = construction_schedule[:len(self.construction_schedule)]
+
+        # fixed capital investment
+        gradient['purchase_cost'] = dFCI * self.lang_factor
+        gradient['lang_factor'] = dFCI * self.purchase_cost
+        return {i: j if isinstance(j, np.ndarray) else float(j) for i, j in gradient.items()}
+
+    def get_IRR_gradient(self, IRR=None):
+        """
+        Get a dictionary of the derivatives of the IRR solved for a given NPV
+        (see get_IRR_given_NPV) with respect to each input argument and the NPV
+        ('NPV') by implicit differentiation at the IRR (defaults to the current
+        IRR). See get_NPV_gradient.
+        """
+        gradient = self.get_NPV_gradient(IRR)
+        dNPV_dIRR = gradient.pop('IRR')
+        IRR_gradient = {i: - j / dNPV_dIRR for i, j in gradient.items()}
+        IRR_gradient['NPV'] = 1. / dNPV_dIRR
+        return IRR_gradient
+
+    def get_MPSP_gradient(self, IRR=None, product_index=0):
+        """
+        Get a dictionary of the derivatives of the MPSP solved at a given IRR
+        (see get_MPSP_given_IRR) with respect to each input argument and the
+        desired NPV ('desired_NPV') by implicit differentiation at the current
+        price of the product (e.g., after solving MPSP). See get_NPV_gradient.
+        """
+        gradient = self.get_NPV_gradient(IRR)
+        dNPV_dprice = gradient['product_prices'][product_index]
+        MPSP_gradient = {i: - j / dNPV_dprice for i, j in gradient.items()}
+        MPSP_gradient['product_prices'][product_index] = 0.
+        MPSP_gradient['desired_NPV'] = 1. / dNPV_dprice
+        return MPSP_gradient
+
     @property
     def FCI(self): # !!!
         """Get the fixed capital investment."""
         return self.purchase_cost * self.lang_factor
     
+    def get_padded_construction_schedule(self):
+        """Get the construction schedule padded with zeros to the project duration."""
+        construction_schedule = self.construction_schedule
+        padded_construction_schedule = np.zeros(self.project_duration)
+        padded_construction_schedule[:len(construction_schedule)] = construction_schedule
+        return padded_construction_schedule
+    
+    def get_startup_factor_array(self, startup_frac):
+        """
+        Get factors (across the project duration) of annual amounts that are
+        0 during construction, account for the startup fraction during the
+        startup year, and are 1 afterwards.
+        """
+        startup_year = len(self.construction_schedule) - 1
+        startup_year_startup_portion = self.startup_months/12
+        factors = np.ones(self.project_duration)
+        factors[startup_year+1] = (startup_year_startup_portion * startup_frac
+                                   + (1-startup_year_startup_portion) * 1)
+        factors[:startup_year+1] = 0.
+        return factors
+    
+    @cached_flow(*FCI_inputs + ('construction_schedule', 'project_duration'))
     def get_FCI_flow(self):
         """Get the cash flow of fixed capital investment throughout the project duration."""
-        FCI = self.FCI
-        project_duration = self.project_duration
-        construction_schedule = np.array(list(self.construction_schedule) +
-                                         [0 for i in range(project_duration - len(self.construction_schedule))]
-                                         )
-        return FCI*construction_schedule
+        return self.FCI*self.get_padded_construction_schedule()
     
     @property
     def FOC(self): # !!!
@@ -273,46 +947,24 @@ class TEA():
                      + self.maintenance + self.administration)
                 + self.labor_cost*(1+self.fringe_benefits+self.supplies))
     
+    @cached_flow(*FCI_inputs + ('hourly_fixed_operating_cost', 'annual_operating_hours',
+                                'property_tax', 'property_insurance', 'maintenance', 'administration',
+                                'labor_cost', 'fringe_benefits', 'supplies',
+                                'startup_months', 'startup_FOC_frac', 'construction_schedule', 'project_duration'))
     def get_FOC_flow(self):
         """Get the cash flow of fixed operating costs throughout the project duration."""
-        FOC = self.FOC
-        startup_months, startup_FOC_frac = self.startup_months, self.startup_FOC_frac
-        startup_year = len(self.construction_schedule) - 1
-        FOC_flow = self.get_initial_cashflow_array()
-        FOC_flow = FOC_flow + FOC
-        
-        FOC_flow = list(FOC_flow)
-        startup_year_startup_portion = startup_months/12
-        startup_year_FOC_factor = (startup_year_startup_portion * startup_FOC_frac
-                       + (1-startup_year_startup_portion) * 1)
-            
-        FOC_flow[startup_year+1] = startup_year_FOC_factor * FOC
-        for i in range(startup_year+1):
-            FOC_flow[i] = 0
-        return np.array(FOC_flow)
+        return self.FOC * self.get_startup_factor_array(self.startup_FOC_frac)
     
     @property
     def VOC(self): #!!!
         """Get the annual variable operating cost."""
         return self.hourly_variable_operating_cost * self.annual_operating_hours
     
+    @cached_flow('hourly_variable_operating_cost', 'annual_operating_hours',
+                 'startup_months', 'startup_VOC_frac', 'construction_schedule', 'project_duration')
     def get_VOC_flow(self):
         """Get the cash flow of variable operating costs throughout the project duration."""
-        VOC = self.VOC
-        startup_months, startup_VOC_frac = self.startup_months, self.startup_VOC_frac
-        startup_year = len(self.construction_schedule) - 1
-        VOC_flow = self.get_initial_cashflow_array()
-        VOC_flow = VOC_flow + VOC
-        
-        VOC_flow = list(VOC_flow)
-        startup_year_startup_portion = startup_months/12
-        startup_year_VOC_factor = (startup_year_startup_portion * startup_VOC_frac
-                       + (1-startup_year_startup_portion) * 1)
-            
-        VOC_flow[startup_year+1] = startup_year_VOC_factor * VOC
-        for i in range(startup_year+1):
-            VOC_flow[i] = 0
-        return np.array(VOC_flow)
+        return self.VOC * self.get_startup_factor_array(self.startup_VOC_frac)
     
     @property
     def sales(self): #!!!
@@ -320,23 +972,13 @@ class TEA():
         return np.array(self.product_prices) * np.array(self.hourly_product_flows) *\
             self.annual_operating_hours
     
+    @cached_flow('product_prices', 'hourly_product_flows', 'annual_operating_hours',
+                 'startup_months', 'startup_sales_frac', 'construction_schedule', 'project_duration')
     def get_sales_flow(self):
         """Get the cash flow of sales throughout the project duration."""
-        sales = sum(self.sales)
-        startup_months, startup_sales_frac = self.startup_months, self.startup_sales_frac
-        startup_year = len(self.construction_schedule) - 1
-        sales_flow = self.get_initial_cashflow_array()
-        sales_flow = sales_flow + sales
-        sales_flow = list(sales_flow)
-        startup_year_startup_portion = startup_months/12
-        startup_year_sales_factor = (startup_year_startup_portion * startup_sales_frac
-                       + (1-startup_year_startup_portion) * 1)
-            
-        sales_flow[startup_year+1] = startup_year_sales_factor * sales
-        for i in range(startup_year+1):
-            sales_flow[i] = 0
-        return np.array(sales_flow)
+        return sum(self.sales) * self.get_startup_factor_array(self.startup_sales_frac)
  
+    @cached_flow(*FCI_inputs + ('depreciation_schedule', 'project_duration'))
     def get_depreciation_flow(self):
         """Get the cash flow of depreciation throughout the project duration."""
         depreciation_schedule = self.depreciation_schedule
@@ -353,26 +995,24 @@ class TEA():
     def loan_principal(self):
         return self.finance_fraction * self.FCI
     
+    @cached_flow(*FCI_inputs + ('finance_fraction', 'construction_schedule', 'project_duration'))
     def get_loan_principal_flow(self):
         """Get the cash flow of loan principal revenue throughout the project duration."""
-        return self.loan_principal *\
-            np.array(
-                    list(self.construction_schedule) +
-                    [0 for i in range(self.project_duration-len(self.construction_schedule))]
-                    )
+        return self.loan_principal * self.get_padded_construction_schedule()
     
+    @cached_flow(*FCI_inputs + ('finance_fraction', 'finance_interest', 'finance_years',
+                                'construction_schedule', 'project_duration'))
     def get_loan_interest_only_payments_flow(self):
         """Get the cash flow of loan interest-only payments throughout the project duration."""
         self.loan_payment_start_year = years = min(len(self.construction_schedule), self.finance_years)
         loan_principal_flow = self.get_loan_principal_flow()
         interest_rate = self.finance_interest
-        flow = [0 for i in range(self.project_duration)]
-        current_loan_principal = 0
-        for y in range(years):
-            current_loan_principal += loan_principal_flow[y]
-            flow[y] = interest_rate*current_loan_principal
-        return np.array(flow)
+        flow = np.zeros(self.project_duration)
+        flow[:years] = interest_rate*loan_principal_flow[:years].cumsum()
+        return flow
     
+    @cached_flow(*FCI_inputs + ('finance_fraction', 'finance_interest', 'finance_years',
+                                'construction_schedule', 'project_duration'))
     def get_loan_payments_flow(self):
         """Get the cash flow of all loan payments throughout the project duration."""
         loan_interest_only_payments_flow = self.get_loan_interest_only_payments_flow()
@@ -386,26 +1026,23 @@ class TEA():
                                                    finance_years-loan_payment_start_year, 
                                                    finance_interest)
         
-        flow = [0 for i in range(self.project_duration)]
-    
-        for y in range(loan_payment_start_year, finance_years):
-            flow[y] = yearly_loan_payment
-        
-        flow = np.array(flow)
-        
+        flow = np.zeros(self.project_duration)
+        flow[loan_payment_start_year:finance_years] = yearly_loan_payment
         flow = flow + loan_interest_only_payments_flow
         return flow
     
+    @cached_flow('incentives', 'project_duration')
     def get_incentives_flow(self):
         """Get the cash flow of tax incentives throughout the project duration."""
         incentives = self.incentives
         return incentives* np.ones(self.project_duration)
     
+    @cached_flow(*FCI_inputs + ('WC_over_FCI', 'project_duration'))
     def get_working_capital_flow(self):
         """Get the cash flow of working capital throughout the project duration."""
-        flow = list(self.get_initial_cashflow_array())
+        flow = np.zeros(self.project_duration)
         flow[0] = self.WC_over_FCI * self.FCI
-        return np.array(flow)
+        return flow
     
     @property
     def other_costs_across_project_duration(self):
@@ -413,61 +1050,31 @@ class TEA():
             return self._other_costs_across_project_duration
         return np.zeros(self.project_duration)
     
+    @cached_flow('_other_costs_across_project_duration', 'project_duration')
     def get_other_costs_across_project_duration_flow(self):
         """Get the cash flow of other user-specified costs throughout the project duration."""
         return np.array(self.other_costs_across_project_duration)
+    
+    def get_inputs(self):
+        """Get a dictionary of the input arguments of this TEA object (e.g., to create a copy or a TEABatch)."""
+        inputs = {i: getattr(self, i) for i in input_names}
+        inputs['other_costs_across_project_duration'] = self._other_costs_across_project_duration
+        return inputs
         
     def get_cashflow_report(self, filename='cashflow_report.xlsx'): #!!!
-        """Get a full report for cash flow across the project duration."""
-        VOC_flow = self.get_VOC_flow()
-        FOC_flow = self.get_FOC_flow()
-        sales_flow =  self.get_sales_flow()
-        
-        other_costs_flow = self.get_other_costs_across_project_duration_flow()
-        
-        tax_flow = self.tax_flow
-        incentives_flow = self.get_incentives_flow()
-        
-        loan_principal_flow = self.get_loan_principal_flow()
-        loan_interest_only_payments_flow = self.get_loan_interest_only_payments_flow()
-        loan_payments_flow = self.get_loan_payments_flow()
-        
-        FCI_flow =  self.get_FCI_flow()
-        WC_flow = self.get_working_capital_flow()
-        
-        net_earnings = self.net_earnings
-        cash_flow = self.get_overall_cashflow_array()
-        
-        discount_factor_array = self.P_over_F_factor_array
-        
-        present_value_flow = self.present_value_cashflow
-        
-        cumulative_present_value_flow = present_value_flow.cumsum()
-        
-        cashflow_dict = {
-            'Fixed capital investment': FCI_flow,
-            'Working capital': WC_flow,
-            'Fixed operating cost': FOC_flow,
-            'Variable operating cost': VOC_flow,
-            'Other costs': other_costs_flow,
-            'Loan': loan_principal_flow,
-            'Loan interest-only payment': loan_interest_only_payments_flow,
-            'Loan payment': loan_payments_flow,
-            'Tax': tax_flow,
-            'Incentives': incentives_flow,
-            'Sales': sales_flow,
-            'Net earnings': net_earnings,
-            'Cash flow': cash_flow,
-            'Discount factor': discount_factor_array,
-            'Net present value': present_value_flow,
-            'Cumulative net present value': cumulative_present_value_flow,
-            }
-        
-        cashflow_df = pd.DataFrame(cashflow_dict)
-        cashflow_df.to_excel(filename)
-        
-        return cashflow_df
-    
+        """
+        Get a full report for cash flow across the project duration from the
+        result of the last solve (self.result; see TEAResult), so the report
+        is consistent with that solve and nothing is recomputed. If no solve
+        has run, NPV is solved at the current IRR first.
+        """
+        if self.result is None: self.get_NPV_given_IRR(self.IRR)
+        return self.result.to_excel(filename)
+
+#: Names of the input arguments of TEA.
+input_names = tuple(inspect.signature(TEA).parameters)
+
+
 #%% Value conversion functions
 
 def get_present_value(future_value, year, interest_rate): #!!!
@@ -484,3 +1091,134 @@ def get_annualized_value(present_value, years, interest_rate): #!!!
     F_by_P_factor = (1.+i)**n
     return P * (i*F_by_P_factor)/(F_by_P_factor-1.)
 
+def get_annualized_value_derivatives(present_value, years, interest_rate): #!!!
+    """Get the derivatives of the annualized value with respect to the present value and interest rate."""
+    P, n, i = present_value, years, interest_rate
+    F_by_P_factor = (1.+i)**n
+    dF_by_P_factor = n * (1.+i)**(n-1)
+    capital_recovery_factor = (i*F_by_P_factor)/(F_by_P_factor-1.)
+    dcapital_recovery_factor = (F_by_P_factor*(F_by_P_factor-1.) - i*dF_by_P_factor)/(F_by_P_factor-1.)**2
+    return capital_recovery_factor, P * dcapital_recovery_factor
+
+#%% Price functions for a decomposed cash flow
+
+def solve_piecewise_linear_NPV(price_independent, per_unit_price, other,
+                               income_tax, P_over_F_factor_array, NPV): #!!!
+    """
+    Solve (in closed form) all prices at which the NPV of a cash flow that is
+    piecewise linear in price (see TEA.get_price_decomposition) equals the given NPV.
+    Returns a sorted array of prices.
+    """
+    a, b, PF = price_independent, per_unit_price, P_over_F_factor_array
+    varies = b != 0.
+    breakpoints = np.unique(-a[varies]/b[varies])
+    # a test price within each segment between (and beyond) break points
+    test_prices = np.concatenate([breakpoints[:1] - 1.,
+                                  0.5 * (breakpoints[1:] + breakpoints[:-1]),
+                                  breakpoints[-1:] + 1.]) if breakpoints.size else np.zeros(1)
+    lower_bounds = np.concatenate([[-np.inf], breakpoints])
+    upper_bounds = np.concatenate([breakpoints, [np.inf]])
+    taxed = (a + np.outer(test_prices, b)) > 0.
+    untaxed_fraction = 1. - income_tax * taxed
+    intercepts = ((a * untaxed_fraction + other) * PF).sum(axis=1)
+    slopes = (b * untaxed_fraction * PF).sum(axis=1)
+    roots = []
+    for intercept, slope, lb, ub in zip(intercepts, slopes, lower_bounds, upper_bounds):
+        if slope == 0.: continue
+        root = (NPV - intercept) / slope
+        if lb <= root <= ub: roots.append(root)
+    return np.unique(roots)
+
+def choose_MPSP(MPSPs, desired_NPV, product_index, MPSP_lb, MPSP_ub): #!!!
+    """
+    Choose the MPSP among all prices at which NPV equals the desired NPV
+    (see solve_piecewise_linear_NPV): the lowest within bounds or, if none
+    is within bounds, the closest to the bounds.
+    """
+    if not MPSPs.size:
+        raise ValueError(f'Cannot solve MPSP; NPV never equals {desired_NPV} at any price of product {product_index}.')
+    within_bounds = MPSPs[(MPSPs >= MPSP_lb) & (MPSPs <= MPSP_ub)]
+    if within_bounds.size:
+        MPSP = within_bounds[0]
+    else:
+        MPSP = MPSPs[np.argmin(np.minimum(np.abs(MPSPs - MPSP_lb), np.abs(MPSPs - MPSP_ub)))]
+    return float(MPSP)
+
+#%% IRR functions for a prebuilt cash flow
+
+def solve_IRR_from_cashflow(cashflow, NPV, IRR_lb, IRR_ub, method='brentq',
+                            inflation_rate=0., calls=None, callback=None): #!!!
+    """
+    Solve IRR for a given NPV of a cash flow (in current dollars) by the given
+    method ('brentq', 'newton', or 'roots'; see TEA.get_IRR_given_NPV). The
+    number of NPV evaluations is added to calls[0], and callback (if any) is
+    passed to brentq.
+    """
+    if calls is None: calls = [0]
+    def objective_func(x):
+        calls[0] += 1
+        return get_NPV_from_cashflow(cashflow, x, inflation_rate) - NPV
+    try:
+        if method == 'brentq':
+            return brentq(objective_func, IRR_lb, IRR_ub, xtol=1e-5, callback=callback)
+        elif method == 'newton':
+            return solve_IRR_from_cashflow_by_newton(cashflow, NPV, IRR_lb, IRR_ub,
+                                                     inflation_rate, xtol=1e-5, calls=calls)
+        else:
+            return solve_IRR_from_cashflow_by_roots(cashflow, NPV, IRR_lb, IRR_ub, inflation_rate)
+    except ValueError:
+        raise ValueError(f'Cannot solve IRR; objective function for NPV = {NPV} at IRR bounds {IRR_lb} and {IRR_ub} does not have opposite signs ({objective_func(IRR_lb)} and {objective_func(IRR_ub)}).')
+
+def get_NPV_from_cashflow(cashflow, IRR, inflation_rate=0.): #!!!
+    """Get the NPV of a cash flow (in current dollars) given the IRR and inflation rate."""
+    discount_rate = (1.+IRR)/(1.+inflation_rate) - 1.
+    return (cashflow * (1/(1.+discount_rate)**np.arange(len(cashflow)))).sum()
+
+def get_NPV_derivative_from_cashflow(cashflow, IRR, inflation_rate=0.): #!!!
+    """Get the derivative of the NPV of a cash flow with respect to the IRR."""
+    base = (1.+IRR)/(1.+inflation_rate)
+    years = np.arange(len(cashflow))
+    return (-years * cashflow * base**(-years-1.)).sum() / (1.+inflation_rate)
+
+def solve_IRR_from_cashflow_by_newton(cashflow, NPV, IRR_lb, IRR_ub,
+                                      inflation_rate=0., xtol=1e-5, maxiter=100, calls=None): #!!!
+    """
+    Solve IRR for a given NPV of a cash flow by Newton steps with the analytic
+    derivative, falling back to bisection whenever a step leaves the bracket.
+    """
+    if calls is None: calls = [0]
+    def f(x):
+        calls[0] += 1
+        return get_NPV_from_cashflow(cashflow, x, inflation_rate) - NPV
+    f_lb, f_ub = f(IRR_lb), f(IRR_ub)
+    if f_lb == 0.: return IRR_lb
+    if f_ub == 0.: return IRR_ub
+    if (f_lb > 0.) == (f_ub > 0.): raise ValueError('f(a) and f(b) must have different signs')
+    lb, ub = IRR_lb, IRR_ub
+    x = 0.5 * (lb + ub)
+    for i in range(maxiter):
+        fx = f(x)
+        if fx == 0.: return x
+        if (fx > 0.) == (f_lb > 0.): lb = x
+        else: ub = x
+        dfx = get_NPV_derivative_from_cashflow(cashflow, x, inflation_rate)
+        x_new = x - fx/dfx if dfx else lb - 1.
+        if not lb < x_new < ub: x_new = 0.5 * (lb + ub)
+        if abs(x_new - x) < xtol or ub - lb < xtol: return x_new
+        x = x_new
+    raise RuntimeError(f'IRR did not converge after {maxiter} iterations')
+
+def solve_IRR_from_cashflow_by_roots(cashflow, NPV, IRR_lb, IRR_ub, inflation_rate=0.): #!!!
+    """
+    Solve IRR for a given NPV of a cash flow from the companion-matrix roots of
+    the NPV polynomial in the P/F factor; returns the lowest root within bounds.
+    """
+    coefficients = np.array(cashflow, dtype=float)
+    coefficients[0] -= NPV
+    roots = np.roots(coefficients[::-1])
+    roots = roots[(np.abs(roots.imag) <= 1e-9 * np.abs(roots)) & (roots.real > 0.)].real
+    IRRs = (1./roots) * (1.+inflation_rate) - 1.
+    IRRs = np.sort(IRRs[(IRRs >= IRR_lb) & (IRRs <= IRR_ub)])
+    if not IRRs.size: raise ValueError('no IRR within bounds')
+    return float(IRRs[0])
+
@@ -0,0 +1,715 @@
+# -*- coding: utf-8 -*-
+# teamod: Modules to enable techno-economic analysis (TEA) in Python.
+# Copyright (C) 2023-2024, Sarang S. Bhagwat <sarangb2@illinois.edu>
+#
+# This module is under the MIT open-source license. See
+# github.com/sarangbhagwat/teamod/LICENSE.txt
+# for license details.
+"""
+@author: sarangbhagwat
+Batch counterpart of the TEA class; evaluates many scenarios at once with
+2-D (scenario x year) NumPy arrays. Each operation mirrors the order of
+operations in _TEA.py so that results match the scalar TEA.
+"""
+import math
+import numpy as np
+from ._solvers import find_roots
+
+__all__ = ('TEABatch', 'get_batch_inputs', 'metric_names', 'get_payback_period', 'get_ROI')
+
+#: Names of scenario-wise (scalar per scenario) inputs.
+scenario_parameters = (
+    'IRR',
+    'purchase_cost',
+    'hourly_variable_operating_cost',
+    'inflation_rate',
+    'annual_operating_hours',
+    'income_tax',
+    'incentives',
+    'lang_factor',
+    'startup_months',
+    'startup_FOC_frac',
+    'startup_VOC_frac',
+    'startup_sales_frac',
+    'WC_over_FCI',
+    'finance_interest',
+    'finance_years',
+    'finance_fraction',
+    'property_tax',
+    'property_insurance',
+    'maintenance',
+    'administration',
+    'labor_cost',
+    'fringe_benefits',
+    'supplies',
+)
+
+#: Inputs of which each scenario has an array (one value per product).
+product_parameters = ('hourly_product_flows', 'product_prices')
+
+#: Kinds of solves available through TEABatch.solve.
+solve_kinds = ('NPV', 'IRR', 'MPSP')
+
+#: Metrics available through TEA.get_metrics and TEABatch.get_metrics.
+metric_names = ('NPV', 'IRR', 'MPSP', 'payback_period', 'discounted_payback_period', 'ROI')
+
+def get_metrics_dtype(metrics):
+    """Get the record dtype (one float field per metric) of the given metrics, checking their names."""
+    if isinstance(metrics, str): metrics = (metrics,)
+    metrics = tuple(metrics)
+    for i in metrics:
+        if i not in metric_names:
+            raise ValueError(f"metrics must be in {', '.join([repr(i) for i in metric_names])}, not {repr(i)}")
+    if len(set(metrics)) != len(metrics):
+        raise ValueError('metrics must not be repeated')
+    return np.dtype([(i, float) for i in metrics])
+
+def get_payback_period(cashflow):
+    """
+    Get the payback period (in years from year 0 of the project, interpolated
+    linearly within the year of payback) of (... x year) cash flows: the time at
+    which the cumulative cash flow first reaches zero, with the flow of year k at
+    time k (as in discounting). Cash flows that are never paid back give NaN.
+    Pass present values of cash flows for the discounted payback period.
+    """
+    cumulative = np.cumsum(cashflow, axis=-1)
+    paid_back = cumulative >= 0.
+    year = paid_back.argmax(axis=-1)[..., None]
+    previous = np.take_along_axis(cumulative, np.maximum(year - 1, 0), axis=-1)
+    flow = np.take_along_axis(cashflow, year, axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        period = np.where(year == 0, 0., year - 1 - previous / flow)[..., 0]
+    return np.where(paid_back.any(axis=-1), period, np.nan)
+
+def get_ROI(net_earnings, total_capital_investment, operating_year):
+    """
+    Get the return on investment: the mean annual net earnings (across the
+    last axis) from the given year of operation on (the startup year), over
+    the total capital investment.
+    """
+    return np.mean(net_earnings[..., operating_year:], axis=-1) / total_capital_investment
+
+def parse_parameter(name):
+    """
+    Return the input argument and index (or None) of a parameter that may vary
+    across scenarios, e.g., 'lang_factor' -> ('lang_factor', None) and
+    'product_prices[0]' -> ('product_prices', 0).
+    """
+    attribute, bracket, index = name.partition('[')
+    if bracket:
+        if attribute not in product_parameters or not index.endswith(']'):
+            raise ValueError(f"cannot index parameter {repr(name)}; only {', '.join(product_parameters)} may be indexed (e.g., 'product_prices[0]')")
+        return attribute, int(index[:-1])
+    elif attribute in scenario_parameters or attribute in product_parameters or attribute == 'hourly_fixed_operating_cost':
+        return attribute, None
+    else:
+        raise ValueError(f'{repr(name)} is not a parameter that may vary across scenarios; '
+                         'project_duration, construction_schedule, depreciation_schedule, and '
+                         'other_costs_across_project_duration are shared by all scenarios')
+
+def get_batch_inputs(inputs, parameter_values):
+    """
+    Get TEABatch input arguments from TEA input arguments (see TEA.get_inputs),
+    overriding parameters with arrays of scenario values. Parameters are named
+    as input arguments (e.g., 'lang_factor') or, for entries of product arrays,
+    with an index (e.g., 'product_prices[0]').
+    """
+    batch_inputs = dict(inputs)
+    for name, values in parameter_values.items():
+        attribute, index = parse_parameter(name)
+        if index is None:
+            batch_inputs[attribute] = values
+        else:
+            values = np.asarray(values, dtype=float)
+            array = np.asarray(batch_inputs[attribute], dtype=float)
+            array = np.array(np.broadcast_to(array, values.shape + array.shape[-1:]))
+            array[..., index] = values
+            batch_inputs[attribute] = array
+    return batch_inputs
+
+def as_scenario_array(value, name='value'):
+    """Return a float array that is either 0-D (shared by all scenarios) or 1-D (one value per scenario)."""
+    array = np.asarray(value, dtype=float)
+    if array.ndim > 1:
+        raise ValueError(f'{name} must be a scalar or a 1-D array of scenario values, not an array of shape {array.shape}.')
+    return array
+
+#: Elementwise power through the C library (as used for Python floats);
+#: NumPy's vectorized power may differ from it in the last bit.
+libm_power = np.frompyfunc(math.pow, 2, 1)
+
+def get_annualized_value(present_value, years, interest_rate):
+    """Get annualized values given present values, numbers of years from the present, and interest rates."""
+    P, n, i = np.broadcast_arrays(present_value, years, interest_rate)
+    F_by_P_factor = np.asarray(libm_power(1.+i, n), dtype=float)
+    return P * (i*F_by_P_factor)/(F_by_P_factor-1.)
+
+def as_column(array):
+    """Return a 1-D scenario array as a (scenario x 1) column; 0-D arrays are returned as is."""
+    return array if array.ndim == 0 else array[:, None]
+
+class TEABatch():
+    """
+    Create a TEABatch object to evaluate many TEA scenarios at once. Arguments
+    are the same as for TEA, except that any scenario-wise input (see
+    `scenario_parameters`) may be a 1-D array with one value per scenario and
+    `hourly_product_flows` and `product_prices` may be 2-D (scenario x product)
+    arrays. The `project_duration`, `construction_schedule`, and
+    `depreciation_schedule` are shared by all scenarios;
+    `other_costs_across_project_duration` and a list `depreciation_schedule`
+    may also be given as 2-D (scenario x year) arrays.
+
+    All flows are returned as 2-D (scenario x year) arrays and all results
+    as 1-D arrays with one value per scenario.
+
+    """
+
+    def __init__(
+                self,
+
+                IRR,
+                project_duration,
+
+                purchase_cost,
+                hourly_variable_operating_cost,
+
+                hourly_product_flows,
+                product_prices,
+
+                other_costs_across_project_duration = None,
+
+                hourly_fixed_operating_cost = None,
+
+                inflation_rate = 0.,
+
+                depreciation_schedule = 'Linear',
+
+                annual_operating_hours = 0.9 * 365 * 24,
+
+                income_tax = 0.35,
+                incentives = 0., # annual amount
+
+                lang_factor = 1.,
+                construction_schedule = [1.,],
+
+                startup_months = 6,
+                startup_FOC_frac = 0.1,
+                startup_VOC_frac =  0.1,
+                startup_sales_frac = 0.1,
+                WC_over_FCI = 0.05,
+
+                finance_interest = 0.05,
+                finance_years = 8,
+                finance_fraction = 0.2,
+
+                property_tax = 0.05,
+                property_insurance = 0.02,
+                maintenance = 0.04,
+                administration = 0.01,
+
+                labor_cost = 10 * 100_000,
+                fringe_benefits = 0.40,
+                supplies = 0.20,
+
+                ):
+        #: Project duration (years; shared by all scenarios).
+        self.project_duration = int(project_duration)
+
+        #: Depreciation schedule ('Linear' or a schedule of capital cost fractions across project duration; shared or scenario x year).
+        self.depreciation_schedule = depreciation_schedule
+
+        #: Construction schedule (capital cost fractions each year; shared by all scenarios).
+        self.construction_schedule = construction_schedule
+
+        #: Any other costs incurred over the project duration (shared or scenario x year).
+        self.other_costs_across_project_duration = other_costs_across_project_duration
+
+        #: Hourly fixed operating cost; scenarios with None, 0, or NaN are estimated as in TEA.FOC.
+        self.hourly_fixed_operating_cost = hourly_fixed_operating_cost
+
+        #: Product flows (product or scenario x product).
+        self.hourly_product_flows = hourly_product_flows
+
+        #: Product selling prices (product or scenario x product).
+        self.product_prices = product_prices
+
+        scenario_values = dict(
+            IRR=IRR,
+            purchase_cost=purchase_cost,
+            hourly_variable_operating_cost=hourly_variable_operating_cost,
+            inflation_rate=inflation_rate,
+            annual_operating_hours=annual_operating_hours,
+            income_tax=income_tax,
+            incentives=incentives,
+            lang_factor=lang_factor,
+            startup_months=startup_months,
+            startup_FOC_frac=startup_FOC_frac,
+            startup_VOC_frac=startup_VOC_frac,
+            startup_sales_frac=startup_sales_frac,
+            WC_over_FCI=WC_over_FCI,
+            finance_interest=finance_interest,
+            finance_years=finance_years,
+            finance_fraction=finance_fraction,
+            property_tax=property_tax,
+            property_insurance=property_insurance,
+            maintenance=maintenance,
+            administration=administration,
+            labor_cost=labor_cost,
+            fringe_benefits=fringe_benefits,
+            supplies=supplies,
+            )
+        for name, value in scenario_values.items():
+            setattr(self, name, value)
+
+    def __setattr__(self, name, value):
+        if name in scenario_parameters:
+            value = as_scenario_array(value, name)
+        elif name in ('hourly_product_flows', 'product_prices'):
+            value = np.asarray(value, dtype=float)
+        object.__setattr__(self, name, value)
+
+    @property
+    def size(self):
+        """Number of scenarios."""
+        shapes = [getattr(self, i).shape for i in scenario_parameters]
+        shapes.append(self.hourly_product_flows.shape[:-1])
+        shapes.append(self.product_prices.shape[:-1])
+        hourly_fixed_operating_cost = self.hourly_fixed_operating_cost
+        if hourly_fixed_operating_cost is not None:
+            shapes.append(np.shape(hourly_fixed_operating_cost))
+        for i in (self.other_costs_across_project_duration, self.depreciation_schedule):
+            if i is not None and not isinstance(i, str) and np.ndim(i) == 2:
+                shapes.append(np.shape(i)[:-1])
+        shape = np.broadcast_shapes(*shapes)
+        return shape[0] if shape else 1
+
+    @property
+    def years(self):
+        """Year indices across the project duration."""
+        return np.arange(self.project_duration)
+
+    def _full(self, flow):
+        """Return a read-only (scenario x year) view of a broadcastable flow."""
+        return np.broadcast_to(flow, (self.size, self.project_duration))
+
+    def _column(self, name):
+        return as_column(getattr(self, name))
+
+    def _padded_construction_schedule(self):
+        construction_schedule = np.asarray(self.construction_schedule, dtype=float)
+        padded = np.zeros(self.project_duration)
+        padded[:construction_schedule.size] = construction_schedule
+        return padded
+
+    @property
+    def startup_year(self):
+        """Year index of the end of construction (the following year is the startup year)."""
+        return len(self.construction_schedule) - 1
+
+    def _startup_factor_array(self, startup_frac):
+        """Get (scenario x year) factors of 0 during construction, the startup factor during startup, and 1 afterwards."""
+        startup_year = self.startup_year
+        startup_year_startup_portion = self._column('startup_months')/12
+        startup_year_factor = (startup_year_startup_portion * as_column(startup_frac)
+                               + (1-startup_year_startup_portion) * 1)
+        years = self.years
+        return np.where(years <= startup_year, 0.,
+                        np.where(years == startup_year + 1, startup_year_factor, 1.))
+
+    def get_overall_cashflow_array(self):
+        """Get the (scenario x year) cash flow in current dollars."""
+        # estimate depreciation
+        depreciation = self._get_depreciation_flow()
+
+        # estimate taxable cashflow
+        taxable_cashflow = - self._get_VOC_flow()
+        taxable_cashflow = taxable_cashflow - self._get_FOC_flow()
+        taxable_cashflow = taxable_cashflow - self._get_other_costs_across_project_duration_flow()
+        taxable_cashflow = taxable_cashflow - self._get_loan_payments_flow()
+        taxable_cashflow = taxable_cashflow - depreciation
+        taxable_cashflow = taxable_cashflow + self._get_sales_flow()
+        self.taxable_cashflow = taxable_cashflow = self._full(taxable_cashflow)
+
+        # estimate tax
+        self.tax_flow = tax_flow = np.where(taxable_cashflow > 0,
+                                            self._column('income_tax') * taxable_cashflow,
+                                            0.)
+
+        # estimate net earnings
+        self.net_earnings = net_earnings = taxable_cashflow + self._get_incentives_flow() - tax_flow
+
+        # estimate nontaxable cashflow
+        nontaxable_cashflow = depreciation + self._get_loan_principal_flow()
+        nontaxable_cashflow = nontaxable_cashflow - self._get_FCI_flow()
+        nontaxable_cashflow = nontaxable_cashflow - self._get_working_capital_flow()
+        self.nontaxable_cashflow = nontaxable_cashflow = self._full(nontaxable_cashflow)
+
+        # total cashflow
+        return net_earnings + nontaxable_cashflow
+
+    @property
+    def discount_rate(self):
+        """Get the inflation-adjusted discount rate of each scenario."""
+        return (1.+self.IRR)/(1.+self.inflation_rate) - 1.
+
+    @property
+    def P_over_F_factor_array(self):
+        """Get a (scenario x year) array of P/F factors."""
+        return self._full(1/(1.+as_column(self.discount_rate))**self.years)
+
+    def get_NPV_given_IRR(self, IRR=None):
+        """Get the NPV of each scenario at a given IRR (defaults to the current IRR)."""
+        if IRR is not None: self.IRR = IRR
+        # get total casfhlow as present value
+        self.present_value_cashflow = present_value_cashflow =\
+            self.get_overall_cashflow_array() * self.P_over_F_factor_array
+        # get net present value
+        return present_value_cashflow.sum(axis=1)
+
+    def get_cashflow_components(self, IRR=None):
+        """
+        Get a dictionary of (scenario x year) arrays of each component of the
+        cash flow report (see TEA.get_cashflow_report) at a given IRR
+        (defaults to the current IRR), in order of `cashflow_components`.
+        """
+        self.get_NPV_given_IRR(IRR)
+        present_value_cashflow = self.present_value_cashflow
+        return {
+            'Fixed capital investment': self.get_FCI_flow(),
+            'Working capital': self.get_working_capital_flow(),
+            'Fixed operating cost': self.get_FOC_flow(),
+            'Variable operating cost': self.get_VOC_flow(),
+            'Other costs': self.get_other_costs_across_project_duration_flow(),
+            'Loan': self.get_loan_principal_flow(),
+            'Loan interest-only payment': self.get_loan_interest_only_payments_flow(),
+            'Loan payment': self.get_loan_payments_flow(),
+            'Tax': self.tax_flow,
+            'Incentives': self.get_incentives_flow(),
+            'Sales': self.get_sales_flow(),
+            'Net earnings': self.net_earnings,
+            'Cash flow': self.net_earnings + self.nontaxable_cashflow,
+            'Discount factor': self.P_over_F_factor_array,
+            'Net present value': present_value_cashflow,
+            'Cumulative net present value': present_value_cashflow.cumsum(axis=1),
+            }
+
+    def _scenario_values(self, value):
+        return np.broadcast_to(value, (self.size,))
+
+    def get_IRR_given_NPV(self,
+                          NPV=0.,
+                          IRR_lb=0.,
+                          IRR_ub=10.,
+                          method='illinois',
+                          xtol=1e-5,
+                          maxiter=100,
+                          full_output=False):
+        """
+        Get the IRR of each scenario for a given NPV (scalar or one per scenario).
+        The cash flow is built once and all scenarios are solved together with
+        an array-valued bracketed root finder ('illinois' or 'bisect');
+        bounds may also be given per scenario. Scenarios that fail to solve
+        are NaN; if full_output is True, a RootResults object with per-scenario
+        status codes is also returned. The TEABatch inputs are not modified.
+        """
+        cashflow = self.get_overall_cashflow_array()
+        results = self._solve_IRR(cashflow, NPV, IRR_lb, IRR_ub, method, xtol, maxiter)
+        return (results.root, results) if full_output else results.root
+
+    def _solve_IRR(self, cashflow, NPV, IRR_lb, IRR_ub, method, xtol, maxiter):
+        """Solve the IRR of each scenario for a given NPV from a prebuilt (scenario x year) cash flow; returns a RootResults object."""
+        cashflow = np.ascontiguousarray(cashflow)
+        inflation_rate = self._scenario_values(self.inflation_rate)
+        NPV = self._scenario_values(NPV)
+        years = self.years
+        def objective_func(IRR, index):
+            discount_rate = (1.+IRR)/(1.+inflation_rate[index]) - 1.
+            P_over_F_factor_array = 1/(1.+discount_rate[:, None])**years
+            return (cashflow[index] * P_over_F_factor_array).sum(axis=1) - NPV[index]
+        return find_roots(objective_func, IRR_lb, IRR_ub, method,
+                          xtol=xtol, maxiter=maxiter, size=self.size)
+
+    def solve(self, kind, IRR=None, NPV=0., product_index=0, **kwargs):
+        """
+        Solve the NPV at the IRR, the IRR given the NPV, or the MPSP at the IRR
+        given the NPV (kind 'NPV', 'IRR', or 'MPSP') of each scenario. The IRR
+        defaults to the current IRR; further keyword arguments are passed to the solve.
+        """
+        if kind == 'NPV':
+            return self.get_NPV_given_IRR(IRR, **kwargs)
+        elif kind == 'IRR':
+            return self.get_IRR_given_NPV(NPV, **kwargs)
+        elif kind == 'MPSP':
+            return self.get_MPSP_given_IRR(IRR, product_index, NPV, **kwargs)
+        else:
+            raise ValueError(f"kind must be one of {', '.join([repr(i) for i in solve_kinds])}, not {repr(kind)}")
+
+    def get_price_decomposition(self, product_index=0):
+        """
+        Get (scenario x year) arrays of the taxable cash flow at a zero price of
+        the given product, the taxable cash flow per unit price of the product,
+        and the remaining (price- and tax-independent) cash flow
+        (see TEA.get_price_decomposition).
+        """
+        product_prices = self.product_prices
+        try:
+            prices = product_prices.copy()
+            prices[..., product_index] = 0.
+            self.product_prices = prices
+            self.get_overall_cashflow_array()
+            price_independent = self.taxable_cashflow
+            other = self._full(self._get_incentives_flow() + self.nontaxable_cashflow)
+            unit_prices = np.zeros_like(product_prices)
+            unit_prices[..., product_index] = 1.
+            self.product_prices = unit_prices
+            per_unit_price = self._full(self._get_sales_flow())
+        finally:
+            self.product_prices = product_prices
+        return price_independent, per_unit_price, other
+
+    def get_MPSP_given_IRR(self,
+                           IRR=None,
+                           product_index=0,
+                           desired_NPV=0.,
+                           MPSP_lb=0.,
+                           MPSP_ub=100.,
+                           method='illinois',
+                           xtol=1e-5,
+                           maxiter=100,
+                           full_output=False):
+        """
+        Get the MPSP of each scenario at a given IRR (defaults to the current IRR).
+        Price-independent cash flows are built once, so each iteration only
+        re-evaluates sales and tax. All scenarios are solved together with an
+        array-valued bracketed root finder ('illinois' or 'bisect'); bounds
+        may also be given per scenario. Scenarios that fail to solve are NaN;
+        if full_output is True, a RootResults object with per-scenario status
+        codes is also returned. The TEABatch inputs are not modified.
+        """
+        if IRR is None: IRR = self.IRR
+        decomposition = self.get_price_decomposition(product_index)
+        results = self._solve_MPSP(decomposition, IRR, desired_NPV, MPSP_lb, MPSP_ub, method, xtol, maxiter)
+        return (results.root, results) if full_output else results.root
+
+    def _solve_MPSP(self, decomposition, IRR, desired_NPV, MPSP_lb, MPSP_ub, method, xtol, maxiter):
+        """Solve the MPSP of each scenario from a price decomposition (see get_price_decomposition); returns a RootResults object."""
+        price_independent, per_unit_price, other = decomposition
+        discount_rate = (1.+as_scenario_array(IRR, 'IRR'))/(1.+self.inflation_rate) - 1.
+        P_over_F_factor_array = self._full(1/(1.+as_column(discount_rate))**self.years)
+        income_tax = self._scenario_values(self.income_tax)
+        desired_NPV = self._scenario_values(desired_NPV)
+        def objective_func(price, index):
+            taxable_cashflow = price_independent[index] + per_unit_price[index] * price[:, None]
+            tax_flow = np.where(taxable_cashflow > 0,
+                                income_tax[index, None] * taxable_cashflow,
+                                0.)
+            cashflow = taxable_cashflow - tax_flow + other[index]
+            return (cashflow * P_over_F_factor_array[index]).sum(axis=1) - desired_NPV[index]
+        return find_roots(objective_func, MPSP_lb, MPSP_ub, method,
+                          xtol=xtol, maxiter=maxiter, size=self.size)
+
+    def get_metrics(self,
+                    metrics=metric_names,
+                    IRR=None,
+                    NPV=0.,
+                    product_index=0,
+                    IRR_lb=0.,
+                    IRR_ub=10.,
+                    MPSP_lb=0.,
+                    MPSP_ub=100.,
+                    method='illinois',
+                    xtol=1e-5,
+                    maxiter=100):
+        """
+        Get a record array (one record per scenario) of the given metrics
+        (see `metric_names`) from a single build of the cash flow: the NPV at
+        the IRR, the IRR given the NPV, the MPSP at the IRR given the NPV,
+        the simple and discounted payback periods (see get_payback_period;
+        discounted at the IRR), and the ROI (see get_ROI). The IRR defaults to
+        the current IRR; bounds, method, xtol, and maxiter are as in
+        get_IRR_given_NPV and get_MPSP_given_IRR. Metrics that cannot be
+        solved are NaN. The TEABatch inputs are not modified.
+        """
+        dtype = get_metrics_dtype(metrics)
+        metrics = dtype.names
+        if IRR is None: IRR = self.IRR
+        records = np.empty(self.size, dtype).view(np.recarray)
+        cashflow = self.get_overall_cashflow_array()
+        if 'IRR' in metrics:
+            records['IRR'] = self._solve_IRR(cashflow, NPV, IRR_lb, IRR_ub, method, xtol, maxiter).root
+        if 'MPSP' in metrics:
+            # the price decomposition (see get_price_decomposition) without rebuilding the cash flow
+            per_unit_price = self._full(self._get_unit_sales_flow(product_index))
+            price = as_column(self._scenario_values(self.product_prices[..., product_index]))
+            decomposition = (
+                self.taxable_cashflow - price * per_unit_price,
+                per_unit_price,
+                self._full(self._get_incentives_flow() + self.nontaxable_cashflow),
+                )
+            records['MPSP'] = self._solve_MPSP(decomposition, IRR, NPV, MPSP_lb, MPSP_ub, method, xtol, maxiter).root
+        if 'payback_period' in metrics:
+            records['payback_period'] = get_payback_period(cashflow)
+        if 'NPV' in metrics or 'discounted_payback_period' in metrics:
+            discount_rate = (1.+as_scenario_array(IRR, 'IRR'))/(1.+self.inflation_rate) - 1.
+            present_value_cashflow = cashflow * (1/(1.+as_column(discount_rate))**self.years)
+            if 'NPV' in metrics:
+                records['NPV'] = present_value_cashflow.sum(axis=1)
+            if 'discounted_payback_period' in metrics:
+                records['discounted_payback_period'] = get_payback_period(present_value_cashflow)
+        if 'ROI' in metrics:
+            total_capital_investment = self.FCI * (1. + self.WC_over_FCI)
+            records['ROI'] = get_ROI(self.net_earnings, total_capital_investment, self.startup_year + 1)
+        return records
+
+    @property
+    def FCI(self):
+        """Get the fixed capital investment of each scenario."""
+        return self.purchase_cost * self.lang_factor
+
+    def _get_FCI_flow(self):
+        return as_column(self.FCI) * self._padded_construction_schedule()
+
+    def get_FCI_flow(self):
+        """Get the (scenario x year) cash flow of fixed capital investment."""
+        return self._full(self._get_FCI_flow())
+
+    @property
+    def FOC(self):
+        """Get the annual fixed operating cost of each scenario."""
+        estimated_FOC = (self.FCI*(self.property_tax + self.property_insurance
+                                   + self.maintenance + self.administration)
+                         + self.labor_cost*(1+self.fringe_benefits+self.supplies))
+        hourly_fixed_operating_cost = self.hourly_fixed_operating_cost
+        if hourly_fixed_operating_cost is None:
+            return estimated_FOC
+        hourly_fixed_operating_cost = as_scenario_array(hourly_fixed_operating_cost, 'hourly_fixed_operating_cost')
+        specified = (hourly_fixed_operating_cost != 0) & ~np.isnan(hourly_fixed_operating_cost)
+        return np.where(specified,
+                        hourly_fixed_operating_cost * self.annual_operating_hours,
+                        estimated_FOC)
+
+    def _get_FOC_flow(self):
+        return as_column(self.FOC) * self._startup_factor_array(self.startup_FOC_frac)
+
+    def get_FOC_flow(self):
+        """Get the (scenario x year) cash flow of fixed operating costs."""
+        return self._full(self._get_FOC_flow())
+
+    @property
+    def VOC(self):
+        """Get the annual variable operating cost of each scenario."""
+        return self.hourly_variable_operating_cost * self.annual_operating_hours
+
+    def _get_VOC_flow(self):
+        return as_column(self.VOC) * self._startup_factor_array(self.startup_VOC_frac)
+
+    def get_VOC_flow(self):
+        """Get the (scenario x year) cash flow of variable operating costs."""
+        return self._full(self._get_VOC_flow())
+
+    @property
+    def sales(self):
+        """Get annual sales of each product (product or scenario x product)."""
+        return self.product_prices * self.hourly_product_flows *\
+            as_column(self.annual_operating_hours)
+
+    def _get_sales_flow(self):
+        product_sales = self.sales
+        sales = 0
+        for i in range(product_sales.shape[-1]): sales = sales + product_sales[..., i]
+        return as_column(np.asarray(sales)) * self._startup_factor_array(self.startup_sales_frac)
+
+    def _get_unit_sales_flow(self, product_index):
+        """Get the cash flow of sales of a product per unit price."""
+        unit_sales = self.hourly_product_flows[..., product_index] * self.annual_operating_hours
+        return as_column(np.asarray(unit_sales)) * self._startup_factor_array(self.startup_sales_frac)
+
+    def get_sales_flow(self):
+        """Get the (scenario x year) cash flow of sales."""
+        return self._full(self._get_sales_flow())
+
+    def _get_depreciation_flow(self):
+        depreciation_schedule = self.depreciation_schedule
+        total_depreciable_capital = as_column(self.FCI)
+        if isinstance(depreciation_schedule, str):
+            if depreciation_schedule != 'Linear':
+                raise ValueError(f"depreciation_schedule must be 'Linear' or a schedule of capital cost fractions, not {repr(depreciation_schedule)}.")
+            annual_depreciation_fraction = 1/self.project_duration
+            return annual_depreciation_fraction * total_depreciable_capital *\
+                np.ones(self.project_duration)
+        return np.asarray(depreciation_schedule, dtype=float) * total_depreciable_capital
+
+    def get_depreciation_flow(self):
+        """Get the (scenario x year) cash flow of depreciation."""
+        return self._full(self._get_depreciation_flow())
+
+    @property
+    def loan_principal(self):
+        """Get the loan principal of each scenario."""
+        return self.finance_fraction * self.FCI
+
+    def _get_loan_principal_flow(self):
+        return as_column(self.loan_principal) * self._padded_construction_schedule()
+
+    def get_loan_principal_flow(self):
+        """Get the (scenario x year) cash flow of loan principal revenue."""
+        return self._full(self._get_loan_principal_flow())
+
+    @property
+    def loan_payment_start_year(self):
+        """Get the year loan payments start for each scenario."""
+        return np.minimum(len(self.construction_schedule), self.finance_years)
+
+    def _get_loan_interest_only_payments_flow(self):
+        years = self.years
+        loan_principal_flow = self._full(self._get_loan_principal_flow())
+        current_loan_principal = np.cumsum(loan_principal_flow, axis=1)
+        return np.where(years < as_column(self.loan_payment_start_year),
+                        self._column('finance_interest') * current_loan_principal,
+                        0.)
+
+    def get_loan_interest_only_payments_flow(self):
+        """Get the (scenario x year) cash flow of loan interest-only payments."""
+        return self._full(self._get_loan_interest_only_payments_flow())
+
+    def _get_loan_payments_flow(self):
+        years = self.years
+        finance_interest = self._column('finance_interest')
+        finance_years = self._column('finance_years')
+        loan_amount = self._column('finance_fraction') * as_column(self.FCI)
+        loan_payment_start_year = as_column(self.loan_payment_start_year)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            yearly_loan_payment = get_annualized_value(loan_amount,
+                                                       finance_years-loan_payment_start_year,
+                                                       finance_interest)
+        flow = np.where((years >= loan_payment_start_year) & (years < finance_years),
+                        yearly_loan_payment, 0.)
+        return flow + self._get_loan_interest_only_payments_flow()
+
+    def get_loan_payments_flow(self):
+        """Get the (scenario x year) cash flow of all loan payments."""
+        return self._full(self._get_loan_payments_flow())
+
+    def _get_incentives_flow(self):
+        return self._column('incentives') * np.ones(self.project_duration)
+
+    def get_incentives_flow(self):
+        """Get the (scenario x year) cash flow of tax incentives."""
+        return self._full(self._get_incentives_flow())
+
+    def _get_working_capital_flow(self):
+        return np.where(self.years == 0, as_column(self.WC_over_FCI * self.FCI), 0.)
+
+    def get_working_capital_flow(self):
+        """Get the (scenario x year) cash flow of working capital."""
+        return self._full(self._get_working_capital_flow())
+
+    def _get_other_costs_across_project_duration_flow(self):
+        other_costs = self.other_costs_across_project_duration
+        if other_costs is None:
+            return np.zeros(self.project_duration)
+        return np.asarray(other_costs, dtype=float)
+
+    def get_other_costs_across_project_duration_flow(self):
+        """Get the (scenario x year) cash flow of other user-specified costs."""
+        return self._full(self._get_other_costs_across_project_duration_flow())
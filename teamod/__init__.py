@@ -12,9 +12,73 @@ __author__ = 'Sarang S. Bhagwat'
 # %% Initialize pyTEA 
 
 from . import _TEA
+from . import _TEABatch
+from . import _solvers
+from . import _uncertainty
+from . import _sensitivity
+from . import _parallel
+from . import _cache
+from . import _streaming
+from . import _store
+from . import _result
+from . import _sweep
+from . import _surrogate
+from . import _instrumentation
+from . import _portfolio
 
 TEA = _TEA.TEA
+TEABatch = _TEABatch.TEABatch
+RootResults = _solvers.RootResults
+find_roots = _solvers.find_roots
+UncertaintyAnalysis = _uncertainty.UncertaintyAnalysis
+Uniform = _uncertainty.Uniform
+Triangle = _uncertainty.Triangle
+Normal = _uncertainty.Normal
+Lognormal = _uncertainty.Lognormal
+StreamingStatistics = _uncertainty.StreamingStatistics
+SensitivityAnalysis = _sensitivity.SensitivityAnalysis
+ScenarioRunner = _parallel.ScenarioRunner
+ResultCache = _cache.ResultCache
+StreamingPipeline = _streaming.StreamingPipeline
+CashflowStore = _store.CashflowStore
+TEAResult = _result.TEAResult
+ParameterSweep = _sweep.ParameterSweep
+Surrogate = _surrogate.Surrogate
+Instrumentation = _instrumentation.Instrumentation
+ProfilerHook = _instrumentation.ProfilerHook
+CallbackHook = _instrumentation.CallbackHook
+Portfolio = _portfolio.Portfolio
 
 __all__ = (
     'TEA',
+    'TEABatch',
+    'RootResults',
+    'find_roots',
+    'UncertaintyAnalysis',
+    'Uniform',
+    'Triangle',
+    'Normal',
+    'Lognormal',
+    'StreamingStatistics',
+    'SensitivityAnalysis',
+    'ScenarioRunner',
+    'ResultCache',
+    'StreamingPipeline',
+    'CashflowStore',
+    'TEAResult',
+    'EvaluationServer',
+    'EvaluationClient',
+    'ParameterSweep',
+    'Surrogate',
+    'Instrumentation',
+    'ProfilerHook',
+    'CallbackHook',
+    'Portfolio',
 )
+
+def __getattr__(name):
+    # the evaluation server (and asyncio) is only loaded when used
+    if name in ('EvaluationServer', 'EvaluationClient'):
+        from . import _server
+        return getattr(_server, name)
+    raise AttributeError(f'module {repr(__name__)} has no attribute {repr(name)}')
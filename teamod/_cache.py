@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+# teamod: Modules to enable techno-economic analysis (TEA) in Python.
+# Copyright (C) 2023-2024, Sarang S. Bhagwat <sarangb2@illinois.edu>
+#
+# This module is under the MIT open-source license. See
+# github.com/sarangbhagwat/teamod/LICENSE.txt
+# for license details.
+"""
+@author: sarangbhagwat
+Persistent, content-addressed cache of TEA results. Results are keyed by a
+canonical hash of all TEA inputs and solve arguments and kept in an
+in-memory LRU tier and, optionally, an on-disk SQLite tier.
+"""
+import json
+import time
+import pickle
+import hashlib
+import numbers
+import numpy as np
+from collections import OrderedDict
+
+__all__ = ('ResultCache', 'canonicalize', 'get_key')
+
+#: Version of cached results; bump to invalidate results computed by older versions.
+cache_version = 2
+
+def canonicalize(value):
+    """
+    Return a JSON-serializable canonical form of a TEA input or solve argument.
+    Numbers are compared by value (e.g., 8 and 8.0 are the same), sequences
+    (lists, tuples, and arrays) by their items, and dictionaries by sorted keys.
+    """
+    if value is None or isinstance(value, (str, bool)):
+        return value
+    elif isinstance(value, numbers.Real):
+        return float(value).hex()
+    elif isinstance(value, dict):
+        return [[str(i), canonicalize(value[i])] for i in sorted(value)]
+    elif isinstance(value, (list, tuple, np.ndarray)):
+        return [canonicalize(i) for i in value]
+    else:
+        raise TypeError(f'cannot canonicalize {type(value).__name__} object {repr(value)}')
+
+def get_key(kind, inputs, **arguments):
+    """Get the key (a SHA-256 hex digest) of a result of the given kind from TEA input arguments and solve arguments."""
+    content = json.dumps([cache_version, kind, canonicalize(inputs), canonicalize(arguments)],
+                         separators=(',', ':'))
+    return hashlib.sha256(content.encode()).hexdigest()
+
+class ResultCache():
+    """
+    Create a ResultCache object to reuse TEA results across evaluations (and,
+    with a path, across sessions). Results are kept in an in-memory tier with
+    least-recently-used eviction and, if a path is given, in an SQLite
+    database whose least-recently-used results are evicted once their total
+    size exceeds `max_disk_size`. Caching is opt-in: assign a ResultCache to
+    TEA.result_cache (for all TEA objects) or to the result_cache attribute
+    of a TEA object.
+
+    Parameters
+    ----------
+    maxsize : int
+        Maximum number of results kept in memory.
+    path : str
+        Path of the SQLite database; if None, results are only kept in memory.
+    max_disk_size : int
+        Maximum total size (bytes) of the results stored on disk.
+
+    Examples
+    --------
+    >>> teamod.TEA.result_cache = teamod.ResultCache(path='teamod_results.sqlite')
+    >>> example_TEA.get_MPSP_given_IRR(IRR=0.10) # solved
+    >>> example_TEA.get_MPSP_given_IRR(IRR=0.10) # reused
+    >>> teamod.TEA.result_cache.stats
+
+    """
+
+    def __init__(self, maxsize=1024, path=None, max_disk_size=256 * 1024**2):
+        #: Maximum number of results kept in memory.
+        self.maxsize = maxsize
+
+        #: Path of the SQLite database (None if results are only kept in memory).
+        self.path = path
+
+        #: Maximum total size (bytes) of the results stored on disk.
+        self.max_disk_size = max_disk_size
+
+        self._memory = OrderedDict()
+        self._connection = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Reset hit and miss statistics."""
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.memory_evictions = 0
+        self.disk_evictions = 0
+
+    @property
+    def hits(self):
+        """Number of results found in either tier."""
+        return self.memory_hits + self.disk_hits
+
+    @property
+    def stats(self):
+        """Dictionary of hit and miss statistics."""
+        hits = self.hits
+        lookups = hits + self.misses
+        return {
+            'hits': hits,
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': hits / lookups if lookups else np.nan,
+            'memory_evictions': self.memory_evictions,
+            'disk_evictions': self.disk_evictions,
+            'memory_size': len(self._memory),
+            'disk_size': self.disk_size,
+            }
+
+    def _get_connection(self):
+        connection = self._connection
+        if connection is None and self.path is not None:
+            import sqlite3
+            self._connection = connection = sqlite3.connect(self.path)
+            connection.execute('CREATE TABLE IF NOT EXISTS results '
+                               '(key TEXT PRIMARY KEY, value BLOB, size INTEGER, accessed REAL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS accessed_index ON results (accessed)')
+            connection.commit()
+        return connection
+
+    @property
+    def disk_size(self):
+        """Total size (bytes) of the results stored on disk."""
+        connection = self._get_connection()
+        if connection is None: return 0
+        return connection.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+
+    get_key = staticmethod(get_key)
+
+    def get(self, key, default=None):
+        """Get a result by key, or the default if it is not cached."""
+        memory = self._memory
+        if key in memory:
+            memory.move_to_end(key)
+            self.memory_hits += 1
+            return memory[key]
+        connection = self._get_connection()
+        if connection is not None:
+            row = connection.execute('SELECT value FROM results WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                connection.execute('UPDATE results SET accessed = ? WHERE key = ?', (time.time(), key))
+                connection.commit()
+                self.disk_hits += 1
+                value = pickle.loads(row[0])
+                self._set_in_memory(key, value)
+                return value
+        self.misses += 1
+        return default
+
+    def set(self, key, value):
+        """Cache a result by key."""
+        self._set_in_memory(key, value)
+        connection = self._get_connection()
+        if connection is not None:
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            connection.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)',
+                               (key, blob, len(blob), time.time()))
+            self._evict_from_disk(connection)
+            connection.commit()
+
+    def _set_in_memory(self, key, value):
+        memory = self._memory
+        memory[key] = value
+        memory.move_to_end(key)
+        while len(memory) > self.maxsize:
+            memory.popitem(last=False)
+            self.memory_evictions += 1
+
+    def _evict_from_disk(self, connection):
+        excess = self.disk_size - self.max_disk_size
+        if excess <= 0: return
+        evicted = []
+        for key, size in connection.execute('SELECT key, size FROM results ORDER BY accessed'):
+            if excess <= 0: break
+            evicted.append((key,))
+            excess -= size
+        connection.executemany('DELETE FROM results WHERE key = ?', evicted)
+        self.disk_evictions += len(evicted)
+
+    def clear(self):
+        """Remove all cached results from memory and disk."""
+        self._memory.clear()
+        connection = self._get_connection()
+        if connection is not None:
+            connection.execute('DELETE FROM results')
+            connection.commit()
+
+    def close(self):
+        """Close the connection to the SQLite database."""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_connection'] = None
+        return state
+
+    def __repr__(self):
+        return f'<{type(self).__name__}: {self.hits} hits, {self.misses} misses>'
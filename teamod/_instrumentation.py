@@ -0,0 +1,375 @@
+# -*- coding: utf-8 -*-
+# teamod: Modules to enable techno-economic analysis (TEA) in Python.
+# Copyright (C) 2023-2024, Sarang S. Bhagwat <sarangb2@illinois.edu>
+#
+# This module is under the MIT open-source license. See
+# github.com/sarangbhagwat/teamod/LICENSE.txt
+# for license details.
+"""
+@author: sarangbhagwat
+Opt-in instrumentation of scalar TEA solves: objective function calls,
+bracket widths of Brent's method, wall time of each cash flow component,
+memory allocated, and the time to write cash flow reports. Methods are
+wrapped on attached TEA objects only, so TEA objects that are not attached
+run the same code as without instrumentation.
+"""
+import time
+import inspect
+from ._TEA import TEA
+
+__all__ = ('Instrumentation', 'SolveRecord', 'FlowStats', 'InstrumentationHook',
+           'ProfilerHook', 'CallbackHook')
+
+#: Methods of TEA wrapped by Instrumentation, by kind of record.
+solve_methods = {
+    'NPV': 'get_NPV_given_IRR',
+    'IRR': 'get_IRR_given_NPV',
+    'MPSP': 'get_MPSP_given_IRR',
+    'cashflow_report': 'get_cashflow_report',
+    }
+
+class SolveRecord():
+    """Statistics of one solve (or cash flow report) of an instrumented TEA object."""
+
+    def __init__(self, kind, method, depth):
+        #: 'NPV', 'IRR', 'MPSP', or 'cashflow_report'.
+        self.kind = kind
+
+        #: Solver method (e.g., 'brentq'; None for NPV and reports).
+        self.method = method
+
+        #: Number of solves this one is nested in (e.g., an NPV solve for a report).
+        self.depth = depth
+
+        #: Number of objective function evaluations.
+        self.function_calls = 0
+
+        #: Number of evaluations of the overall cash flow.
+        self.cashflow_evaluations = 0
+
+        #: Width of the bracket around the root at each iteration of Brent's method.
+        self.bracket_widths = []
+
+        #: Wall time (s) spent computing each component flow by method name (nested flows are included in the time of their parents).
+        self.flow_times = {}
+
+        #: Number of component flows taken from the flow cache.
+        self.flow_cache_hits = 0
+
+        #: Peak memory (bytes) allocated during the solve (if tracked).
+        self.allocated_bytes = None
+
+        #: Wall time (s) of the solve.
+        self.time = 0.
+
+        #: Whether the solve raised an exception.
+        self.failed = False
+
+        self._counting = False # whether NPV evaluations are objective function calls
+
+    @property
+    def iterations(self):
+        """Number of iterations of Brent's method."""
+        return len(self.bracket_widths)
+
+    @property
+    def allocated_bytes_per_evaluation(self):
+        """Peak memory (bytes) allocated per cash flow evaluation (if tracked)."""
+        if self.allocated_bytes is None or not self.cashflow_evaluations: return None
+        return self.allocated_bytes / self.cashflow_evaluations
+
+    def __repr__(self):
+        method = f', {self.method}' if self.method else ''
+        return (f'<{type(self).__name__} ({self.kind}{method}): {self.function_calls} function calls, '
+                f'{self.time * 1e3:.3g} ms>')
+
+class FlowStats():
+    """Cumulative statistics of a component flow (get_*_flow method) of instrumented TEA objects."""
+
+    def __init__(self):
+        #: Number of times the flow was requested.
+        self.calls = 0
+
+        #: Number of times the flow was computed (not taken from the flow cache).
+        self.computed = 0
+
+        #: Total wall time (s) spent computing the flow.
+        self.time = 0.
+
+    def __repr__(self):
+        return f'<{type(self).__name__}: {self.computed}/{self.calls} computed, {self.time * 1e3:.3g} ms>'
+
+class InstrumentationHook():
+    """
+    Base class of hooks of Instrumentation. Hooks are started before and
+    stopped after each top-level solve (nested solves, e.g., the NPV solve
+    of a cash flow report without a result, are part of their parent).
+    """
+
+    def start(self, record):
+        """Called before a solve with its (empty) SolveRecord."""
+
+    def stop(self, record):
+        """Called after a solve with its SolveRecord."""
+
+class ProfilerHook(InstrumentationHook):
+    """
+    Profile each solve with cProfile. Use `print_stats` (or `profile`, a
+    cProfile.Profile object) to see where the time of all solves went.
+    """
+
+    def __init__(self):
+        import cProfile
+        #: cProfile.Profile object active during solves.
+        self.profile = cProfile.Profile()
+
+    def start(self, record):
+        self.profile.enable()
+
+    def stop(self, record):
+        self.profile.disable()
+
+    def print_stats(self, sort='cumulative', limit=20):
+        """Print the profile of all solves so far, sorted by the given key (see pstats.Stats.sort_stats)."""
+        import pstats
+        pstats.Stats(self.profile).sort_stats(sort).print_stats(limit)
+
+class CallbackHook(InstrumentationHook):
+    """Call a function (e.g., to publish metrics) with the SolveRecord of each solve."""
+
+    def __init__(self, function):
+        #: Function called with each SolveRecord.
+        self.function = function
+
+    def stop(self, record):
+        self.function(record)
+
+class Instrumentation():
+    """
+    Create an Instrumentation object to record statistics of the solves of
+    attached TEA objects: objective function calls and cash flow evaluations,
+    the bracket width at each iteration of Brent's method, wall time of each
+    component flow (get_*_flow method) and of cash flow reports, and
+    (optionally) the peak memory allocated per solve, as traced by
+    tracemalloc. Each solve (get_NPV_given_IRR, get_IRR_given_NPV,
+    get_MPSP_given_IRR, or get_cashflow_report) adds a SolveRecord to
+    `records`, and component flows are tallied in `flows`.
+
+    Instrumentation wraps methods of attached TEA objects only (and detaching
+    restores them), so TEA objects that are not attached have no overhead.
+    Batched solves (TEABatch, TEA.evaluate) are not instrumented. Tracking
+    memory slows solves down considerably.
+
+    Parameters
+    ----------
+    hooks : iterable
+        InstrumentationHook objects (e.g., ProfilerHook or CallbackHook) started
+        and stopped around each top-level solve.
+    track_allocations : bool
+        Whether to record the peak memory allocated during each solve.
+
+    Examples
+    --------
+    >>> profiler = teamod.ProfilerHook()
+    >>> with teamod.Instrumentation(hooks=[profiler]).attach(example_TEA) as instrumentation:
+    >>>     example_TEA.get_MPSP_given_IRR(0.10)
+    >>> instrumentation.records[-1].bracket_widths
+    >>> instrumentation.summary()
+    >>> profiler.print_stats()
+
+    """
+
+    def __init__(self, hooks=(), track_allocations=False):
+        #: Hooks started and stopped around each top-level solve.
+        self.hooks = list(hooks)
+
+        #: Whether to record the peak memory allocated during each solve.
+        self.track_allocations = track_allocations
+
+        #: SolveRecord of each solve in order of completion.
+        self.records = []
+
+        #: FlowStats by component flow method name.
+        self.flows = {}
+
+        self._active = [] # records of solves in progress, innermost last
+        self._attached = {} # original attributes by TEA object ID
+
+    def reset(self):
+        """Clear all records and flow statistics."""
+        self.records.clear()
+        self.flows.clear()
+
+    def attach(self, tea):
+        """
+        Instrument a TEA object; returns this Instrumentation object (a context
+        manager that detaches all TEA objects on exit). Copies and pickles of
+        an attached TEA object are not instrumented.
+        """
+        if not isinstance(tea, TEA):
+            raise ValueError(f'can only instrument TEA objects, not {type(tea).__name__} objects')
+        if id(tea) in self._attached: return self
+        if '_instrumented_methods' in tea.__dict__:
+            raise ValueError('TEA object is already attached to another Instrumentation object')
+        wrappers = {j: self._wrap_solve(tea, i, j) for i, j in solve_methods.items()}
+        wrappers['_get_MPSP_given_IRR'] = self._wrap_objective_solve(tea._get_MPSP_given_IRR)
+        wrappers['_get_NPV_given_IRR'] = self._wrap_objective(tea._get_NPV_given_IRR)
+        wrappers['_compute_overall_cashflow'] = self._wrap_cashflow(tea._compute_overall_cashflow)
+        wrappers['_get_cached_flow'] = self._wrap_flow(tea, tea._get_cached_flow)
+        wrappers['_solver_callback'] = self._record_iteration
+        dct = tea.__dict__
+        self._attached[id(tea)] = (tea, {i: dct[i] for i in wrappers if i in dct})
+        dct.update(wrappers)
+        dct['_instrumented_methods'] = tuple(wrappers)
+        return self
+
+    def detach(self, tea=None):
+        """Restore the methods of an attached TEA object (or of all attached TEA objects)."""
+        if tea is None:
+            for tea, _ in list(self._attached.values()): self.detach(tea)
+            return
+        if id(tea) not in self._attached: return
+        tea, originals = self._attached.pop(id(tea))
+        dct = tea.__dict__
+        for i in dct.pop('_instrumented_methods'): dct.pop(i, None)
+        dct.update(originals)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.detach()
+
+    def _start(self, kind, method):
+        active = self._active
+        record = SolveRecord(kind, method, len(active))
+        if not active:
+            for i in self.hooks: i.start(record)
+            if self.track_allocations:
+                import tracemalloc
+                self._started_tracing = not tracemalloc.is_tracing()
+                if self._started_tracing: tracemalloc.start()
+                self._initial_memory = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+        active.append(record)
+        record.time = time.perf_counter()
+        return record
+
+    def _stop(self, record):
+        record.time = time.perf_counter() - record.time
+        active = self._active
+        active.pop()
+        if not active:
+            if self.track_allocations:
+                import tracemalloc
+                record.allocated_bytes = tracemalloc.get_traced_memory()[1] - self._initial_memory
+                if self._started_tracing: tracemalloc.stop()
+            for i in self.hooks: i.stop(record)
+        self.records.append(record)
+
+    def _wrap_solve(self, tea, kind, name):
+        method = getattr(tea, name)
+        signature = inspect.signature(method)
+        def solve(*args, **kwargs):
+            if kind in ('IRR', 'MPSP'):
+                arguments = signature.bind(*args, **kwargs)
+                arguments.apply_defaults()
+                solver = arguments.arguments['method']
+            else:
+                solver = None
+            record = self._start(kind, solver)
+            try:
+                value = method(*args, **kwargs)
+            except Exception:
+                record.failed = True
+                raise
+            finally:
+                self._stop(record)
+            if kind == 'IRR': record.function_calls = tea.IRR_solver_info['function_calls']
+            return value
+        solve.__name__ = name
+        solve.__doc__ = method.__doc__
+        return solve
+
+    def _wrap_objective_solve(self, get_MPSP_given_IRR):
+        def solve(*args, **kwargs):
+            active = self._active
+            record = active[-1] if active else None
+            if record is not None: record._counting = True
+            try:
+                return get_MPSP_given_IRR(*args, **kwargs)
+            finally:
+                if record is not None: record._counting = False
+        return solve
+
+    def _wrap_objective(self, get_NPV_given_IRR):
+        def objective(IRR):
+            active = self._active
+            if active:
+                record = active[-1]
+                if record.kind == 'NPV' or record._counting: record.function_calls += 1
+            return get_NPV_given_IRR(IRR)
+        return objective
+
+    def _wrap_cashflow(self, compute_overall_cashflow):
+        def compute():
+            active = self._active
+            if active: active[-1].cashflow_evaluations += 1
+            return compute_overall_cashflow()
+        return compute
+
+    def _wrap_flow(self, tea, get_cached_flow):
+        flows = self.flows
+        cache = tea._flow_cache
+        def get_flow(name):
+            if name in flows:
+                stats = flows[name]
+            else:
+                flows[name] = stats = FlowStats()
+            stats.calls += 1
+            active = self._active
+            if name in cache:
+                if active: active[-1].flow_cache_hits += 1
+                return get_cached_flow(name)
+            start = time.perf_counter()
+            flow = get_cached_flow(name)
+            elapsed = time.perf_counter() - start
+            stats.computed += 1
+            stats.time += elapsed
+            if active:
+                flow_times = active[-1].flow_times
+                flow_times[name] = flow_times.get(name, 0.) + elapsed
+            return flow
+        return get_flow
+
+    def _record_iteration(self, x, bracket_width):
+        active = self._active
+        if active: active[-1].bracket_widths.append(bracket_width)
+
+    def summary(self):
+        """
+        Get a dictionary of totals by kind of solve ('NPV', 'IRR', 'MPSP', and
+        'cashflow_report'; number of solves, function calls, cash flow
+        evaluations, iterations, and wall time) and of component flows by
+        method name ('flows'; number of requests and computations, and wall time).
+        Counts of a solve exclude those of the solves nested in it, but wall
+        times include them.
+        """
+        summary = {}
+        for record in self.records:
+            if record.kind in summary:
+                totals = summary[record.kind]
+            else:
+                summary[record.kind] = totals = {'solves': 0, 'function_calls': 0, 'cashflow_evaluations': 0,
+                                                 'iterations': 0, 'time': 0.}
+            totals['solves'] += 1
+            totals['function_calls'] += record.function_calls
+            totals['cashflow_evaluations'] += record.cashflow_evaluations
+            totals['iterations'] += record.iterations
+            totals['time'] += record.time
+        summary['flows'] = {i: {'calls': j.calls, 'computed': j.computed, 'time': j.time}
+                            for i, j in self.flows.items()}
+        return summary
+
+    def __repr__(self):
+        return f'<{type(self).__name__}: {len(self._attached)} TEA objects, {len(self.records)} records>'
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+# teamod: Modules to enable techno-economic analysis (TEA) in Python.
+# Copyright (C) 2023-2024, Sarang S. Bhagwat <sarangb2@illinois.edu>
+#
+# This module is under the MIT open-source license. See
+# github.com/sarangbhagwat/teamod/LICENSE.txt
+# for license details.
+"""
+@author: sarangbhagwat
+Parallel evaluation of scenario tables. Chunks of scenarios are evaluated as
+TEABatch solves in a pool of worker processes; workers read parameter values
+from and write results to shared memory, so neither is ever pickled.
+"""
+import numpy as np
+from ._TEA import TEA
+from ._TEABatch import TEABatch, get_batch_inputs, parse_parameter, solve_kinds
+from ._solvers import CONVERGED, VALUE_ERROR
+
+__all__ = ('ScenarioRunner', 'evaluate_scenarios')
+
+def evaluate_scenarios(inputs, names, values, kind, NPV=0., product_index=0, solver_kwargs=None):
+    """
+    Evaluate a (scenario x parameter) array of parameter values as one TEABatch
+    solve of the given kind ('NPV', 'IRR', or 'MPSP'). Returns arrays of results
+    and status codes (see teamod._solvers.status_messages) of each scenario.
+    """
+    batch = TEABatch(**get_batch_inputs(inputs, {name: values[:, i] for i, name in enumerate(names)}))
+    if solver_kwargs is None: solver_kwargs = {}
+    if kind == 'NPV':
+        results = batch.solve(kind, **solver_kwargs)
+        status = np.where(np.isnan(results), VALUE_ERROR, CONVERGED)
+    else:
+        results, root_results = batch.solve(kind, NPV=NPV, product_index=product_index,
+                                            full_output=True, **solver_kwargs)
+        status = root_results.status
+    return results, status
+
+#%% Worker processes
+
+#: Shared memory blocks and arguments of the current worker process.
+_worker = {}
+
+def _attach(name, shape, dtype):
+    from multiprocessing import shared_memory
+    memory = shared_memory.SharedMemory(name=name)
+    return memory, np.ndarray(shape, dtype, memory.buf)
+
+def _initialize_worker(inputs, names, kind, NPV, product_index, solver_kwargs, values_block, results_block, status_block):
+    _worker['arguments'] = (inputs, names, kind, NPV, product_index, solver_kwargs)
+    # keep references to the shared memory blocks so that they stay attached
+    _worker['values'] = _attach(*values_block)
+    _worker['results'] = _attach(*results_block)
+    _worker['status'] = _attach(*status_block)
+
+def _evaluate_chunk(start, stop):
+    inputs, names, kind, NPV, product_index, solver_kwargs = _worker['arguments']
+    values = _worker['values'][1][start:stop]
+    results, status = evaluate_scenarios(inputs, names, values, kind, NPV, product_index, solver_kwargs)
+    _worker['results'][1][start:stop] = results
+    _worker['status'][1][start:stop] = status
+    return stop - start
+
+#%% Scenario runner
+
+class ScenarioRunner():
+    """
+    Create a ScenarioRunner object to evaluate a table of scenarios in parallel.
+    The table is split into chunks that are evaluated as TEABatch solves by a
+    pool of worker processes. Parameter values and results are held in shared
+    memory. Every scenario is solved independently of the others, so results
+    do not depend on the chunk size or number of workers.
+
+    Parameters
+    ----------
+    tea : TEA or dict
+        Baseline TEA object (or its input arguments; see TEA.get_inputs).
+    parameters : tuple
+        Names of the parameters in each column of the scenario table, e.g.,
+        'lang_factor' or 'product_prices[0]'.
+    kind : str
+        'NPV' (at the IRR), 'IRR' (given the NPV), or 'MPSP' (at the IRR,
+        given the NPV).
+    NPV : float
+        NPV at which IRR and MPSP are solved.
+    product_index : int
+        Index of the product whose MPSP is solved.
+    chunk_size : int
+        Number of scenarios evaluated at a time by a worker.
+    max_workers : int
+        Number of worker processes; defaults to the number of processors.
+        If 1, scenarios are evaluated in the current process.
+    solver_kwargs : dict
+        Keyword arguments of the TEABatch solve (e.g., bounds of IRR or MPSP).
+    mp_context : multiprocessing context
+        Context used to start worker processes; defaults to the platform's default.
+
+    Examples
+    --------
+    >>> runner = teamod.ScenarioRunner(example_TEA, ('lang_factor', 'product_prices[0]'), kind='IRR')
+    >>> IRRs = runner.run(scenario_table) # (scenario x parameter) array
+
+    """
+
+    def __init__(self, tea, parameters, kind='NPV', NPV=0., product_index=0,
+                 chunk_size=10_000, max_workers=None, solver_kwargs=None, mp_context=None):
+        inputs = tea.get_inputs() if isinstance(tea, TEA) else dict(tea)
+        parameters = tuple(parameters)
+        for name in parameters: parse_parameter(name)
+        if kind not in solve_kinds:
+            raise ValueError(f"kind must be one of {', '.join([repr(i) for i in solve_kinds])}, not {repr(kind)}")
+        #: Baseline TEA input arguments.
+        self.inputs = inputs
+
+        #: Names of the parameters in each column of the scenario table.
+        self.parameters = parameters
+
+        #: Kind of solve.
+        self.kind = kind
+
+        #: NPV at which IRR and MPSP are solved.
+        self.NPV = NPV
+
+        #: Index of the product whose MPSP is solved.
+        self.product_index = product_index
+
+        #: Number of scenarios evaluated at a time by a worker.
+        self.chunk_size = chunk_size
+
+        #: Number of worker processes.
+        self.max_workers = max_workers
+
+        #: Keyword arguments of the TEABatch solve.
+        self.solver_kwargs = {} if solver_kwargs is None else solver_kwargs
+
+        #: Context used to start worker processes.
+        self.mp_context = mp_context
+
+        #: Status codes of each scenario of the last run.
+        self.status = None
+
+    def _get_chunks(self, size):
+        chunk_size = self.chunk_size
+        if chunk_size < 1: raise ValueError(f'chunk_size must be a positive integer, not {chunk_size}')
+        starts = range(0, size, chunk_size)
+        return starts, [min(start + chunk_size, size) for start in starts]
+
+    def run(self, values):
+        """
+        Evaluate a (scenario x parameter) array of parameter values. Returns an
+        array of results (NaN where a solve failed); status codes of each
+        scenario are stored in `status`.
+        """
+        values = np.asarray(values, dtype=float)
+        if values.ndim == 1 and len(self.parameters) == 1: values = values[:, None]
+        if values.ndim != 2 or values.shape[1] != len(self.parameters):
+            raise ValueError(f'values must be a (scenario x parameter) array with {len(self.parameters)} columns, '
+                             f'not an array of shape {values.shape}')
+        size = values.shape[0]
+        starts, stops = self._get_chunks(size)
+        arguments = (self.inputs, self.parameters, self.kind, self.NPV, self.product_index, self.solver_kwargs)
+        if self.max_workers == 1:
+            results = np.empty(size)
+            status = np.empty(size, dtype=int)
+            for start, stop in zip(starts, stops):
+                results[start:stop], status[start:stop] = evaluate_scenarios(arguments[0], arguments[1], values[start:stop], *arguments[2:])
+            self.status = status
+            return results
+        # process pools are only loaded when used, as they add to import time
+        from concurrent.futures import ProcessPoolExecutor
+        from multiprocessing import shared_memory
+        memories = []
+        blocks = []
+        arrays = {}
+        try:
+            for key, shape, dtype in (('values', values.shape, float),
+                                      ('results', (size,), float),
+                                      ('status', (size,), int)):
+                nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+                memory = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+                memories.append(memory)
+                blocks.append((memory.name, shape, dtype))
+                arrays[key] = np.ndarray(shape, dtype, memory.buf)
+            arrays['values'][:] = values
+            with ProcessPoolExecutor(self.max_workers, self.mp_context, _initialize_worker,
+                                     (*arguments, *blocks)) as executor:
+                for i in executor.map(_evaluate_chunk, starts, stops): pass
+            results = arrays['results'].copy()
+            self.status = arrays['status'].copy()
+        finally:
+            # release views of the shared memory before closing it
+            arrays.clear()
+            for memory in memories:
+                memory.close()
+                memory.unlink()
+        return results
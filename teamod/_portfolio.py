@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+# teamod: Modules to enable techno-economic analysis (TEA) in Python.
+# Copyright (C) 2023-2024, Sarang S. Bhagwat <sarangb2@illinois.edu>
+#
+# This module is under the MIT open-source license. See
+# github.com/sarangbhagwat/teamod/LICENSE.txt
+# for license details.
+"""
+@author: sarangbhagwat
+Portfolios of plants with different project durations, construction and
+depreciation schedules, and start years. Plant inputs are stored as compact
+arrays (one value per plant, or short padded schedules); cash flows are
+evaluated in chunks of plants as masked (plant x year) arrays padded to the
+longest project duration and summed on a common calendar.
+"""
+import inspect
+import numpy as np
+from ._TEA import TEA, input_names, solve_IRR_from_cashflow
+from ._TEABatch import TEABatch, scenario_parameters, as_column
+
+__all__ = ('Portfolio', 'PaddedTEABatch')
+
+#: Default TEA input arguments by name (inputs without defaults are required).
+default_inputs = {i: j.default for i, j in inspect.signature(TEA).parameters.items()
+                  if j.default is not inspect.Parameter.empty}
+
+class PaddedTEABatch(TEABatch):
+    """
+    Create a PaddedTEABatch object: a TEABatch of plants with different project
+    durations and construction schedules. Flows are (plant x year) arrays
+    padded to the longest project duration and are zero after the project
+    duration of each plant. Arguments are as for TEABatch, except that
+    `construction_schedule` is a (plant x year) array padded with zeros,
+    `depreciation_schedule` and `other_costs_across_project_duration` (if
+    given) are (plant x year) arrays padded to the longest project duration
+    (see Portfolio), and project durations and numbers of construction years
+    are given per plant.
+    """
+
+    def __init__(self, project_durations, construction_years, **kwargs):
+        #: Project duration of each plant.
+        self.project_durations = np.asarray(project_durations, dtype=int)
+
+        #: Number of construction years of each plant.
+        self.construction_years = np.asarray(construction_years, dtype=int)
+
+        super().__init__(project_duration=self.project_durations.max(), **kwargs)
+
+    @property
+    def in_service(self):
+        """Mask of (plant x year) years within the project duration of each plant."""
+        return self.years < as_column(self.project_durations)
+
+    def _padded_construction_schedule(self):
+        construction_schedule = np.asarray(self.construction_schedule, dtype=float)
+        padded = np.zeros((construction_schedule.shape[0], self.project_duration))
+        padded[:, :construction_schedule.shape[1]] = construction_schedule
+        return padded
+
+    @property
+    def startup_year(self):
+        """Year index of the end of construction of each plant (as a column)."""
+        return as_column(self.construction_years - 1)
+
+    def _startup_factor_array(self, startup_frac):
+        return np.where(self.in_service, super()._startup_factor_array(startup_frac), 0.)
+
+    @property
+    def loan_payment_start_year(self):
+        """Get the year loan payments start for each plant."""
+        return np.minimum(self.construction_years, self.finance_years)
+
+    def _get_loan_payments_flow(self):
+        return np.where(self.in_service, super()._get_loan_payments_flow(), 0.)
+
+    def _get_incentives_flow(self):
+        return np.where(self.in_service, super()._get_incentives_flow(), 0.)
+
+class Portfolio():
+    """
+    Create a Portfolio object to evaluate many plants at once, each with its
+    own project duration, construction and depreciation schedules, and start
+    year, and aggregate their cash flows on a common calendar.
+
+    Plant inputs are stored as arrays with one value per plant (products are
+    padded with zero flows to the largest number of products, and
+    construction schedules with zeros to the longest construction), so
+    memory per plant is a small constant; depreciation schedules and other
+    costs take one value per year only if some plant has them. Plants are
+    evaluated in chunks as masked (plant x year) arrays padded to the longest
+    project duration (see PaddedTEABatch), and each plant's cash flow matches
+    that of its TEA object.
+
+    Parameters
+    ----------
+    plants : iterable
+        TEA objects or dictionaries of TEA input arguments.
+    start_years : int or array
+        Calendar year of year 0 (the first construction year) of each plant.
+    chunk_size : int
+        Number of plants evaluated at a time.
+
+    Examples
+    --------
+    >>> portfolio = teamod.Portfolio([plant_TEA_1, plant_TEA_2, plant_inputs_3],
+    >>>                              start_years=[2025, 2027, 2030])
+    >>> results = portfolio.evaluate(IRR=0.10)
+    >>> results['calendar'], results['cashflow'], results['NPV'], results['IRR']
+
+    """
+
+    def __init__(self, plants, start_years=0, chunk_size=10_000):
+        plants = [self._get_plant_inputs(i) for i in plants]
+        if not plants: raise ValueError('a portfolio must have at least one plant')
+        N = len(plants)
+        #: Project duration of each plant.
+        self.project_durations = project_durations = np.array([i['project_duration'] for i in plants], dtype=int)
+
+        #: Calendar year of year 0 of each plant.
+        self.start_years = np.array(np.broadcast_to(start_years, (N,)), dtype=int)
+
+        #: Scenario-wise inputs (see teamod._TEABatch.scenario_parameters) as arrays with one value per plant.
+        self.parameters = {i: np.array([j[i] for j in plants], dtype=float) for i in scenario_parameters}
+
+        hourly_fixed_operating_costs = [i['hourly_fixed_operating_cost'] for i in plants]
+        #: Hourly fixed operating cost of each plant (NaN where estimated as in TEA.FOC).
+        self.hourly_fixed_operating_cost = np.array([np.nan if i is None else i for i in hourly_fixed_operating_costs],
+                                                    dtype=float)
+
+        #: (plant x product) product flows, padded with zero flows.
+        self.hourly_product_flows = self._pad([i['hourly_product_flows'] for i in plants])
+
+        #: (plant x product) product prices, padded with zeros.
+        self.product_prices = self._pad([i['product_prices'] for i in plants])
+
+        #: (plant x year) construction schedules, padded with zeros.
+        self.construction_schedule = self._pad([i['construction_schedule'] for i in plants])
+
+        #: Number of construction years of each plant.
+        self.construction_years = construction_years = np.array([len(i['construction_schedule']) for i in plants],
+                                                                dtype=int)
+        if (construction_years >= project_durations).any() or (construction_years < 1).any():
+            raise ValueError('each plant must have at least one construction year and operate for at least one year')
+
+        depreciation_schedules = [i['depreciation_schedule'] for i in plants]
+        for i in depreciation_schedules:
+            if isinstance(i, str) and i != 'Linear':
+                raise ValueError(f"depreciation_schedule must be 'Linear' or a schedule of capital cost fractions, not {repr(i)}.")
+        #: Whether each plant depreciates linearly across its project duration.
+        self.linear_depreciation = np.array([isinstance(i, str) for i in depreciation_schedules])
+        lists = [[] if isinstance(i, str) else i for i in depreciation_schedules]
+        if any([len(i) > j for i, j in zip(lists, project_durations)]):
+            raise ValueError('depreciation schedules must not be longer than the project duration')
+
+        #: (plant x year) depreciation schedules of plants that do not depreciate linearly, padded with zeros.
+        self.depreciation_schedule = self._pad(lists)
+
+        other_costs = [i['other_costs_across_project_duration'] for i in plants]
+        if any([i is not None and len(i) for i in other_costs]):
+            other_costs = [[] if i is None else i for i in other_costs]
+            if any([len(i) and len(i) != j for i, j in zip(other_costs, project_durations)]):
+                raise ValueError('other costs must have one value per year of the project duration')
+            other_costs = self._pad(other_costs)
+        else:
+            other_costs = None
+        #: (plant x year) other costs, padded with zeros (None if no plant has other costs).
+        self.other_costs_across_project_duration = other_costs
+
+        #: Number of plants evaluated at a time.
+        self.chunk_size = chunk_size
+
+    @staticmethod
+    def _get_plant_inputs(plant):
+        if isinstance(plant, TEA): return plant.get_inputs()
+        plant = dict(plant)
+        for i in plant:
+            if i not in input_names: raise ValueError(f'{repr(i)} is not an input argument of TEA')
+        missing = [i for i in input_names if i not in plant and i not in default_inputs]
+        if missing: raise ValueError(f"plant is missing input arguments: {', '.join(missing)}")
+        return {**default_inputs, **plant}
+
+    @staticmethod
+    def _pad(sequences):
+        """Get a 2-D array of 1-D sequences padded with zeros to the longest sequence."""
+        sequences = [np.asarray(i, dtype=float).ravel() for i in sequences]
+        padded = np.zeros((len(sequences), max([i.size for i in sequences])))
+        for i, j in zip(padded, sequences): i[:j.size] = j
+        return padded
+
+    @property
+    def size(self):
+        """Number of plants."""
+        return self.project_durations.size
+
+    @property
+    def calendar(self):
+        """Calendar years from the first start year to the end of the last project."""
+        return np.arange(self.start_years.min(), (self.start_years + self.project_durations).max())
+
+    @staticmethod
+    def _get_years(array, start, stop, duration):
+        """Get the (plant x year) rows of a padded array for the plants in a range, zero-filled (or cut) to the given duration."""
+        years = np.zeros((stop - start, duration))
+        values = array[start:stop, :duration]
+        years[:, :values.shape[1]] = values
+        return years
+
+    def _get_batch(self, start, stop):
+        """Get a PaddedTEABatch of the plants in a range."""
+        project_durations = self.project_durations[start:stop]
+        duration = project_durations.max()
+        years = np.arange(duration)
+        in_service = years < project_durations[:, None]
+        linear = self.linear_depreciation[start:stop, None]
+        depreciation_schedule = self._get_years(self.depreciation_schedule, start, stop, duration)
+        depreciation_schedule = np.where(linear & in_service, 1/project_durations[:, None], depreciation_schedule)
+        other_costs = self.other_costs_across_project_duration
+        if other_costs is not None:
+            other_costs = self._get_years(other_costs, start, stop, duration)
+        return PaddedTEABatch(
+            project_durations,
+            self.construction_years[start:stop],
+            construction_schedule=self.construction_schedule[start:stop],
+            depreciation_schedule=depreciation_schedule,
+            other_costs_across_project_duration=other_costs,
+            hourly_fixed_operating_cost=self.hourly_fixed_operating_cost[start:stop],
+            hourly_product_flows=self.hourly_product_flows[start:stop],
+            product_prices=self.product_prices[start:stop],
+            **{i: j[start:stop] for i, j in self.parameters.items()},
+            )
+
+    def _chunks(self):
+        """Yield the (start, stop, PaddedTEABatch) of each chunk of plants."""
+        for start in range(0, self.size, self.chunk_size):
+            stop = min(start + self.chunk_size, self.size)
+            yield start, stop, self._get_batch(start, stop)
+
+    def get_cashflow_array(self):
+        """Get the (plant x year) cash flow in current dollars of each plant from its year 0, padded with zeros to the longest project duration."""
+        cashflow = np.zeros((self.size, self.project_durations.max()))
+        for start, stop, batch in self._chunks():
+            flows = batch.get_overall_cashflow_array()
+            cashflow[start:stop, :flows.shape[1]] = flows
+        return cashflow
+
+    def evaluate(self, IRR=None, NPV=0., inflation_rate=0., IRR_lb=0., IRR_ub=10.):
+        """
+        Evaluate all plants in one pass and return a dictionary of the calendar
+        years ('calendar'), the aggregate cash flow in current dollars in each
+        calendar year ('cashflow'), the NPV of the portfolio at the IRR
+        ('NPV'; discounted to the first calendar year), the IRR of the portfolio
+        given the NPV ('IRR'; NaN if it cannot be solved within the bounds), and
+        the NPV of each plant at its own IRR ('plant_NPVs'; discounted to its
+        year 0, as TEA.get_NPV_given_IRR). The IRR of the portfolio defaults to
+        the IRR of the plants if they all have the same IRR.
+        """
+        if IRR is None:
+            IRRs = self.parameters['IRR']
+            if (IRRs != IRRs[0]).any():
+                raise ValueError('plants have different IRRs; the IRR of the portfolio must be given')
+            IRR = float(IRRs[0])
+        calendar = self.calendar
+        offsets = self.start_years - calendar[0]
+        cashflow = np.zeros(calendar.size)
+        plant_NPVs = np.empty(self.size)
+        for start, stop, batch in self._chunks():
+            flows = batch.get_overall_cashflow_array()
+            plant_NPVs[start:stop] = (flows * batch.P_over_F_factor_array).sum(axis=1)
+            in_service = batch.in_service
+            index = as_column(offsets[start:stop]) + batch.years
+            cashflow += np.bincount(index[in_service], flows[in_service], calendar.size)
+        discount_rate = (1.+IRR)/(1.+inflation_rate) - 1.
+        portfolio_NPV = (cashflow / (1.+discount_rate)**np.arange(calendar.size)).sum()
+        try:
+            portfolio_IRR = solve_IRR_from_cashflow(cashflow, NPV, IRR_lb, IRR_ub, 'brentq', inflation_rate)
+        except (ValueError, RuntimeError):
+            portfolio_IRR = np.nan
+        return {
+            'calendar': calendar,
+            'cashflow': cashflow,
+            'NPV': portfolio_NPV,
+            'IRR': portfolio_IRR,
+            'plant_NPVs': plant_NPVs,
+            }
+
+    def __repr__(self):
+        calendar = self.calendar
+        return f'<{type(self).__name__}: {self.size} plants, {calendar[0]}-{calendar[-1]}>'
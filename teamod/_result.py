@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+# teamod: Modules to enable techno-economic analysis (TEA) in Python.
+# Copyright (C) 2023-2024, Sarang S. Bhagwat <sarangb2@illinois.edu>
+#
+# This module is under the MIT open-source license. See
+# github.com/sarangbhagwat/teamod/LICENSE.txt
+# for license details.
+"""
+@author: sarangbhagwat
+Structured results of TEA solves.
+"""
+__all__ = ('TEAResult', 'cashflow_components')
+
+#: Names of the components of cash flow reports (in order).
+cashflow_components = (
+    'Fixed capital investment',
+    'Working capital',
+    'Fixed operating cost',
+    'Variable operating cost',
+    'Other costs',
+    'Loan',
+    'Loan interest-only payment',
+    'Loan payment',
+    'Tax',
+    'Incentives',
+    'Sales',
+    'Net earnings',
+    'Cash flow',
+    'Discount factor',
+    'Net present value',
+    'Cumulative net present value',
+    )
+
+class TEAResult():
+    """
+    Result of a TEA solve: the solved values and all cash flow components
+    (as in TEA.get_cashflow_report) from the cash flow evaluation at the
+    solution. Flows are read-only arrays across the project duration, so
+    reports are views of the result and are never recomputed. Flows may be
+    given as a dictionary or as a tuple of arrays in order of
+    `cashflow_components` (the cumulative net present value may be left
+    out), which is turned into a dictionary when first accessed. Flows may
+    also be given as a function returning such a tuple, so that they are
+    only built when first accessed (or when the result is pickled).
+    """
+
+    def __init__(self, kind, NPV, IRR, flows, MPSP=None, product_index=None):
+        #: Kind of solve ('NPV', 'IRR', or 'MPSP').
+        self.kind = kind
+
+        #: Net present value.
+        self.NPV = NPV
+
+        #: Internal rate of return.
+        self.IRR = IRR
+
+        #: Minimum product selling price (None unless MPSP was solved).
+        self.MPSP = MPSP
+
+        #: Index of the product whose MPSP was solved (None unless MPSP was solved).
+        self.product_index = product_index
+
+        self._flows = flows
+
+    @property
+    def flows(self):
+        """Cash flow components by name (see cashflow_components)."""
+        flows = self._flows
+        if not isinstance(flows, dict):
+            if callable(flows): flows = flows()
+            flows = tuple(flows)
+            if len(flows) < len(cashflow_components):
+                flows += (flows[-1].cumsum(),)
+            self._flows = flows = dict(zip(cashflow_components, flows))
+            for flow in flows.values(): flow.setflags(write=False)
+        return flows
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_flows'] = self.flows
+        return state
+
+    def __getitem__(self, component):
+        return self.flows[component]
+
+    @property
+    def cashflow(self):
+        """Cash flow in current dollars."""
+        return self.flows['Cash flow']
+
+    def to_frame(self):
+        """Get a DataFrame of the cash flow report."""
+        import pandas as pd
+        return pd.DataFrame(self.flows)
+
+    def to_excel(self, filename='cashflow_report.xlsx'):
+        """Export the cash flow report to an Excel file and return it as a DataFrame."""
+        frame = self.to_frame()
+        frame.to_excel(filename)
+        return frame
+
+    def __repr__(self):
+        values = f'NPV={self.NPV:.6g}, IRR={self.IRR:.6g}'
+        if self.MPSP is not None: values += f', MPSP={self.MPSP:.6g}'
+        return f'<{type(self).__name__} ({self.kind}): {values}>'
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+# teamod: Modules to enable techno-economic analysis (TEA) in Python.
+# Copyright (C) 2023-2024, Sarang S. Bhagwat <sarangb2@illinois.edu>
+#
+# This module is under the MIT open-source license. See
+# github.com/sarangbhagwat/teamod/LICENSE.txt
+# for license details.
+"""
+@author: sarangbhagwat
+Global and local sensitivity analysis (Sobol indices, Morris elementary
+effects, and one-at-a-time tornado analysis). All evaluations of a study
+are planned up front and run as large TEABatch evaluations; cash flow
+components that do not depend on the varied parameters are computed once
+per batch and broadcast across scenarios.
+"""
+import numpy as np
+from ._TEA import TEA
+from ._TEABatch import TEABatch, get_batch_inputs, parse_parameter, solve_kinds
+
+__all__ = ('SensitivityAnalysis',)
+
+def get_parameter_value(inputs, name):
+    """Get the value of a parameter (e.g., 'lang_factor' or 'product_prices[0]') from TEA input arguments."""
+    attribute, index = parse_parameter(name)
+    value = inputs[attribute]
+    return value if index is None else value[index]
+
+class SensitivityAnalysis():
+    """
+    Create a SensitivityAnalysis object to rank the parameters that drive a
+    TEA metric.
+
+    Parameters
+    ----------
+    tea : TEA or dict
+        Baseline TEA object (or its input arguments; see TEA.get_inputs).
+    bounds : dict
+        Lower and upper bounds by parameter name, e.g., 'lang_factor' or
+        'product_prices[0]'.
+    metric : str
+        'NPV' (at the IRR), 'IRR' (given the NPV), or 'MPSP' (at the IRR,
+        given the NPV).
+    NPV : float
+        NPV at which IRR and MPSP are solved.
+    product_index : int
+        Index of the product whose MPSP is solved.
+    chunk_size : int
+        Maximum number of scenarios evaluated per batch.
+    solver_kwargs : dict
+        Keyword arguments of the TEABatch solve (e.g., bounds of IRR or MPSP).
+
+    """
+
+    def __init__(self, tea, bounds, metric='NPV', NPV=0., product_index=0,
+                 chunk_size=100_000, solver_kwargs=None):
+        inputs = tea.get_inputs() if isinstance(tea, TEA) else dict(tea)
+        for name in bounds: parse_parameter(name)
+        if metric not in solve_kinds:
+            raise ValueError(f"metric must be one of {', '.join([repr(i) for i in solve_kinds])}, not {repr(metric)}")
+        #: Baseline TEA input arguments.
+        self.inputs = inputs
+
+        #: Lower and upper bounds by parameter name.
+        self.bounds = dict(bounds)
+
+        #: Metric to analyze.
+        self.metric = metric
+
+        #: NPV at which IRR and MPSP are solved.
+        self.NPV = NPV
+
+        #: Index of the product whose MPSP is solved.
+        self.product_index = product_index
+
+        #: Maximum number of scenarios evaluated per batch.
+        self.chunk_size = chunk_size
+
+        #: Keyword arguments of the TEABatch solve.
+        self.solver_kwargs = {} if solver_kwargs is None else solver_kwargs
+
+        #: Number of scenarios evaluated so far.
+        self.evaluations = 0
+
+    @property
+    def names(self):
+        """Names of the parameters."""
+        return tuple(self.bounds)
+
+    @property
+    def baseline(self):
+        """Baseline values of the parameters."""
+        inputs = self.inputs
+        return np.array([get_parameter_value(inputs, i) for i in self.bounds], dtype=float)
+
+    def scale(self, X):
+        """Scale a (scenario x parameter) array of fractions between 0 and 1 to parameter values."""
+        lb, ub = np.array(list(self.bounds.values()), dtype=float).T
+        return lb + X * (ub - lb)
+
+    def evaluate(self, values):
+        """Evaluate the metric of each scenario given a (scenario x parameter) array of parameter values."""
+        values = np.asarray(values, dtype=float)
+        names = self.names
+        results = np.empty(values.shape[0])
+        chunk_size = self.chunk_size
+        for start in range(0, values.shape[0], chunk_size):
+            chunk = values[start:start + chunk_size]
+            batch = TEABatch(**get_batch_inputs(self.inputs, {name: chunk[:, i] for i, name in enumerate(names)}))
+            results[start:start + chunk_size] = batch.solve(self.metric, NPV=self.NPV,
+                                                           product_index=self.product_index,
+                                                           **self.solver_kwargs)
+        self.evaluations += values.shape[0]
+        return results
+
+    def tornado(self):
+        """
+        Run a one-at-a-time analysis, setting each parameter to its lower and upper bound
+        while keeping the others at baseline. Returns a dictionary with the baseline
+        metric ('baseline') and arrays of the metric at the lower ('lower') and upper
+        ('upper') bounds, and their difference ('swing'), in order of parameters
+        (see `names`); parameters are sorted by decreasing absolute swing in 'ranking'.
+        """
+        baseline = self.baseline
+        k = baseline.size
+        lb, ub = np.array(list(self.bounds.values()), dtype=float).T
+        values = np.tile(baseline, (2*k + 1, 1))
+        index = np.arange(k)
+        values[1 + index, index] = lb
+        values[1 + k + index, index] = ub
+        results = self.evaluate(values)
+        lower = results[1:k+1]
+        upper = results[k+1:]
+        swing = upper - lower
+        names = self.names
+        return {
+            'baseline': results[0],
+            'lower': lower,
+            'upper': upper,
+            'swing': swing,
+            'ranking': [names[i] for i in np.argsort(-np.abs(swing), kind='stable')],
+            }
+
+    def sample_saltelli(self, N, seed=None, calc_second_order=False):
+        """
+        Get Saltelli's (scenario x parameter) array of fractions between 0 and 1 in
+        blocks of N: A, B, AB_1 ... AB_k and, for second-order indices,
+        BA_1 ... BA_k. A and B are drawn from a scrambled Sobol sequence, which
+        is only balanced for powers of 2, so N is rounded up to a power of 2.
+        """
+        from scipy.stats import qmc
+        k = len(self.bounds)
+        if N < 1: raise ValueError(f'N must be a positive integer, not {N}')
+        AB = qmc.Sobol(d=2*k, scramble=True, seed=seed).random_base2((int(N) - 1).bit_length())
+        A, B = AB[:, :k], AB[:, k:]
+        blocks = [A, B]
+        for i in range(k):
+            AB_i = A.copy()
+            AB_i[:, i] = B[:, i]
+            blocks.append(AB_i)
+        if calc_second_order:
+            for i in range(k):
+                BA_i = B.copy()
+                BA_i[:, i] = A[:, i]
+                blocks.append(BA_i)
+        return np.concatenate(blocks)
+
+    def sobol(self, N, seed=None, calc_second_order=False, num_resamples=0, confidence_level=0.95):
+        """
+        Estimate Sobol indices from N x (k + 2) evaluations (N x (2k + 2) with second-order indices),
+        where k is the number of parameters and N is rounded up to a power of 2
+        (see sample_saltelli). First-order indices ('S1') use
+        Saltelli's (2010) estimator, total-order indices ('ST') Jansen's, and second-order indices
+        ('S2'; a k x k array) Saltelli's (2002). Samples with a failed solve (NaN) are dropped.
+        If num_resamples > 0, bootstrap confidence intervals are returned as '*_conf' (half-widths).
+        """
+        k = len(self.bounds)
+        X = self.sample_saltelli(N, seed, calc_second_order)
+        N = len(X) // (2*k + 2 if calc_second_order else k + 2)
+        Y = self.evaluate(self.scale(X)).reshape(-1, N)
+        valid = ~np.isnan(Y).any(axis=0)
+        Y = Y[:, valid]
+        indices = self._get_sobol_indices(Y, k, calc_second_order)
+        indices['N'] = int(valid.sum())
+        if num_resamples:
+            rng = np.random.default_rng(seed)
+            resamples = [self._get_sobol_indices(Y[:, rng.integers(0, Y.shape[1], Y.shape[1])], k, calc_second_order)
+                         for i in range(num_resamples)]
+            z = {0.90: 1.6448536269514722, 0.95: 1.959963984540054, 0.99: 2.5758293035489004}.get(confidence_level)
+            if z is None:
+                from scipy.stats import norm
+                z = norm.ppf(0.5 + confidence_level / 2)
+            for key in ('S1', 'ST', 'S2') if calc_second_order else ('S1', 'ST'):
+                indices[key + '_conf'] = z * np.std([i[key] for i in resamples], axis=0, ddof=1)
+        indices['names'] = self.names
+        return indices
+
+    @staticmethod
+    def _get_sobol_indices(Y, k, calc_second_order):
+        f_A, f_B = Y[0], Y[1]
+        f_AB = Y[2:2+k]
+        variance = np.var(np.concatenate([f_A, f_B]))
+        S1 = np.mean(f_B * (f_AB - f_A), axis=1) / variance
+        ST = 0.5 * np.mean((f_A - f_AB)**2, axis=1) / variance
+        indices = {'S1': S1, 'ST': ST}
+        if calc_second_order:
+            f_BA = Y[2+k:2+2*k]
+            S2 = np.full((k, k), np.nan)
+            for i in range(k):
+                for j in range(i+1, k):
+                    V_ij = np.mean(f_BA[i] * f_AB[j] - f_A * f_B) / variance
+                    S2[i, j] = V_ij - S1[i] - S1[j]
+            indices['S2'] = S2
+        return indices
+
+    def sample_morris(self, trajectories, levels=4, seed=None):
+        """
+        Get a (scenario x parameter) array of fractions between 0 and 1 of Morris
+        trajectories (k + 1 points each, where k is the number of parameters) on a grid
+        with the given number of levels, the signed step (fraction) taken by each
+        parameter in each trajectory (trajectories x parameter), and the order in which
+        parameters are stepped in each trajectory (trajectories x parameter).
+        """
+        rng = np.random.default_rng(seed)
+        k = len(self.bounds)
+        delta = levels / (2. * (levels - 1))
+        grid = np.arange(levels) / (levels - 1)
+        X = np.empty((trajectories, k + 1, k))
+        steps = np.empty((trajectories, k))
+        orders = np.empty((trajectories, k), dtype=int)
+        for t in range(trajectories):
+            x = rng.choice(grid, k)
+            direction = np.where(rng.random(k) < 0.5, 1., -1.)
+            # keep every step within the unit hypercube
+            direction[x + direction * delta > 1.] = -1.
+            direction[x + direction * delta < 0.] = 1.
+            order = rng.permutation(k)
+            X[t, 0] = x
+            for step, i in enumerate(order, 1):
+                x = x.copy()
+                x[i] += direction[i] * delta
+                X[t, step] = x
+            steps[t] = direction * delta
+            orders[t] = order
+        return X.reshape(-1, k), steps, orders
+
+    def morris(self, trajectories, levels=4, seed=None):
+        """
+        Estimate Morris elementary effects from trajectories x (k + 1) evaluations, where k
+        is the number of parameters. Elementary effects are in units of the metric per
+        fraction of each parameter's range. Returns a dictionary with the mean ('mu'),
+        mean of absolute values ('mu_star'), and standard deviation ('sigma') of the
+        elementary effects of each parameter, ignoring steps with a failed solve.
+        """
+        k = len(self.bounds)
+        X, steps, orders = self.sample_morris(trajectories, levels, seed)
+        Y = self.evaluate(self.scale(X)).reshape(trajectories, k + 1)
+        effects = np.empty((trajectories, k))
+        rows = np.arange(trajectories)[:, None]
+        effects[rows, orders] = np.diff(Y, axis=1) / steps[rows, orders]
+        mu = np.nanmean(effects, axis=0)
+        return {
+            'mu': mu,
+            'mu_star': np.nanmean(np.abs(effects), axis=0),
+            'sigma': np.nanstd(effects, axis=0, ddof=1),
+            'effects': effects,
+            'names': self.names,
+            }
@@ -0,0 +1,450 @@
+# -*- coding: utf-8 -*-
+# teamod: Modules to enable techno-economic analysis (TEA) in Python.
+# Copyright (C) 2023-2024, Sarang S. Bhagwat <sarangb2@illinois.edu>
+#
+# This module is under the MIT open-source license. See
+# github.com/sarangbhagwat/teamod/LICENSE.txt
+# for license details.
+"""
+@author: sarangbhagwat
+Local asyncio server of TEA evaluations. Requests that arrive within a short
+window are gathered into micro-batches that are solved as single TEABatch
+solves, and each caller receives its own result. Messages are JSON objects,
+one per line, over localhost TCP or a Unix socket.
+"""
+import json
+import time
+import math
+import asyncio
+import itertools
+import numpy as np
+from collections import deque
+from ._TEA import TEA
+from ._TEABatch import parse_parameter, solve_kinds
+from ._parallel import evaluate_scenarios
+
+__all__ = ('EvaluationServer', 'EvaluationClient')
+
+def encode_message(message):
+    """Encode a message as a line of JSON."""
+    return json.dumps(message, separators=(',', ':')).encode() + b'\n'
+
+def as_json_number(value):
+    """Return a float, or None if it is not finite (not representable in JSON)."""
+    value = float(value)
+    return value if math.isfinite(value) else None
+
+class EvaluationServer():
+    """
+    Create an EvaluationServer object to serve NPV, IRR, and MPSP evaluations
+    of a baseline TEA over localhost TCP (or a Unix socket if a path is given).
+    Requests received within `max_latency` seconds of the first pending
+    request (up to `max_batch_size` requests) are solved together: requests of
+    the same kind and parameter names are evaluated as one TEABatch solve.
+    Requests arriving while a batch is being solved wait for the next batch,
+    so batches grow with load.
+
+    Each request is a JSON object on one line, e.g.,
+    {"id": 1, "kind": "MPSP", "parameters": {"lang_factor": 3.5}},
+    with parameters named as in TEABatch (e.g., 'lang_factor' or
+    'product_prices[0]'). The response holds the same id and the result
+    (null if the solve failed) and status code (see
+    teamod._solvers.status_messages), or an error message. A request
+    {"id": 2, "op": "metrics"} returns the server metrics.
+
+    Parameters
+    ----------
+    tea : TEA or dict
+        Baseline TEA object (or its input arguments; see TEA.get_inputs).
+    host : str
+        Host to listen on (ignored if a path is given).
+    port : int
+        Port to listen on; 0 chooses a free port (see EvaluationServer.address).
+    path : str
+        Path of a Unix socket to listen on instead of TCP.
+    max_batch_size : int
+        Maximum number of requests solved together.
+    max_latency : float
+        Maximum time (s) to wait for more requests after the first pending request.
+    NPV : float
+        NPV at which IRR and MPSP are solved.
+    product_index : int
+        Index of the product whose MPSP is solved.
+    solver_kwargs : dict
+        Keyword arguments of TEABatch solves by kind, e.g., {'MPSP': {'MPSP_ub': 200.}}.
+    latency_samples : int
+        Number of most recent request latencies kept for metrics.
+
+    Examples
+    --------
+    >>> server = teamod.EvaluationServer(example_TEA, port=8765, max_batch_size=512, max_latency=0.002)
+    >>> server.run() # serve until interrupted
+
+    """
+
+    def __init__(self, tea, host='127.0.0.1', port=0, path=None, max_batch_size=256,
+                 max_latency=0.005, NPV=0., product_index=0, solver_kwargs=None,
+                 latency_samples=10_000):
+        if max_batch_size < 1:
+            raise ValueError(f'max_batch_size must be at least 1, not {max_batch_size}')
+        if max_latency < 0:
+            raise ValueError(f'max_latency must be non-negative, not {max_latency}')
+        #: Baseline TEA input arguments.
+        self.inputs = tea.get_inputs() if isinstance(tea, TEA) else dict(tea)
+
+        #: Host to listen on.
+        self.host = host
+
+        #: Port to listen on (0 for any free port).
+        self.port = port
+
+        #: Path of the Unix socket (None for TCP).
+        self.path = path
+
+        #: Maximum number of requests solved together.
+        self.max_batch_size = max_batch_size
+
+        #: Maximum time (s) to wait for more requests after the first pending request.
+        self.max_latency = max_latency
+
+        #: NPV at which IRR and MPSP are solved.
+        self.NPV = NPV
+
+        #: Index of the product whose MPSP is solved.
+        self.product_index = product_index
+
+        #: Keyword arguments of TEABatch solves by kind.
+        self.solver_kwargs = {} if solver_kwargs is None else solver_kwargs
+
+        self._latencies = deque(maxlen=latency_samples)
+        self._server = None
+        self._queue = None
+        self._batcher = None
+        self._connections = {}
+        self.reset_metrics()
+
+    def reset_metrics(self):
+        """Reset request, batch, and latency metrics."""
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.largest_batch = 0
+        self._latencies.clear()
+        self._metrics_start = time.perf_counter()
+
+    @property
+    def metrics(self):
+        """
+        Dictionary of metrics: numbers of completed requests, errors, and
+        batches, the mean and largest batch sizes, the throughput (requests/s)
+        since the metrics were reset, and the mean and percentiles (s) of the
+        latency from receipt to response of recent requests.
+        """
+        elapsed = time.perf_counter() - self._metrics_start
+        latencies = np.array(self._latencies)
+        if latencies.size:
+            mean = latencies.mean()
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        else:
+            mean = p50 = p95 = p99 = np.nan
+        queue = self._queue
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'batches': self.batches,
+            'mean_batch_size': self.requests / self.batches if self.batches else np.nan,
+            'largest_batch': self.largest_batch,
+            'throughput': self.requests / elapsed if elapsed else np.nan,
+            'latency_mean': mean,
+            'latency_p50': p50,
+            'latency_p95': p95,
+            'latency_p99': p99,
+            'pending': 0 if queue is None else queue.qsize(),
+            }
+
+    @property
+    def address(self):
+        """Address the server listens on (the socket path or a (host, port) tuple)."""
+        if self.path is not None: return self.path
+        if self._server is None: return (self.host, self.port)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def start(self):
+        """Start listening and batching requests."""
+        if self._server is not None: raise RuntimeError('server is already running')
+        self._queue = asyncio.Queue()
+        self._batcher = asyncio.create_task(self._batch_requests())
+        if self.path is None:
+            self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        else:
+            self._server = await asyncio.start_unix_server(self._handle_connection, self.path)
+        self.reset_metrics()
+        return self
+
+    async def serve_forever(self):
+        """Start the server (if not started) and serve until cancelled."""
+        if self._server is None: await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    def run(self):
+        """Serve until interrupted (blocking)."""
+        try:
+            asyncio.run(self.serve_forever())
+        except KeyboardInterrupt:
+            pass
+
+    async def close(self):
+        """Stop listening, close all connections, and cancel pending requests."""
+        server = self._server
+        if server is None: return
+        self._server = None
+        server.close()
+        connections = self._connections
+        for writer in connections.values(): writer.close()
+        if connections: await asyncio.gather(*connections, return_exceptions=True)
+        await server.wait_closed()
+        self._batcher.cancel()
+        try:
+            await self._batcher
+        except asyncio.CancelledError:
+            pass
+        queue = self._queue
+        while not queue.empty():
+            queue.get_nowait()[3].cancel()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exception):
+        await self.close()
+
+    async def submit(self, kind, parameters=None):
+        """Queue a request in-process and return its result and status code."""
+        if self._server is None: raise RuntimeError('server is not running')
+        if kind not in solve_kinds:
+            raise ValueError(f"kind must be one of {', '.join([repr(i) for i in solve_kinds])}, not {repr(kind)}")
+        if parameters is None: parameters = {}
+        names = tuple(sorted(parameters))
+        for name in names: parse_parameter(name)
+        values = tuple([float(parameters[name]) for name in names])
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((kind, names, values, future, time.perf_counter()))
+        return await future
+
+    async def _batch_requests(self):
+        queue = self._queue
+        loop = asyncio.get_running_loop()
+        max_batch_size = self.max_batch_size
+        while True:
+            requests = [await queue.get()]
+            deadline = loop.time() + self.max_latency
+            while len(requests) < max_batch_size:
+                if queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0: break
+                    try:
+                        requests.append(await asyncio.wait_for(queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    requests.append(queue.get_nowait())
+            requests = [i for i in requests if not i[3].done()] # skip cancelled requests
+            if not requests: continue
+            outcomes = await loop.run_in_executor(None, self._evaluate, requests)
+            now = time.perf_counter()
+            self.batches += 1
+            self.largest_batch = max(self.largest_batch, len(requests))
+            for (kind, names, values, future, received), outcome in zip(requests, outcomes):
+                self.requests += 1
+                self._latencies.append(now - received)
+                if future.done(): continue
+                if isinstance(outcome, Exception):
+                    self.errors += 1
+                    future.set_exception(outcome)
+                else:
+                    future.set_result(outcome)
+
+    def _evaluate(self, requests):
+        """Solve requests grouped by kind and parameter names; return a result and status code (or an exception) for each."""
+        groups = {}
+        for i, (kind, names, values, future, received) in enumerate(requests):
+            groups.setdefault((kind, names), []).append(i)
+        outcomes = [None] * len(requests)
+        solver_kwargs = self.solver_kwargs
+        for (kind, names), indices in groups.items():
+            values = np.array([requests[i][2] for i in indices], dtype=float).reshape(len(indices), len(names))
+            try:
+                results, status = evaluate_scenarios(self.inputs, names, values, kind, self.NPV,
+                                                     self.product_index, solver_kwargs.get(kind))
+            except Exception as error:
+                for i in indices: outcomes[i] = error
+                continue
+            results = np.broadcast_to(results, (len(indices),))
+            status = np.broadcast_to(status, (len(indices),))
+            for i, result, code in zip(indices, results.tolist(), status.tolist()):
+                outcomes[i] = (result, code)
+        return outcomes
+
+    async def _handle_connection(self, reader, writer):
+        connection = asyncio.current_task()
+        self._connections[connection] = writer
+        lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line: break
+                task = asyncio.create_task(self._respond(line, writer, lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks: await asyncio.gather(*tasks, return_exceptions=True)
+        except ConnectionError:
+            pass
+        finally:
+            del self._connections[connection]
+            for task in tasks: task.cancel()
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _respond(self, line, writer, lock):
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+            if request.get('op') == 'metrics':
+                response = {'id': request_id, 'metrics': {i: (as_json_number(j) if isinstance(j, float) else j)
+                                                  for i, j in self.metrics.items()}}
+            else:
+                result, status = await self.submit(request.get('kind', 'NPV'), request.get('parameters'))
+                response = {'id': request_id, 'result': as_json_number(result), 'status': status}
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            response = {'id': request_id, 'error': f'{type(error).__name__}: {error}'}
+        async with lock:
+            writer.write(encode_message(response))
+            await writer.drain()
+
+    def __repr__(self):
+        address = self.address
+        if isinstance(address, tuple): address = f'{address[0]}:{address[1]}'
+        return f'<{type(self).__name__}: {address}, {self.requests} requests in {self.batches} batches>'
+
+
+class EvaluationClient():
+    """
+    Create an EvaluationClient object to send requests to an EvaluationServer
+    over localhost TCP (or a Unix socket if a path is given). Requests are
+    pipelined over one connection, so many may be awaited concurrently.
+
+    Parameters
+    ----------
+    host : str
+        Host of the server (ignored if a path is given).
+    port : int
+        Port of the server.
+    path : str
+        Path of the Unix socket of the server.
+
+    Examples
+    --------
+    >>> async with teamod.EvaluationClient(port=8765) as client:
+    >>>     MPSPs = await asyncio.gather(*[client.evaluate('MPSP', {'lang_factor': x}) for x in lang_factors])
+
+    """
+
+    def __init__(self, host='127.0.0.1', port=None, path=None):
+        if path is None and port is None:
+            raise ValueError('either a port or a path must be given')
+        #: Host of the server.
+        self.host = host
+
+        #: Port of the server.
+        self.port = port
+
+        #: Path of the Unix socket of the server.
+        self.path = path
+
+        self._reader = self._writer = self._listener = None
+        self._pending = {}
+        self._ids = itertools.count()
+
+    async def connect(self):
+        """Connect to the server."""
+        if self.path is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        else:
+            self._reader, self._writer = await asyncio.open_unix_connection(self.path)
+        self._listener = asyncio.create_task(self._listen())
+        return self
+
+    async def _listen(self):
+        pending = self._pending
+        try:
+            while True:
+                line = await self._reader.readline()
+                if not line: break
+                response = json.loads(line)
+                future = pending.pop(response.get('id'), None)
+                if future is not None and not future.done(): future.set_result(response)
+        finally:
+            for future in pending.values():
+                if not future.done(): future.set_exception(ConnectionError('connection to the server was closed'))
+            pending.clear()
+
+    async def _request(self, message):
+        if self._writer is None: await self.connect()
+        if self._listener.done(): raise ConnectionError('connection to the server was closed')
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        message['id'] = request_id
+        self._writer.write(encode_message(message))
+        await self._writer.drain()
+        response = await future
+        if 'error' in response: raise ValueError(response['error'])
+        return response
+
+    async def evaluate(self, kind='NPV', parameters=None, full_output=False):
+        """
+        Get the result of a solve of the given kind ('NPV', 'IRR', or 'MPSP') with
+        parameter values by name (NaN if the solve failed). If full_output is
+        True, the status code (see teamod._solvers.status_messages) is also returned.
+        """
+        response = await self._request({'kind': kind, 'parameters': {} if parameters is None else parameters})
+        result = response['result']
+        result = np.nan if result is None else result
+        return (result, response['status']) if full_output else result
+
+    async def metrics(self):
+        """Get the metrics of the server (see EvaluationServer.metrics)."""
+        response = await self._request({'op': 'metrics'})
+        return {i: (np.nan if j is None else j) for i, j in response['metrics'].items()}
+
+    async def close(self):
+        """Close the connection."""
+        writer = self._writer
+        if writer is None: return
+        self._writer = None
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+        await self._listener
+
+    async def __aenter__(self):
+        return await self.connect()
+
+    async def __aexit__(self, *exception):
+        await self.close()
+
+    def __repr__(self):
+        address = self.path if self.path is not None else f'{self.host}:{self.port}'
+        return f'<{type(self).__name__}: {address}>'
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+# teamod: Modules to enable techno-economic analysis (TEA) in Python.
+# Copyright (C) 2023-2024, Sarang S. Bhagwat <sarangb2@illinois.edu>
+#
+# This module is under the MIT open-source license. See
+# github.com/sarangbhagwat/teamod/LICENSE.txt
+# for license details.
+"""
+@author: sarangbhagwat
+Array-valued bracketed root finders that solve many scenarios at once.
+Each scenario has its own bracket and convergence mask; instead of raising,
+failures are reported per scenario with a status code. A scalar Brent's
+method (as in SciPy) serves the scalar solves, so SciPy is not required.
+"""
+import math
+import numpy as np
+
+__all__ = (
+    'CONVERGED',
+    'SIGN_ERROR',
+    'CONVERGENCE_ERROR',
+    'VALUE_ERROR',
+    'status_messages',
+    'RootResults',
+    'bisect',
+    'illinois',
+    'find_roots',
+    'brentq',
+)
+
+#: Status codes.
+CONVERGED = 0
+SIGN_ERROR = -1
+CONVERGENCE_ERROR = -2
+VALUE_ERROR = -3
+
+#: Status messages by status code.
+status_messages = {
+    CONVERGED: 'converged',
+    SIGN_ERROR: 'objective function does not have opposite signs at bounds',
+    CONVERGENCE_ERROR: 'maximum number of iterations reached',
+    VALUE_ERROR: 'objective function returned NaN',
+}
+
+class RootResults():
+    """Results of an array-valued root solve (one entry per scenario)."""
+
+    def __init__(self, root, status, iterations, function_calls):
+        #: Roots (NaN where the solve failed).
+        self.root = root
+
+        #: Status codes (see status_messages).
+        self.status = status
+
+        #: Number of iterations per scenario.
+        self.iterations = iterations
+
+        #: Total number of objective function evaluations (summed over scenarios).
+        self.function_calls = function_calls
+
+    @property
+    def converged(self):
+        """Mask of scenarios that converged."""
+        return self.status == CONVERGED
+
+    @property
+    def flag(self):
+        """Status messages of each scenario."""
+        return np.array([status_messages[i] for i in self.status.tolist()])
+
+    def __repr__(self):
+        n = self.status.size
+        return f'<RootResults: {self.converged.sum()}/{n} converged>'
+
+def _initialize(f, lb, ub, size):
+    if size is None:
+        size = np.broadcast(np.asarray(lb), np.asarray(ub)).size
+    a = np.array(np.broadcast_to(lb, (size,)), dtype=float)
+    b = np.array(np.broadcast_to(ub, (size,)), dtype=float)
+    index = np.arange(size)
+    fa = np.asarray(f(a, index), dtype=float)
+    fb = np.asarray(f(b, index), dtype=float)
+    root = np.full(size, np.nan)
+    status = np.full(size, CONVERGENCE_ERROR)
+    status[np.isnan(fa) | np.isnan(fb)] = VALUE_ERROR
+    status[(status != VALUE_ERROR) & ((fa > 0.) == (fb > 0.))] = SIGN_ERROR
+    at_a = (fa == 0.) & (status != VALUE_ERROR)
+    at_b = (fb == 0.) & (status != VALUE_ERROR)
+    root[at_b] = b[at_b]
+    root[at_a] = a[at_a]
+    status[at_a | at_b] = CONVERGED
+    return a, b, fa, fb, root, status
+
+def bisect(f, lb, ub, xtol=1e-5, rtol=8.881784197001252e-16, maxiter=100, size=None):
+    """
+    Solve f(x) = 0 for many scenarios at once by bisection. The objective is
+    called as f(x, index), where x holds the current guesses of the scenarios
+    with the given indices, and must return the objective values of those scenarios.
+    Bounds may be scalars or arrays with one value per scenario.
+    Returns a RootResults object.
+    """
+    a, b, fa, fb, root, status = _initialize(f, lb, ub, size)
+    iterations = np.zeros(status.size, dtype=int)
+    function_calls = 2 * status.size
+    active = np.flatnonzero(status == CONVERGENCE_ERROR)
+    for i in range(maxiter):
+        if not active.size: break
+        c = 0.5 * (a[active] + b[active])
+        fc = np.asarray(f(c, active), dtype=float)
+        function_calls += active.size
+        iterations[active] += 1
+        same_sign = (fc > 0.) == (fa[active] > 0.)
+        left = active[same_sign]
+        right = active[~same_sign]
+        a[left], fa[left] = c[same_sign], fc[same_sign]
+        b[right], fb[right] = c[~same_sign], fc[~same_sign]
+        nan = np.isnan(fc)
+        done = (fc == 0.) | (np.abs(b[active] - a[active]) < xtol + rtol * np.abs(c))
+        root[active[done]] = c[done]
+        status[active[done]] = CONVERGED
+        status[active[nan]] = VALUE_ERROR
+        active = active[~(done | nan)]
+    return RootResults(root, status, iterations, function_calls)
+
+def illinois(f, lb, ub, xtol=1e-5, rtol=8.881784197001252e-16, maxiter=100, size=None):
+    """
+    Solve f(x) = 0 for many scenarios at once by the Illinois (modified regula
+    falsi) method. The objective is called as f(x, index), where x holds the
+    current guesses of the scenarios with the given indices, and must return
+    the objective values of those scenarios. Bounds may be scalars or arrays
+    with one value per scenario. Returns a RootResults object.
+    """
+    a, b, fa, fb, root, status = _initialize(f, lb, ub, size)
+    iterations = np.zeros(status.size, dtype=int)
+    function_calls = 2 * status.size
+    active = np.flatnonzero(status == CONVERGENCE_ERROR)
+    for i in range(maxiter):
+        if not active.size: break
+        a_, b_, fa_, fb_ = a[active], b[active], fa[active], fb[active]
+        c = (a_ * fb_ - b_ * fa_) / (fb_ - fa_)
+        # guard against round-off pushing c out of the bracket
+        out = ~((c > np.minimum(a_, b_)) & (c < np.maximum(a_, b_)))
+        c[out] = 0.5 * (a_[out] + b_[out])
+        fc = np.asarray(f(c, active), dtype=float)
+        function_calls += active.size
+        iterations[active] += 1
+        opposite = (fc > 0.) != (fb_ > 0.)
+        # keep a bracket around the root: [b, c] if signs differ, otherwise [a, c] with fa halved
+        a_ = np.where(opposite, b_, a_)
+        fa_ = np.where(opposite, fb_, 0.5 * fa_)
+        a[active], fa[active] = a_, fa_
+        b[active], fb[active] = c, fc
+        nan = np.isnan(fc)
+        done = (fc == 0.) | (np.abs(c - a_) < xtol + rtol * np.abs(c))
+        root[active[done]] = c[done]
+        status[active[done]] = CONVERGED
+        status[active[nan]] = VALUE_ERROR
+        active = active[~(done | nan)]
+    return RootResults(root, status, iterations, function_calls)
+
+#: Array-valued root finders by name.
+methods = {
+    'bisect': bisect,
+    'illinois': illinois,
+}
+
+def find_roots(f, lb, ub, method='illinois', **kwargs):
+    """Solve f(x, index) = 0 for many scenarios at once with the given method ('illinois' or 'bisect')."""
+    try:
+        solver = methods[method]
+    except KeyError:
+        raise ValueError(f"method must be one of {', '.join([repr(i) for i in methods])}, not {repr(method)}") from None
+    return solver(f, lb, ub, **kwargs)
+
+#%% Scalar root finder
+
+def brentq(f, a, b, args=(), xtol=2e-12, rtol=4*np.finfo(float).eps, maxiter=100, callback=None):
+    """
+    Find a root of f within [a, b] by Brent's method. This follows
+    scipy.optimize.brentq step by step (same arguments, iterates, and
+    errors), so results are identical with or without SciPy. If given,
+    callback is called each iteration with the best estimate of the root and
+    the width of the bracket around it.
+    """
+    if xtol <= 0: raise ValueError(f'xtol too small ({xtol:g} <= 0)')
+    if rtol < 4*np.finfo(float).eps: raise ValueError(f'rtol too small ({rtol:g} < {4*np.finfo(float).eps:g})')
+    xpre, xcur = float(a), float(b)
+    xblk = fblk = spre = scur = 0.
+    fpre = f(xpre, *args)
+    fcur = f(xcur, *args)
+    if fpre == 0: return xpre
+    if fcur == 0: return xcur
+    if math.copysign(1., fpre) == math.copysign(1., fcur):
+        raise ValueError('f(a) and f(b) must have different signs')
+    for i in range(maxiter):
+        if fpre != 0 and fcur != 0 and math.copysign(1., fpre) != math.copysign(1., fcur):
+            xblk = xpre
+            fblk = fpre
+            spre = scur = xcur - xpre
+        if abs(fblk) < abs(fcur):
+            xpre, xcur, xblk = xcur, xblk, xcur
+            fpre, fcur, fblk = fcur, fblk, fcur
+        if callback is not None: callback(xcur, abs(xblk - xcur))
+        delta = (xtol + rtol*abs(xcur))/2
+        sbis = (xblk - xcur)/2
+        if fcur == 0 or abs(sbis) < delta: return xcur
+        if abs(spre) > delta and abs(fcur) < abs(fpre):
+            if xpre == xblk: # interpolate
+                stry = -fcur*(xcur - xpre)/(fcur - fpre)
+            else: # extrapolate
+                dpre = (fpre - fcur)/(xpre - xcur)
+                dblk = (fblk - fcur)/(xblk - xcur)
+                stry = -fcur*(fblk*dblk - fpre*dpre)/(dblk*dpre*(fblk - fpre))
+            if 2*abs(stry) < min(abs(spre), 3*abs(sbis) - delta): # good short step
+                spre = scur
+                scur = stry
+            else: # bisect
+                spre = scur = sbis
+        else: # bisect
+            spre = scur = sbis
+        xpre = xcur
+        fpre = fcur
+        if abs(scur) > delta:
+            xcur += scur
+        else:
+            xcur += delta if sbis > 0 else -delta
+        fcur = f(xcur, *args)
+    raise RuntimeError(f'Failed to converge after {maxiter} iterations, value is {xcur}.')
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+# teamod: Modules to enable techno-economic analysis (TEA) in Python.
+# Copyright (C) 2023-2024, Sarang S. Bhagwat <sarangb2@illinois.edu>
+#
+# This module is under the MIT open-source license. See
+# github.com/sarangbhagwat/teamod/LICENSE.txt
+# for license details.
+"""
+@author: sarangbhagwat
+Memory-mapped store of (scenario x component x year) cash flow tensors.
+Each component (as in TEA.get_cashflow_report) is stored as a contiguous
+(scenario x year) block of a binary file described by a JSON schema, so
+slices of a component across scenarios are read without copying.
+"""
+import os
+import json
+import numpy as np
+from ._TEA import TEA, cashflow_components
+from ._TEABatch import TEABatch, get_batch_inputs
+
+__all__ = ('CashflowStore',)
+
+#: Version of the store layout.
+store_version = 1
+
+class CashflowStore():
+    """
+    Open a CashflowStore of (scenario x component x year) cash flow tensors
+    in a directory (see CashflowStore.create to create one). The directory
+    holds a JSON schema ('schema.json') and a binary file ('cashflows.dat')
+    with one contiguous (scenario x year) block per component.
+
+    Parameters
+    ----------
+    path : str
+        Directory of the store.
+    mode : str
+        'r' to read or 'r+' to read and write.
+
+    Examples
+    --------
+    >>> store = teamod.CashflowStore.create('cashflows', size=10_000, project_duration=20)
+    >>> store.write_scenarios(example_TEA, {'lang_factor': lang_factors})
+    >>> store.read('Cumulative net present value', slice(5000, 6000)) # no copy
+    >>> store.to_excel(5000, 'cashflow_report_5000.xlsx')
+
+    """
+
+    def __init__(self, path, mode='r'):
+        if mode not in ('r', 'r+'):
+            raise ValueError(f"mode must be 'r' or 'r+', not {repr(mode)}")
+        with open(os.path.join(path, 'schema.json')) as file:
+            schema = json.load(file)
+        if schema.get('version') != store_version:
+            raise ValueError(f"cannot read version {schema.get('version')} of a cash flow store")
+        #: Directory of the store.
+        self.path = path
+
+        #: JSON schema of the store.
+        self.schema = schema
+
+        #: Names of the components in order.
+        self.components = tuple(schema['components'])
+
+        #: Number of scenarios.
+        self.size = schema['size']
+
+        #: Project duration (years).
+        self.project_duration = schema['project_duration']
+
+        #: (component x scenario x year) memory-mapped array.
+        self.data = np.memmap(os.path.join(path, schema['data']), dtype=schema['dtype'], mode=mode,
+                              shape=(len(self.components), self.size, self.project_duration))
+        self._component_index = {j: i for i, j in enumerate(self.components)}
+
+    @classmethod
+    def create(cls, path, size, project_duration, components=cashflow_components,
+               dtype='float64', metadata=None):
+        """
+        Create a store for the given number of scenarios, project duration,
+        and components (defaults to all components of cash flow reports) in a new
+        or empty directory; metadata (JSON-serializable) is saved in the schema.
+        Returns the store opened for reading and writing.
+        """
+        os.makedirs(path, exist_ok=True)
+        schema_path = os.path.join(path, 'schema.json')
+        if os.path.exists(schema_path):
+            raise FileExistsError(f'a cash flow store already exists in {repr(path)}')
+        schema = {
+            'version': store_version,
+            'components': list(components),
+            'size': int(size),
+            'project_duration': int(project_duration),
+            'dtype': np.dtype(dtype).str,
+            'layout': ['component', 'scenario', 'year'],
+            'data': 'cashflows.dat',
+            'metadata': {} if metadata is None else metadata,
+            }
+        shape = (len(components), int(size), int(project_duration))
+        data = np.memmap(os.path.join(path, schema['data']), dtype=dtype, mode='w+', shape=shape)
+        data.flush()
+        del data
+        with open(schema_path, 'w') as file:
+            json.dump(schema, file, indent=1)
+        return cls(path, 'r+')
+
+    @property
+    def tensor(self):
+        """(scenario x component x year) view of all cash flows (no copy)."""
+        return self.data.transpose(1, 0, 2)
+
+    def component_index(self, component):
+        """Get the index of a component by name."""
+        try:
+            return self._component_index[component]
+        except KeyError:
+            raise ValueError(f'{repr(component)} is not a component of this store; '
+                             f"components are {', '.join([repr(i) for i in self.components])}") from None
+
+    def read(self, component, scenarios=slice(None), years=slice(None)):
+        """
+        Get a (scenario x year) array of a component. Slices of scenarios and
+        years return views of the memory-mapped file (no copy); index arrays
+        return copies.
+        """
+        return self.data[self.component_index(component), scenarios, years]
+
+    def write(self, start, flows):
+        """
+        Write (scenario x year) arrays of components by name (e.g., from
+        TEABatch.get_cashflow_components) for consecutive scenarios
+        starting at the given scenario index.
+        """
+        data = self.data
+        for component, flow in flows.items():
+            i = self.component_index(component)
+            flow = np.asarray(flow)
+            data[i, start:start + flow.shape[0]] = flow
+
+    def write_batch(self, batch, start=0, IRR=None):
+        """Write all components of the scenarios of a TEABatch (at a given IRR; defaults to the current IRR) starting at the given scenario index."""
+        if batch.project_duration != self.project_duration:
+            raise ValueError(f'project duration of the batch ({batch.project_duration}) does not match the store ({self.project_duration})')
+        components = batch.get_cashflow_components(IRR)
+        self.write(start, {i: components[i] for i in self.components})
+
+    def write_scenarios(self, tea, parameter_values, start=0, chunk_size=10_000):
+        """
+        Evaluate and write scenarios in chunks given a baseline TEA object (or
+        its input arguments) and arrays of parameter values by name (e.g.,
+        'lang_factor' or 'product_prices[0]'; see TEABatch).
+        """
+        inputs = tea.get_inputs() if isinstance(tea, TEA) else dict(tea)
+        parameter_values = {i: np.asarray(j, dtype=float) for i, j in parameter_values.items()}
+        size = max([j.shape[0] for j in parameter_values.values()], default=1)
+        for i in range(0, size, chunk_size):
+            chunk = {name: values[i:i + chunk_size] for name, values in parameter_values.items()}
+            self.write_batch(TEABatch(**get_batch_inputs(inputs, chunk)), start + i)
+
+    def to_frame(self, scenario):
+        """Get a DataFrame of the cash flow report of a scenario."""
+        import pandas as pd
+        return pd.DataFrame({i: self.data[j, scenario] for j, i in enumerate(self.components)})
+
+    def to_excel(self, scenario, filename='cashflow_report.xlsx'):
+        """Export the cash flow report of a scenario to an Excel file and return it as a DataFrame."""
+        frame = self.to_frame(scenario)
+        frame.to_excel(filename)
+        return frame
+
+    def flush(self):
+        """Write changes to disk."""
+        self.data.flush()
+
+    def __repr__(self):
+        return f'<{type(self).__name__}: {self.size} scenarios x {len(self.components)} components x {self.project_duration} years>'
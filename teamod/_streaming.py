@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+# teamod: Modules to enable techno-economic analysis (TEA) in Python.
+# Copyright (C) 2023-2024, Sarang S. Bhagwat <sarangb2@illinois.edu>
+#
+# This module is under the MIT open-source license. See
+# github.com/sarangbhagwat/teamod/LICENSE.txt
+# for license details.
+"""
+@author: sarangbhagwat
+Streaming evaluation of scenario tables that do not fit in memory. Parameter
+rows are read from CSV or Parquet files in fixed-size chunks, each chunk is
+evaluated as one TEABatch solve, and results are appended to an output file
+as they are computed; a checkpoint allows resuming after a crash.
+"""
+import os
+import json
+import queue
+import threading
+from importlib.util import find_spec
+import numpy as np
+from ._TEA import TEA
+from ._TEABatch import parse_parameter, solve_kinds
+from ._parallel import evaluate_scenarios
+
+__all__ = ('StreamingPipeline', 'read_parameter_chunks', 'prefetch')
+
+def get_file_format(path):
+    """Get the format ('csv' or 'parquet') of a file from its extension."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return 'csv'
+    elif extension in ('.parquet', '.pq'):
+        return 'parquet'
+    else:
+        raise ValueError(f"cannot infer file format of {repr(path)}; extension must be '.csv' or '.parquet'")
+
+def check_parquet_engine(path, writing=False):
+    """
+    Raise an ImportError if Parquet files cannot be read (requires pyarrow) or,
+    if writing is True, written (requires pyarrow or fastparquet) at the given path.
+    """
+    if get_file_format(path) != 'parquet': return
+    engines = ('pyarrow', 'fastparquet') if writing else ('pyarrow',)
+    if not any([find_spec(i) for i in engines]):
+        raise ImportError(f"{'writing' if writing else 'reading'} Parquet files requires {' or '.join(engines)}")
+
+def rechunk(frames, chunk_size):
+    """Yield DataFrames of exactly chunk_size rows (except the last) from an iterable of DataFrames."""
+    import pandas as pd
+    buffer = []
+    size = 0
+    for frame in frames:
+        buffer.append(frame)
+        size += len(frame)
+        if size < chunk_size: continue
+        frame = pd.concat(buffer, ignore_index=True) if len(buffer) > 1 else buffer[0]
+        start = 0
+        while size - start >= chunk_size:
+            yield frame.iloc[start:start + chunk_size].reset_index(drop=True)
+            start += chunk_size
+        buffer = [frame.iloc[start:]]
+        size -= start
+    if size:
+        yield pd.concat(buffer, ignore_index=True)
+
+def read_parameter_chunks(path, chunk_size, columns=None, start_chunk=0):
+    """
+    Yield DataFrames of chunk_size parameter rows (the last may be smaller) from
+    a CSV or Parquet file, starting at the given chunk. Only the given columns
+    are read (all if None). Reading Parquet files requires pyarrow.
+    """
+    if get_file_format(path) == 'csv':
+        import pandas as pd
+        # a callable (rather than a range, which pandas turns into a set of
+        # row numbers) keeps memory independent of the number of skipped rows
+        skipped_rows = start_chunk * chunk_size
+        skiprows = (lambda i: 0 < i <= skipped_rows) if start_chunk else None
+        yield from pd.read_csv(path, chunksize=chunk_size, usecols=columns, skiprows=skiprows)
+    else:
+        try:
+            from pyarrow import parquet
+        except ImportError: # pragma: no cover
+            raise ImportError('reading Parquet files requires pyarrow') from None
+        file = parquet.ParquetFile(path)
+        skipped_rows = start_chunk * chunk_size
+        frames = (batch.to_pandas() for batch in file.iter_batches(batch_size=chunk_size, columns=columns))
+        for frame in rechunk(frames, chunk_size):
+            if skipped_rows >= len(frame):
+                skipped_rows -= len(frame)
+                continue
+            yield frame.iloc[skipped_rows:].reset_index(drop=True) if skipped_rows else frame
+            skipped_rows = 0
+
+def prefetch(iterable, maxsize=2):
+    """
+    Yield the items of an iterable, producing up to maxsize items ahead in a
+    background thread. The producer blocks while the queue is full, so memory
+    is bounded by maxsize items (backpressure). Exceptions are reraised.
+    """
+    items = queue.Queue(maxsize)
+    done = object()
+    stop = threading.Event()
+    def put(item):
+        # give up once the consumer has stopped
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)): return
+            put((done, None))
+        except BaseException as error:
+            put((done, error))
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is done:
+                if error is not None: raise error
+                return
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+class StreamingPipeline():
+    """
+    Create a StreamingPipeline object to evaluate a CSV or Parquet table of
+    scenarios chunk by chunk. Each column of the table holds values of a
+    parameter (named as in TEABatch, e.g., 'lang_factor' or
+    'product_prices[0]'). Results of each chunk (the scenario row number, the
+    result and status code of each kind of solve, and, optionally, the
+    parameter values) are appended to a CSV file or written as a part file
+    of a Parquet directory. Memory use depends only on the chunk size and the
+    number of chunks read ahead, not on the number of scenarios. Reading a
+    Parquet table requires pyarrow and writing Parquet results requires
+    pyarrow or fastparquet; both are checked when the pipeline is created.
+
+    After each chunk is written, a JSON checkpoint records the number of
+    completed chunks; if the run is interrupted, `run` resumes from the last
+    completed chunk and discards any partially written results.
+
+    Parameters
+    ----------
+    tea : TEA or dict
+        Baseline TEA object (or its input arguments; see TEA.get_inputs).
+    input_path : str
+        Path of the parameter table ('.csv' or '.parquet').
+    output_path : str
+        Path of the results; a '.csv' file or a '.parquet' directory of part files.
+    kinds : tuple
+        Kinds of solves: 'NPV' (at the IRR), 'IRR' (given the NPV), and/or
+        'MPSP' (at the IRR, given the NPV).
+    parameters : tuple
+        Columns of the table to use as parameters; defaults to all columns.
+    chunk_size : int
+        Number of rows read and evaluated at a time.
+    NPV : float
+        NPV at which IRR and MPSP are solved.
+    product_index : int
+        Index of the product whose MPSP is solved.
+    solver_kwargs : dict
+        Keyword arguments of TEABatch solves by kind, e.g., {'MPSP': {'MPSP_ub': 200.}}.
+    prefetch : int
+        Maximum number of chunks read ahead while a chunk is being evaluated.
+    include_parameters : bool
+        Whether to also write parameter values with the results.
+    checkpoint_path : str
+        Path of the checkpoint; defaults to the output path with a '.checkpoint.json' suffix.
+
+    Examples
+    --------
+    >>> pipeline = teamod.StreamingPipeline(example_TEA, 'scenarios.csv', 'results.csv', kinds=('NPV', 'MPSP'))
+    >>> pipeline.run() # rerun after an interruption to resume
+
+    """
+
+    def __init__(self, tea, input_path, output_path, kinds=('NPV',), parameters=None,
+                 chunk_size=10_000, NPV=0., product_index=0, solver_kwargs=None,
+                 prefetch=2, include_parameters=False, checkpoint_path=None):
+        inputs = tea.get_inputs() if isinstance(tea, TEA) else dict(tea)
+        check_parquet_engine(input_path)
+        check_parquet_engine(output_path, writing=True)
+        for kind in kinds:
+            if kind not in solve_kinds:
+                raise ValueError(f"kinds must be among {', '.join([repr(i) for i in solve_kinds])}, not {repr(kind)}")
+        if parameters is not None:
+            parameters = tuple(parameters)
+            for name in parameters: parse_parameter(name)
+        #: Baseline TEA input arguments.
+        self.inputs = inputs
+
+        #: Path of the parameter table.
+        self.input_path = input_path
+
+        #: Path of the results.
+        self.output_path = output_path
+
+        #: Format of the results ('csv' or 'parquet').
+        self.output_format = get_file_format(output_path)
+
+        #: Kinds of solves.
+        self.kinds = tuple(kinds)
+
+        #: Columns of the table to use as parameters (None for all columns).
+        self.parameters = parameters
+
+        #: Number of rows read and evaluated at a time.
+        self.chunk_size = chunk_size
+
+        #: NPV at which IRR and MPSP are solved.
+        self.NPV = NPV
+
+        #: Index of the product whose MPSP is solved.
+        self.product_index = product_index
+
+        #: Keyword arguments of TEABatch solves by kind.
+        self.solver_kwargs = {} if solver_kwargs is None else solver_kwargs
+
+        #: Maximum number of chunks read ahead.
+        self.prefetch = prefetch
+
+        #: Whether to also write parameter values with the results.
+        self.include_parameters = include_parameters
+
+        #: Path of the checkpoint.
+        self.checkpoint_path = output_path + '.checkpoint.json' if checkpoint_path is None else checkpoint_path
+
+    def evaluate(self, chunk, start_row=0):
+        """Get a DataFrame of results of a DataFrame of parameter rows starting at the given row number."""
+        import pandas as pd
+        names = tuple(chunk.columns)
+        for name in names: parse_parameter(name)
+        values = chunk.to_numpy(dtype=float)
+        results = {'scenario': np.arange(start_row, start_row + len(chunk))}
+        if self.include_parameters:
+            for i, name in enumerate(names): results[name] = values[:, i]
+        kwargs = self.solver_kwargs
+        for kind in self.kinds:
+            results[kind], results[kind + ' status'] = evaluate_scenarios(
+                self.inputs, names, values, kind, self.NPV, self.product_index, kwargs.get(kind)
+            )
+        return pd.DataFrame(results)
+
+    def _get_settings(self):
+        return {
+            'input_path': os.path.abspath(self.input_path),
+            'output_path': os.path.abspath(self.output_path),
+            'kinds': list(self.kinds),
+            'parameters': None if self.parameters is None else list(self.parameters),
+            'chunk_size': self.chunk_size,
+            'include_parameters': self.include_parameters,
+            }
+
+    def load_checkpoint(self):
+        """Get the checkpoint of this pipeline (None if there is none or it was made with other settings)."""
+        try:
+            with open(self.checkpoint_path) as file: checkpoint = json.load(file)
+        except FileNotFoundError:
+            return None
+        return checkpoint if checkpoint.get('settings') == self._get_settings() else None
+
+    def _save_checkpoint(self, checkpoint):
+        path = self.checkpoint_path
+        temporary_path = path + '.tmp'
+        with open(temporary_path, 'w') as file:
+            json.dump(checkpoint, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, path)
+
+    def _part_path(self, chunk_index):
+        return os.path.join(self.output_path, f'part-{chunk_index:06d}.parquet')
+
+    def _prepare_output(self, checkpoint):
+        """Discard results written after the checkpoint (or all results if there is no checkpoint)."""
+        output_path = self.output_path
+        completed_chunks = checkpoint['completed_chunks'] if checkpoint else 0
+        if self.output_format == 'csv':
+            if checkpoint:
+                with open(output_path, 'r+b') as file: file.truncate(checkpoint['output_size'])
+            elif os.path.exists(output_path):
+                os.remove(output_path)
+        else:
+            os.makedirs(output_path, exist_ok=True)
+            for filename in os.listdir(output_path):
+                if filename.startswith('part-') and filename.endswith('.parquet'):
+                    if int(filename[5:-8]) >= completed_chunks:
+                        os.remove(os.path.join(output_path, filename))
+
+    def chunks(self, resume=True):
+        """
+        Evaluate and write the remaining chunks, yielding the DataFrame of
+        results of each chunk after it is written and checkpointed. If resume
+        is False, any previous results are discarded.
+        """
+        checkpoint = self.load_checkpoint() if resume else None
+        if checkpoint and self.output_format == 'csv' and not os.path.exists(self.output_path):
+            checkpoint = None
+        if checkpoint and checkpoint['complete']: return
+        self._prepare_output(checkpoint)
+        if checkpoint is None:
+            checkpoint = {'settings': self._get_settings(), 'completed_chunks': 0,
+                          'completed_rows': 0, 'output_size': 0, 'complete': False}
+        chunk_size = self.chunk_size
+        chunk_index = checkpoint['completed_chunks']
+        parameter_chunks = read_parameter_chunks(self.input_path, chunk_size,
+                                                 None if self.parameters is None else list(self.parameters),
+                                                 chunk_index)
+        for chunk in prefetch(parameter_chunks, self.prefetch):
+            if self.parameters is not None: chunk = chunk[list(self.parameters)]
+            results = self.evaluate(chunk, checkpoint['completed_rows'])
+            if self.output_format == 'csv':
+                with open(self.output_path, 'a', newline='') as file:
+                    results.to_csv(file, header=not checkpoint['completed_rows'], index=False)
+                    file.flush()
+                    os.fsync(file.fileno())
+                    checkpoint['output_size'] = file.tell()
+            else:
+                results.to_parquet(self._part_path(chunk_index), index=False)
+            chunk_index += 1
+            checkpoint['completed_chunks'] = chunk_index
+            checkpoint['completed_rows'] += len(results)
+            self._save_checkpoint(checkpoint)
+            yield results
+        checkpoint['complete'] = True
+        self._save_checkpoint(checkpoint)
+
+    def run(self, resume=True):
+        """Evaluate and write all remaining chunks and return the total number of scenarios evaluated."""
+        for results in self.chunks(resume): pass
+        checkpoint = self.load_checkpoint()
+        return checkpoint['completed_rows'] if checkpoint else 0
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+# teamod: Modules to enable techno-economic analysis (TEA) in Python.
+# Copyright (C) 2023-2024, Sarang S. Bhagwat <sarangb2@illinois.edu>
+#
+# This module is under the MIT open-source license. See
+# github.com/sarangbhagwat/teamod/LICENSE.txt
+# for license details.
+"""
+@author: sarangbhagwat
+Polynomial surrogates of NPV, IRR, and MPSP over a box of parameter values.
+Surrogates are fit to batched TEA solves at Latin hypercube samples,
+validated against held-out solves, and saved to and loaded from NumPy
+archives; evaluation is fully vectorized.
+"""
+import itertools
+import numpy as np
+from ._TEA import TEA
+from ._TEABatch import parse_parameter, solve_kinds
+from ._parallel import evaluate_scenarios
+from ._solvers import CONVERGED
+
+__all__ = ('Surrogate', 'latin_hypercube')
+
+def latin_hypercube(N, k, seed=None):
+    """Get a (sample x dimension) Latin hypercube sample of N points in the unit hypercube of k dimensions."""
+    rng = np.random.default_rng(seed)
+    strata = rng.permuted(np.tile(np.arange(N), (k, 1)), axis=1).T
+    return (strata + rng.random((N, k))) / N
+
+def get_exponents(k, degree):
+    """Get an (term x dimension) array of exponents of all terms of k variables up to a total degree, by increasing degree."""
+    exponents = [i for i in itertools.product(range(degree + 1), repeat=k) if sum(i) <= degree]
+    exponents.sort(key=lambda i: (sum(i), tuple(-j for j in i)))
+    return np.array(exponents, dtype=int).reshape(-1, k)
+
+def get_term_recipe(exponents):
+    """
+    Get the parent term, dimension, and power of each term, such that a term
+    is its parent times the Chebyshev polynomial of that power in that dimension
+    (the parent has no power in that dimension or any later one).
+    """
+    index = {tuple(i): n for n, i in enumerate(exponents.tolist())}
+    size = exponents.shape[0]
+    parents = np.zeros(size, dtype=int)
+    dimensions = np.zeros(size, dtype=int)
+    powers = np.zeros(size, dtype=int)
+    for n, exponent in enumerate(exponents.tolist()):
+        nonzero = [i for i, j in enumerate(exponent) if j]
+        if not nonzero: continue
+        dimension = nonzero[-1]
+        parent = list(exponent)
+        parent[dimension] = 0
+        parents[n] = index[tuple(parent)]
+        dimensions[n] = dimension
+        powers[n] = exponent[dimension]
+    return parents, dimensions, powers
+
+class Surrogate():
+    """
+    Create a Surrogate object: a polynomial model of a TEA metric over a box
+    of parameter values. Use Surrogate.fit to fit one to TEA solves and
+    Surrogate.load to load a saved one. The model is a sum of products of
+    Chebyshev polynomials (up to a total degree) of the parameters scaled to
+    [-1, 1] within the box; values outside the box are extrapolated.
+
+    Parameters
+    ----------
+    names : tuple
+        Names of the parameters (as in TEABatch).
+    lb : array
+        Lower bounds of the parameters.
+    ub : array
+        Upper bounds of the parameters.
+    coefficients : array
+        Coefficients of the terms (see `exponents`).
+    degree : int
+        Total degree of the polynomial.
+    metric : str
+        'NPV', 'IRR', or 'MPSP'.
+    validation : dict
+        Errors against held-out solves (see Surrogate.fit).
+
+    Examples
+    --------
+    >>> surrogate = teamod.Surrogate.fit(example_TEA, {'lang_factor': (2, 5), 'product_prices[1]': (1, 3)},
+    >>>                                  metric='MPSP', samples=2000, degree=4)
+    >>> surrogate.validation
+    >>> surrogate.save('MPSP_surrogate.npz')
+    >>> surrogate = teamod.Surrogate.load('MPSP_surrogate.npz')
+    >>> surrogate({'lang_factor': lang_factors, 'product_prices[1]': prices})
+
+    """
+
+    #: Number of points evaluated at a time.
+    chunk_size = 65_536
+
+    def __init__(self, names, lb, ub, coefficients, degree, metric='MPSP', validation=None):
+        names = tuple(names)
+        lb = np.asarray(lb, dtype=float)
+        ub = np.asarray(ub, dtype=float)
+        if lb.shape != (len(names),) or ub.shape != (len(names),):
+            raise ValueError('lb and ub must have one value per parameter')
+        if not (ub > lb).all():
+            raise ValueError('upper bounds must be greater than lower bounds')
+        #: Names of the parameters.
+        self.names = names
+
+        #: Lower bounds of the parameters.
+        self.lb = lb
+
+        #: Upper bounds of the parameters.
+        self.ub = ub
+
+        #: Total degree of the polynomial.
+        self.degree = int(degree)
+
+        #: Metric modeled.
+        self.metric = metric
+
+        #: (term x parameter) exponents of the Chebyshev polynomials of each term.
+        self.exponents = exponents = get_exponents(len(names), self.degree)
+
+        coefficients = np.asarray(coefficients, dtype=float)
+        if coefficients.shape != (exponents.shape[0],):
+            raise ValueError(f'expected {exponents.shape[0]} coefficients, not {coefficients.size}')
+        #: Coefficients of the terms.
+        self.coefficients = coefficients
+
+        #: Errors against held-out solves.
+        self.validation = {} if validation is None else validation
+
+        self._recipe = get_term_recipe(exponents)
+
+    @classmethod
+    def fit(cls, tea, bounds, metric='MPSP', samples=1000, degree=3, validation_samples=200,
+            seed=None, NPV=0., product_index=0, chunk_size=100_000, solver_kwargs=None):
+        """
+        Fit a surrogate of a metric ('NPV' at the IRR, 'IRR' given the NPV, or
+        'MPSP' at the IRR given the NPV) to TEA solves at Latin hypercube
+        samples of a box of parameter values, given a baseline TEA object
+        (or its input arguments) and lower and upper bounds by parameter name.
+        Samples that fail to solve are left out. The surrogate is validated
+        against solves at separate samples; its `validation` dictionary holds
+        the number of validation samples ('N'), root mean square error
+        ('rmse'), maximum absolute error ('max_error'), maximum relative error
+        ('max_relative_error'), coefficient of determination ('r2'), and the
+        fractions of fitting and validation samples that failed to solve
+        ('failed_fraction' and 'failed_validation_fraction').
+        """
+        if metric not in solve_kinds:
+            raise ValueError(f"metric must be one of {', '.join([repr(i) for i in solve_kinds])}, not {repr(metric)}")
+        inputs = tea.get_inputs() if isinstance(tea, TEA) else dict(tea)
+        names = tuple(bounds)
+        for name in names: parse_parameter(name)
+        lb, ub = np.array([bounds[i] for i in names], dtype=float).reshape(-1, 2).T
+        surrogate = cls(names, lb, ub, np.zeros(get_exponents(len(names), degree).shape[0]), degree, metric)
+        rng = np.random.default_rng(seed)
+        def solve(N):
+            values = lb + latin_hypercube(N, len(names), rng) * (ub - lb)
+            results = np.empty(N)
+            status = np.empty(N, dtype=int)
+            for start in range(0, N, chunk_size):
+                stop = start + chunk_size
+                results[start:stop], status[start:stop] = evaluate_scenarios(
+                    inputs, names, values[start:stop], metric, NPV, product_index, solver_kwargs
+                )
+            solved = (status == CONVERGED) & np.isfinite(results)
+            return values[solved], results[solved], 1. - solved.mean()
+        values, results, failed_fraction = solve(samples)
+        basis = surrogate._get_basis(values)
+        if results.size < basis.shape[0]:
+            raise ValueError(f'{results.size} solved samples cannot fit {basis.shape[0]} terms; '
+                             'increase samples or decrease degree')
+        surrogate.coefficients = np.linalg.lstsq(basis.T, results, rcond=None)[0]
+        validation = {'failed_fraction': failed_fraction}
+        if validation_samples:
+            values, results, failed_validation_fraction = solve(validation_samples)
+            errors = surrogate(values) - results
+            scale = np.abs(results)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                relative_errors = np.where(scale > 0., np.abs(errors) / scale, np.nan)
+            validation.update(
+                N=int(results.size),
+                rmse=float(np.sqrt(np.mean(errors**2))) if results.size else np.nan,
+                max_error=float(np.abs(errors).max()) if results.size else np.nan,
+                max_relative_error=float(np.nanmax(relative_errors)) if np.isfinite(relative_errors).any() else np.nan,
+                r2=float(1. - np.sum(errors**2) / np.sum((results - results.mean())**2)) if results.size > 1 else np.nan,
+                failed_validation_fraction=failed_validation_fraction,
+            )
+        surrogate.validation = validation
+        return surrogate
+
+    def _get_basis(self, values):
+        """Get the (term x point) values of all terms at a (point x parameter) array of values."""
+        lb, ub = self.lb, self.ub
+        z = (2. * (values - lb) / (ub - lb) - 1.).T
+        degree = self.degree
+        chebyshev = np.empty((z.shape[0], degree + 1, z.shape[1]))
+        chebyshev[:, 0] = 1.
+        if degree: chebyshev[:, 1] = z
+        for n in range(2, degree + 1):
+            chebyshev[:, n] = 2. * z * chebyshev[:, n - 1] - chebyshev[:, n - 2]
+        parents, dimensions, powers = self._recipe
+        basis = np.empty((parents.size, z.shape[1]))
+        basis[0] = 1.
+        for n in range(1, parents.size):
+            np.multiply(basis[parents[n]], chebyshev[dimensions[n], powers[n]], out=basis[n])
+        return basis
+
+    def __call__(self, values):
+        """
+        Evaluate the surrogate at a (point x parameter) array of values (or
+        a dictionary of arrays of values by parameter name).
+        """
+        if isinstance(values, dict):
+            values = np.broadcast_arrays(*[np.asarray(values[i], dtype=float) for i in self.names])
+            shape = values[0].shape
+            values = np.stack([i.ravel() for i in values], axis=1)
+        else:
+            values = np.asarray(values, dtype=float)
+            shape = values.shape[:-1]
+            values = values.reshape(-1, len(self.names))
+        results = np.empty(values.shape[0])
+        coefficients = self.coefficients
+        chunk_size = self.chunk_size
+        for start in range(0, values.shape[0], chunk_size):
+            stop = start + chunk_size
+            results[start:stop] = coefficients @ self._get_basis(values[start:stop])
+        return results.reshape(shape)
+
+    def save(self, path):
+        """Save the surrogate to a NumPy archive ('.npz')."""
+        validation = self.validation
+        np.savez(path, names=np.array(self.names, dtype=str), lb=self.lb, ub=self.ub,
+                 coefficients=self.coefficients, degree=self.degree, metric=self.metric,
+                 validation_keys=np.array(list(validation), dtype=str),
+                 validation_values=np.array(list(validation.values()), dtype=float))
+
+    @classmethod
+    def load(cls, path):
+        """Load a surrogate saved with Surrogate.save."""
+        with np.load(path, allow_pickle=False) as data:
+            validation = dict(zip(data['validation_keys'].tolist(), data['validation_values'].tolist()))
+            if 'N' in validation: validation['N'] = int(validation['N'])
+            return cls(data['names'].tolist(), data['lb'], data['ub'], data['coefficients'],
+                       int(data['degree']), str(data['metric']), validation)
+
+    def __repr__(self):
+        return f"<{type(self).__name__} ({self.metric}, degree {self.degree}): {', '.join(self.names)}>"
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+# teamod: Modules to enable techno-economic analysis (TEA) in Python.
+# Copyright (C) 2023-2024, Sarang S. Bhagwat <sarangb2@illinois.edu>
+#
+# This module is under the MIT open-source license. See
+# github.com/sarangbhagwat/teamod/LICENSE.txt
+# for license details.
+"""
+@author: sarangbhagwat
+Parameter sweeps of IRR and MPSP (e.g., MPSP vs. IRR or plant scale) on 1-D
+and 2-D grids. Cash flows of all grid points are built as one TEABatch, and
+each point is solved starting from the solutions at neighboring points
+(continuation), so dense grids need a few objective evaluations per point.
+"""
+import numpy as np
+from ._TEA import TEA, brentq, get_NPV_from_cashflow
+from ._TEABatch import TEABatch, get_batch_inputs, parse_parameter, solve_kinds
+from ._solvers import CONVERGED, SIGN_ERROR, CONVERGENCE_ERROR, VALUE_ERROR
+
+__all__ = ('ParameterSweep', 'solve_from_guess')
+
+def solve_from_guess(f, guess=None, slope=None, lb=0., ub=100., xtol=1e-5, maxiter=100):
+    """
+    Solve f(x) = 0 by secant steps from a guess and an estimate of the slope of
+    f (e.g., from a neighboring solve), falling back to Brent's method within
+    [lb, ub] if there is no guess or the steps leave the bounds or stall.
+    Returns the root, an estimate of the slope at the root, the number of
+    evaluations of f, and a status code (see teamod._solvers.status_messages).
+    """
+    points = []
+    def g(x):
+        fx = f(x)
+        points.append((x, fx))
+        return fx
+    if guess is not None and np.isfinite(guess) and slope and np.isfinite(slope):
+        x0 = min(max(guess, lb), ub)
+        f0 = g(x0)
+        if f0 == 0.: return x0, slope, len(points), CONVERGED
+        x1 = x0 - f0/slope
+        for i in range(maxiter):
+            if not lb <= x1 <= ub: break
+            if abs(x1 - x0) < xtol: return x1, slope, len(points), CONVERGED
+            f1 = g(x1)
+            if f1 == 0.: return x1, slope, len(points), CONVERGED
+            if f1 == f0: break
+            slope = (f1 - f0)/(x1 - x0)
+            x0, f0, x1 = x1, f1, x1 - f1/slope
+    try:
+        x = brentq(g, lb, ub, xtol=xtol, maxiter=maxiter)
+    except ValueError:
+        return np.nan, np.nan, len(points), SIGN_ERROR
+    except RuntimeError:
+        return np.nan, np.nan, len(points), CONVERGENCE_ERROR
+    (x0, f0), (x1, f1) = points[-2:]
+    slope = (f1 - f0)/(x1 - x0) if x1 != x0 else np.nan
+    return x, slope, len(points), CONVERGED
+
+def extrapolate(value, neighbors):
+    """Linearly extrapolate a solution at a parameter value from one or two (value, solution) pairs of neighbors (nearest first)."""
+    (x0, y0), *others = neighbors
+    if not others: return y0
+    x1, y1 = others[0]
+    return y0 + (y0 - y1) * (value - x0)/(x0 - x1)
+
+class ParameterSweep():
+    """
+    Create a ParameterSweep object to solve IRR (given the NPV) or MPSP (at the
+    IRR, given the NPV) across a 1-D or 2-D grid of parameter values, e.g.,
+    {'IRR': np.linspace(0, 0.3, 31)} for an MPSP-IRR curve or, additionally,
+    {'hourly_product_flows[0]': flows} for MPSP vs. IRR and plant scale.
+    Parameters are named as in TEABatch.
+
+    Grid points are solved in a serpentine walk, so each point (after the
+    first) has solved neighbors. The solution at a point is guessed by
+    linear extrapolation from the two previous neighbors along a grid axis
+    and refined by secant steps starting with the slope of the objective at
+    the nearest neighbor; Brent's method within the bounds is the fallback
+    (and is used for every point if warm_start is False, as in
+    TEA.get_MPSP_given_IRR). Continuation follows the branch of solutions
+    through the grid; where multiple roots exist within the bounds, this may
+    not be the lowest root.
+
+    Parameters
+    ----------
+    tea : TEA or dict
+        Baseline TEA object (or its input arguments; see TEA.get_inputs).
+    grid : dict
+        1-D arrays of values of one or two parameters by name.
+    metric : str
+        'IRR' (given the NPV) or 'MPSP' (at the IRR, given the NPV); 'NPV'
+        (at the IRR) is evaluated directly.
+    NPV : float
+        NPV at which IRR and MPSP are solved.
+    product_index : int
+        Index of the product whose MPSP is solved.
+    lb : float
+        Lower bound of the IRR or MPSP; defaults to 0.
+    ub : float
+        Upper bound of the IRR or MPSP; defaults to 10 for IRR and 100 for MPSP.
+    xtol : float
+        Absolute tolerance of the IRR or MPSP.
+    maxiter : int
+        Maximum number of iterations per grid point.
+    warm_start : bool
+        Whether to start each solve from neighboring solutions.
+
+    Examples
+    --------
+    >>> sweep = teamod.ParameterSweep(example_TEA, {'IRR': np.linspace(0, 0.3, 301)}, metric='MPSP')
+    >>> curve = sweep.run()
+    >>> curve['values'], curve['total_iterations']
+
+    """
+
+    def __init__(self, tea, grid, metric='MPSP', NPV=0., product_index=0, lb=0., ub=None,
+                 xtol=1e-5, maxiter=100, warm_start=True):
+        inputs = tea.get_inputs() if isinstance(tea, TEA) else dict(tea)
+        if not 1 <= len(grid) <= 2:
+            raise ValueError(f'grid must have one or two parameters, not {len(grid)}')
+        for name in grid: parse_parameter(name)
+        if metric not in solve_kinds:
+            raise ValueError(f"metric must be one of {', '.join([repr(i) for i in solve_kinds])}, not {repr(metric)}")
+        if metric == 'IRR' and 'IRR' in grid:
+            raise ValueError('cannot sweep IRR while solving IRR')
+        #: Baseline TEA input arguments.
+        self.inputs = inputs
+
+        #: 1-D arrays of values of each parameter by name.
+        self.grid = {i: np.asarray(j, dtype=float) for i, j in grid.items()}
+
+        #: Metric to solve.
+        self.metric = metric
+
+        #: NPV at which IRR and MPSP are solved.
+        self.NPV = NPV
+
+        #: Index of the product whose MPSP is solved.
+        self.product_index = product_index
+
+        #: Lower bound of the IRR or MPSP.
+        self.lb = lb
+
+        #: Upper bound of the IRR or MPSP.
+        self.ub = (10. if metric == 'IRR' else 100.) if ub is None else ub
+
+        #: Absolute tolerance of the IRR or MPSP.
+        self.xtol = xtol
+
+        #: Maximum number of iterations per grid point.
+        self.maxiter = maxiter
+
+        #: Whether to start each solve from neighboring solutions.
+        self.warm_start = warm_start
+
+    @property
+    def names(self):
+        """Names of the parameters."""
+        return tuple(self.grid)
+
+    @property
+    def shape(self):
+        """Shape of the grid."""
+        return tuple([i.size for i in self.grid.values()])
+
+    def _get_batch(self):
+        """Get a TEABatch of all grid points in C order."""
+        mesh = np.meshgrid(*self.grid.values(), indexing='ij')
+        return TEABatch(**get_batch_inputs(self.inputs, {i: j.ravel() for i, j in zip(self.grid, mesh)}))
+
+    def _get_objectives(self, batch):
+        """Get a function of the solve variable and grid point index that returns the objective."""
+        NPV = self.NPV
+        if self.metric == 'IRR':
+            cashflow = batch.get_overall_cashflow_array()
+            inflation_rate = batch._scenario_values(batch.inflation_rate)
+            def objective_func(IRR, index):
+                return get_NPV_from_cashflow(cashflow[index], IRR, inflation_rate[index]) - NPV
+        else:
+            price_independent, per_unit_price, other = batch.get_price_decomposition(self.product_index)
+            P_over_F_factor_array = batch.P_over_F_factor_array
+            income_tax = batch._scenario_values(batch.income_tax)
+            def objective_func(price, index):
+                taxable_cashflow = price_independent[index] + per_unit_price[index] * price
+                tax_flow = np.where(taxable_cashflow > 0, income_tax[index] * taxable_cashflow, 0.)
+                cashflow = taxable_cashflow - tax_flow + other[index]
+                return (cashflow * P_over_F_factor_array[index]).sum() - NPV
+        return objective_func
+
+    def walk(self):
+        """Yield the (row, column) indices of the grid (as 2-D) in the order they are solved."""
+        shape = self.shape
+        rows, columns = shape if len(shape) == 2 else (1, shape[0])
+        for i in range(rows):
+            for j in (range(columns) if i % 2 == 0 else range(columns - 1, -1, -1)):
+                yield i, j
+
+    def run(self):
+        """
+        Solve all grid points. Returns a dictionary with the parameter names
+        ('names') and values ('grid'), and arrays (in the shape of the grid) of
+        the solutions ('values'; NaN where the solve failed), the number of
+        objective evaluations ('iterations'), and status codes ('status';
+        see teamod._solvers.status_messages), and the total number of
+        objective evaluations ('total_iterations').
+        """
+        shape = self.shape
+        batch = self._get_batch()
+        if self.metric == 'NPV':
+            values = batch.get_NPV_given_IRR().reshape(shape)
+            iterations = np.zeros(shape, dtype=int)
+            status = np.where(np.isnan(values), VALUE_ERROR, CONVERGED)
+            return self._get_results(values, iterations, status)
+        objective_func = self._get_objectives(batch)
+        grid = list(self.grid.values())
+        if len(grid) == 1: grid.insert(0, np.zeros(1))
+        rows, columns = grid[0].size, grid[1].size
+        values = np.full((rows, columns), np.nan)
+        slopes = np.full((rows, columns), np.nan)
+        iterations = np.zeros((rows, columns), dtype=int)
+        status = np.zeros((rows, columns), dtype=int)
+        lb, ub, xtol, maxiter = self.lb, self.ub, self.xtol, self.maxiter
+        warm_start = self.warm_start
+        for i, j in self.walk():
+            guess = slope = None
+            if warm_start:
+                direction = 1 if i % 2 == 0 else -1
+                along_row = [(j - direction * k) for k in (1, 2)]
+                along_row = [(grid[1][k], values[i, k], slopes[i, k])
+                             for k in along_row if 0 <= k < columns and np.isfinite(values[i, k])]
+                along_column = [(grid[0][k], values[k, j], slopes[k, j])
+                                for k in (i - 1, i - 2) if k >= 0 and np.isfinite(values[k, j])]
+                neighbors, value = (along_row, grid[1][j]) if along_row else (along_column, grid[0][i])
+                if neighbors:
+                    guess = extrapolate(value, [(x, y) for x, y, _ in neighbors])
+                    slope = neighbors[0][2]
+            index = i * columns + j
+            values[i, j], slopes[i, j], iterations[i, j], status[i, j] = solve_from_guess(
+                lambda x: objective_func(x, index), guess, slope, lb, ub, xtol, maxiter
+            )
+        return self._get_results(values.reshape(shape), iterations.reshape(shape), status.reshape(shape))
+
+    def _get_results(self, values, iterations, status):
+        return {
+            'names': self.names,
+            'grid': tuple(self.grid.values()),
+            'values': values,
+            'iterations': iterations,
+            'status': status,
+            'total_iterations': int(iterations.sum()),
+            }
+
+    def __repr__(self):
+        grid = ' x '.join([f'{i} ({j.size})' for i, j in self.grid.items()])
+        return f'<{type(self).__name__} ({self.metric}): {grid}>'
@@ -0,0 +1,364 @@
+# -*- coding: utf-8 -*-
+# teamod: Modules to enable techno-economic analysis (TEA) in Python.
+# Copyright (C) 2023-2024, Sarang S. Bhagwat <sarangb2@illinois.edu>
+#
+# This module is under the MIT open-source license. See
+# github.com/sarangbhagwat/teamod/LICENSE.txt
+# for license details.
+"""
+@author: sarangbhagwat
+Monte Carlo uncertainty analysis. Samples are drawn in seeded chunks, each
+chunk is evaluated as one TEABatch, and summary statistics are streamed so
+that memory does not grow with the number of samples.
+"""
+import numpy as np
+from ._TEA import TEA
+from ._TEABatch import TEABatch, get_batch_inputs, parse_parameter, solve_kinds
+
+__all__ = (
+    'Uniform',
+    'Triangle',
+    'Normal',
+    'Lognormal',
+    'QuantileSketch',
+    'StreamingStatistics',
+    'UncertaintyAnalysis',
+)
+
+#%% Distributions
+
+class Uniform():
+    """Uniform distribution between a lower and an upper bound."""
+
+    def __init__(self, lb, ub):
+        self.lb = lb
+        self.ub = ub
+
+    def sample(self, rng, size):
+        return rng.uniform(self.lb, self.ub, size)
+
+    def __repr__(self):
+        return f'{type(self).__name__}(lb={self.lb}, ub={self.ub})'
+
+class Triangle():
+    """Triangular distribution given a lower bound, mode, and upper bound."""
+
+    def __init__(self, lb, mode, ub):
+        self.lb = lb
+        self.mode = mode
+        self.ub = ub
+
+    def sample(self, rng, size):
+        return rng.triangular(self.lb, self.mode, self.ub, size)
+
+    def __repr__(self):
+        return f'{type(self).__name__}(lb={self.lb}, mode={self.mode}, ub={self.ub})'
+
+class Normal():
+    """Normal distribution given a mean and standard deviation; optionally truncated at lower and upper bounds by resampling."""
+
+    def __init__(self, mean, std, lb=-np.inf, ub=np.inf):
+        self.mean = mean
+        self.std = std
+        self.lb = lb
+        self.ub = ub
+
+    def sample(self, rng, size):
+        values = rng.normal(self.mean, self.std, size)
+        outside = (values < self.lb) | (values > self.ub)
+        while outside.any():
+            values[outside] = rng.normal(self.mean, self.std, outside.sum())
+            outside = (values < self.lb) | (values > self.ub)
+        return values
+
+    def __repr__(self):
+        return f'{type(self).__name__}(mean={self.mean}, std={self.std}, lb={self.lb}, ub={self.ub})'
+
+class Lognormal():
+    """Lognormal distribution given the mean and standard deviation of the underlying normal distribution."""
+
+    def __init__(self, mean, sigma):
+        self.mean = mean
+        self.sigma = sigma
+
+    def sample(self, rng, size):
+        return rng.lognormal(self.mean, self.sigma, size)
+
+    def __repr__(self):
+        return f'{type(self).__name__}(mean={self.mean}, sigma={self.sigma})'
+
+#%% Streaming statistics
+
+class QuantileSketch():
+    """
+    Bounded-memory estimate of quantiles from a stream of values. Values are
+    kept exactly until more than twice the capacity have been added; they are
+    then compressed into `capacity` weighted centroids of about equal weight,
+    so the rank error is on the order of 1/capacity. Sketches can be merged.
+    """
+
+    def __init__(self, capacity=2000):
+        #: Number of centroids kept after compression.
+        self.capacity = capacity
+        self.values = np.empty(0)
+        self.weights = np.empty(0)
+        self.min = np.inf
+        self.max = -np.inf
+
+    @property
+    def count(self):
+        """Total weight (number of values) added."""
+        return self.weights.sum()
+
+    def update(self, values):
+        """Add an array of (non-NaN) values."""
+        values = np.asarray(values, dtype=float).ravel()
+        if not values.size: return
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self.values = np.concatenate([self.values, values])
+        self.weights = np.concatenate([self.weights, np.ones(values.size)])
+        if self.values.size > 2 * self.capacity: self.compress()
+
+    def merge(self, other):
+        """Add all values of another sketch."""
+        if not other.weights.size: return
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.values = np.concatenate([self.values, other.values])
+        self.weights = np.concatenate([self.weights, other.weights])
+        if self.values.size > 2 * self.capacity: self.compress()
+
+    def _sort(self):
+        order = np.argsort(self.values, kind='stable')
+        self.values = self.values[order]
+        self.weights = self.weights[order]
+
+    def compress(self):
+        """Compress values into at most `capacity` centroids of about equal weight."""
+        self._sort()
+        values, weights, capacity = self.values, self.weights, self.capacity
+        cumulative_weights = weights.cumsum()
+        total = cumulative_weights[-1]
+        bins = ((cumulative_weights - 0.5 * weights) / total * capacity).astype(int)
+        starts = np.concatenate([[0], np.flatnonzero(np.diff(bins)) + 1])
+        centroid_weights = np.add.reduceat(weights, starts)
+        self.values = np.add.reduceat(values * weights, starts) / centroid_weights
+        self.weights = centroid_weights
+
+    def quantile(self, q):
+        """
+        Get quantiles (fractions between 0 and 1); while uncompressed, these
+        equal numpy.quantile with linear interpolation.
+        """
+        if not self.weights.size: return np.full(np.shape(q), np.nan)
+        self._sort()
+        values, weights = self.values, self.weights
+        total = weights.sum()
+        positions = np.concatenate([[0.], weights.cumsum() - 0.5 * weights - 0.5, [total - 1.]])
+        values = np.concatenate([[self.min], values, [self.max]])
+        return np.interp(np.asarray(q) * (total - 1.), positions, values)
+
+class StreamingStatistics():
+    """
+    Single-pass summary statistics (count, mean, standard deviation, minimum,
+    maximum, and percentiles) of a stream of value arrays. NaN values (e.g.,
+    failed solves) are counted separately and otherwise ignored.
+    """
+
+    def __init__(self, sketch_capacity=2000):
+        self.count = 0
+        self.nan_count = 0
+        self.mean = 0.
+        self._M2 = 0.
+        self.sketch = QuantileSketch(sketch_capacity)
+
+    def update(self, values):
+        """Add an array of values."""
+        values = np.asarray(values, dtype=float).ravel()
+        nan = np.isnan(values)
+        self.nan_count += int(nan.sum())
+        values = values[~nan]
+        n = values.size
+        if not n: return
+        mean = values.mean()
+        M2 = ((values - mean)**2).sum()
+        self._combine(n, mean, M2)
+        self.sketch.update(values)
+
+    def merge(self, other):
+        """Add all values of other streaming statistics."""
+        self.nan_count += other.nan_count
+        if other.count: self._combine(other.count, other.mean, other._M2)
+        self.sketch.merge(other.sketch)
+
+    def _combine(self, n, mean, M2):
+        # Chan et al.'s parallel update of the mean and sum of squared deviations
+        count = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / count
+        self._M2 += M2 + delta**2 * self.count * n / count
+        self.count = count
+
+    @property
+    def std(self):
+        """Sample standard deviation."""
+        return (self._M2 / (self.count - 1))**0.5 if self.count > 1 else np.nan
+
+    @property
+    def min(self):
+        return self.sketch.min if self.count else np.nan
+
+    @property
+    def max(self):
+        return self.sketch.max if self.count else np.nan
+
+    def percentile(self, q):
+        """Get percentiles (between 0 and 100)."""
+        return self.sketch.quantile(np.asarray(q) / 100.)
+
+    def summary(self, percentiles=(5, 25, 50, 75, 95)):
+        """Get a dictionary of summary statistics."""
+        summary = {
+            'count': self.count,
+            'nan_count': self.nan_count,
+            'mean': self.mean,
+            'std': self.std,
+            'min': self.min,
+            }
+        for q, value in zip(percentiles, self.percentile(percentiles)):
+            summary[f'{q}th percentile'] = value
+        summary['max'] = self.max
+        return summary
+
+    def __repr__(self):
+        return f'<{type(self).__name__}: count={self.count}, mean={self.mean:.6g}, std={self.std:.6g}>'
+
+#%% Monte Carlo
+
+class UncertaintyAnalysis():
+    """
+    Create an UncertaintyAnalysis object to run Monte Carlo simulations of a TEA.
+
+    Parameters
+    ----------
+    tea : TEA or dict
+        Baseline TEA object (or its input arguments; see TEA.get_inputs).
+    distributions : dict
+        Distributions (objects with a `sample(rng, size)` method, e.g., Uniform)
+        by parameter name, e.g., 'lang_factor' or 'product_prices[0]'.
+    metrics : tuple
+        Metrics to evaluate: 'NPV' (at the IRR), 'IRR' (given the NPV), and/or
+        'MPSP' (at the IRR, given the NPV).
+    NPV : float
+        NPV at which IRR and MPSP are solved.
+    product_index : int
+        Index of the product whose MPSP is solved.
+    chunk_size : int
+        Number of samples drawn and evaluated at a time.
+    seed : int
+        Seed of the random number generator. Chunk i is always sampled with a
+        generator seeded by (seed, i), so samples are reproducible for a given
+        seed and chunk size (also when runs end partway through a chunk, e.g.,
+        run(1500) and then run(500) evaluate the same samples as run(2000)).
+    solver_kwargs : dict
+        Keyword arguments of TEABatch solves by metric, e.g., {'MPSP': {'MPSP_ub': 200.}}.
+
+    """
+
+    def __init__(self, tea, distributions, metrics=('NPV',), NPV=0., product_index=0,
+                 chunk_size=10_000, seed=None, sketch_capacity=2000, solver_kwargs=None):
+        inputs = tea.get_inputs() if isinstance(tea, TEA) else dict(tea)
+        for name in distributions: parse_parameter(name)
+        for metric in metrics:
+            if metric not in solve_kinds:
+                raise ValueError(f"metrics must be among {', '.join([repr(i) for i in solve_kinds])}, not {repr(metric)}")
+        #: Baseline TEA input arguments.
+        self.inputs = inputs
+
+        #: Distributions by parameter name.
+        self.distributions = distributions
+
+        #: Metrics to evaluate.
+        self.metrics = tuple(metrics)
+
+        #: NPV at which IRR and MPSP are solved.
+        self.NPV = NPV
+
+        #: Index of the product whose MPSP is solved.
+        self.product_index = product_index
+
+        #: Number of samples drawn and evaluated at a time.
+        self.chunk_size = chunk_size
+
+        #: Seed of the random number generator.
+        self.seed = np.random.SeedSequence().entropy if seed is None else seed
+
+        #: Keyword arguments of TEABatch solves by metric.
+        self.solver_kwargs = {} if solver_kwargs is None else solver_kwargs
+
+        self.sketch_capacity = sketch_capacity
+        self.reset()
+
+    def reset(self):
+        """Discard all results."""
+        #: Streaming statistics by metric.
+        self.statistics = {i: StreamingStatistics(self.sketch_capacity) for i in self.metrics}
+
+        #: Number of samples evaluated.
+        self.samples_evaluated = 0
+
+        #: Number of chunks evaluated in full.
+        self.chunks_evaluated = 0
+
+        # Index and samples of a chunk evaluated in part
+        self._partial_chunk = None
+
+    def get_rng(self, chunk_index):
+        """Get the random number generator of a chunk."""
+        return np.random.default_rng(np.random.SeedSequence(self.seed, spawn_key=(chunk_index,)))
+
+    def sample(self, chunk_index, size=None):
+        """Get a dictionary of sampled parameter values of a chunk."""
+        if size is None: size = self.chunk_size
+        rng = self.get_rng(chunk_index)
+        return {name: np.asarray(distribution.sample(rng, size), dtype=float)
+                for name, distribution in self.distributions.items()}
+
+    def evaluate(self, samples):
+        """Get a dictionary of metric values of each sample."""
+        batch = TEABatch(**get_batch_inputs(self.inputs, samples))
+        kwargs = self.solver_kwargs
+        return {metric: batch.solve(metric, NPV=self.NPV, product_index=self.product_index, **kwargs.get(metric, {}))
+                for metric in self.metrics}
+
+    def run(self, N):
+        """
+        Evaluate N more samples (chunk by chunk) and return the streaming
+        statistics by metric. A run may end partway through a chunk, in which
+        case the next run continues with the rest of that chunk.
+        """
+        chunk_size = self.chunk_size
+        statistics = self.statistics
+        while N > 0:
+            chunk_index, offset = divmod(self.samples_evaluated, chunk_size)
+            size = min(chunk_size - offset, N)
+            if offset == 0 and size == chunk_size:
+                samples = self.sample(chunk_index)
+            else:
+                partial_chunk = self._partial_chunk
+                if partial_chunk is None or partial_chunk[0] != chunk_index:
+                    self._partial_chunk = partial_chunk = (chunk_index, self.sample(chunk_index))
+                samples = {name: values[offset:offset + size] for name, values in partial_chunk[1].items()}
+            results = self.evaluate(samples)
+            for metric, values in results.items(): statistics[metric].update(values)
+            self.samples_evaluated += size
+            N -= size
+            if offset + size == chunk_size:
+                self.chunks_evaluated += 1
+                self._partial_chunk = None
+        return statistics
+
+    def summary(self, percentiles=(5, 25, 50, 75, 95)):
+        """Get a dictionary of summary statistics by metric."""
+        return {metric: statistics.summary(percentiles) for metric, statistics in self.statistics.items()}